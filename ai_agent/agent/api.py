@@ -0,0 +1,192 @@
+"""Standalone HTTP service for the AI agent.
+
+The port is bound immediately; the agent is built and the knowledge base
+ingested in the background (see ``AgentWarmup``). ``/health`` answers at
+once (503 only if warm-up failed), ``/ready`` reports warm-up progress,
+and endpoints that need the agent return 503 until it is ready.
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from agent.core import TreeLineAgent, get_agent, warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start warming up the agent without delaying startup."""
+    warmup.start()
+    yield
+
+
+# Create FastAPI app for standalone mode
+app = FastAPI(
+    title="TreeLine AI Agent",
+    description="Standalone AI agent service",
+    version="0.1.0",
+    lifespan=lifespan
+)
+
+
+class GenerateRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+    include_sources: bool = False
+
+
+class GenerateResponse(BaseModel):
+    response: str
+    session_id: Optional[str]
+    sources_used: int
+    knowledge_base_size: int
+    fallback_used: Optional[bool] = None
+    cache_hit: bool = False
+    knowledge_base_version: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchItem(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+
+class BatchGenerateRequest(BaseModel):
+    items: List[BatchItem]
+    include_sources: bool = False
+    max_concurrency: Optional[int] = Field(None, ge=1)
+
+
+class BatchGenerateResponse(BaseModel):
+    results: List[GenerateResponse]
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    k: int = Field(4, ge=1)
+    include_scores: bool = False
+    mode: Optional[str] = None
+
+
+batch_max_size = int(os.getenv("BATCH_MAX_SIZE", "500"))
+
+
+def ready_agent() -> TreeLineAgent:
+    """Return the warmed-up agent, or fail the request with 503 while warming up."""
+    if not warmup.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Agent is warming up ({warmup.phase})",
+            headers={"Retry-After": "5"}
+        )
+    return get_agent()
+
+
+@app.post("/generate", response_model=GenerateResponse)
+async def generate_response(request: GenerateRequest):
+    """Generate a response using the AI agent."""
+    agent = ready_agent()
+    result = await agent.agenerate_response(
+        message=request.message,
+        session_id=request.session_id,
+        include_sources=request.include_sources
+    )
+    return GenerateResponse(**result)
+
+
+@app.post("/generate/batch", response_model=BatchGenerateResponse)
+async def generate_batch(request: BatchGenerateRequest):
+    """Generate responses to many messages; results are returned in request order."""
+    if len(request.items) > batch_max_size:
+        raise HTTPException(status_code=413, detail=f"At most {batch_max_size} items per batch")
+    agent = ready_agent()
+    results = await agent.agenerate_batch(
+        messages=[item.message for item in request.items],
+        session_ids=[item.session_id for item in request.items],
+        include_sources=request.include_sources,
+        max_concurrency=request.max_concurrency
+    )
+    return BatchGenerateResponse(results=[GenerateResponse(**result) for result in results])
+
+
+@app.post("/search/batch")
+async def search_batch(request: BatchSearchRequest):
+    """Search the knowledge base for many queries; results are returned in request order."""
+    if len(request.queries) > batch_max_size:
+        raise HTTPException(status_code=413, detail=f"At most {batch_max_size} queries per batch")
+    agent = ready_agent()
+    try:
+        results = await asyncio.to_thread(
+            agent.search_knowledge_many, request.queries, request.k, request.include_scores, request.mode
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return {"results": results}
+
+
+@app.post("/generate/stream")
+async def generate_response_stream(request: GenerateRequest):
+    """Stream a response as server-sent events, one event per token."""
+    agent = ready_agent()
+    
+    async def event_stream():
+        async for event in agent.astream_response(
+            message=request.message,
+            session_id=request.session_id
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/kb/version")
+async def get_kb_version():
+    """Get the current knowledge base version, used to key downstream caches."""
+    agent = ready_agent()
+    return {"knowledge_base_version": agent.vector_store_manager.kb_version}
+
+
+@app.get("/status")
+async def get_status():
+    """Get agent status."""
+    agent = ready_agent()
+    return agent.get_status()
+
+
+@app.get("/health")
+async def health_check():
+    """Liveness check; answers while the agent is still warming up.
+    
+    A failed warm-up is never retried, so it reports 503 to get the
+    container restarted.
+    """
+    if warmup.phase == "failed":
+        return JSONResponse(
+            {"status": "unhealthy", "service": "treeline-ai-agent", "phase": warmup.phase, "error": warmup.error},
+            status_code=503
+        )
+    return {"status": "healthy", "service": "treeline-ai-agent", "phase": warmup.phase}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check with warm-up progress; 503 until the agent can serve requests."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+def main():
+    import uvicorn
+    
+    # Run the standalone service
+    uvicorn.run(app, host="0.0.0.0", port=8001)
+
+
+if __name__ == "__main__":
+    main()
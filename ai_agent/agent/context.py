@@ -0,0 +1,94 @@
+"""Token-budgeted assembly of retrieved chunks into prompt context."""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+ScoredDocument = Tuple[Document, float]
+
+
+def overlap_length(earlier: str, later: str, max_overlap: int) -> int:
+    """Length of the longest suffix of ``earlier`` that ``later`` starts with."""
+    for length in range(min(len(earlier), len(later), max_overlap), 0, -1):
+        if earlier.endswith(later[:length]):
+            return length
+    return 0
+
+
+class ContextBuilder:
+    """Selects and packs retrieved chunks into a bounded prompt context.
+
+    Chunks scoring below ``min_relevance`` are dropped. The rest are taken in
+    relevance order until ``token_budget`` is spent. When two consecutive
+    chunks of the same source are both selected, the text they share because
+    of the splitter's overlap is only included once.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        token_budget: int = 1500,
+        min_relevance: float = 0.25,
+        max_overlap: int = 200,
+        separator: str = "\n\n"
+    ):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.min_relevance = min_relevance
+        self.max_overlap = max_overlap
+        self.separator = separator
+
+    @staticmethod
+    def _position(document: Document) -> Optional[Tuple[str, int]]:
+        """Return a chunk's (source, chunk_index), if known."""
+        index = document.metadata.get("chunk_index")
+        if index is None:
+            return None
+        return document.metadata.get("source", ""), int(index)
+
+    def _trim_overlap(self, document: Document, selected: Dict[Tuple[str, int], str]) -> str:
+        """Remove text already present in a selected neighbouring chunk."""
+        text = document.page_content
+        position = self._position(document)
+        if position is None:
+            return text
+        source, index = position
+
+        previous = selected.get((source, index - 1))
+        if previous is not None:
+            text = text[overlap_length(previous, text, self.max_overlap):]
+        following = selected.get((source, index + 1))
+        if following is not None:
+            shared = overlap_length(text, following, self.max_overlap)
+            text = text[:len(text) - shared]
+        return text.strip()
+
+    def build(self, scored_documents: List[ScoredDocument]) -> List[Document]:
+        """Return the chunks to put in the prompt, most relevant first."""
+        candidates = sorted(
+            (item for item in scored_documents if item[1] >= self.min_relevance),
+            key=lambda item: item[1],
+            reverse=True
+        )
+
+        separator_tokens = self.count_tokens(self.separator)
+        used_tokens = 0
+        selected: Dict[Tuple[str, int], str] = {}
+        context = []
+        for document, score in candidates:
+            text = self._trim_overlap(document, selected)
+            if not text:
+                continue
+            tokens = self.count_tokens(text) + (separator_tokens if context else 0)
+            if used_tokens + tokens > self.token_budget:
+                # A shorter, less relevant chunk may still fit
+                continue
+            used_tokens += tokens
+            position = self._position(document)
+            if position is not None:
+                selected[position] = document.page_content
+            context.append(Document(
+                page_content=text,
+                metadata={**document.metadata, "relevance_score": score}
+            ))
+        return context
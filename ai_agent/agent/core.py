@@ -1,7 +1,9 @@
 """Core AI agent implementation."""
 
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from typing import AsyncIterator, Dict, Any, List, Optional
 from dotenv import load_dotenv
 
 from .rag_pipeline import RAGPipeline
@@ -14,6 +16,8 @@ logger = TreeLineLogger().logger
 # Load environment variables
 load_dotenv()
 
+AGENT_ROLES = ("standalone", "writer", "reader")
+
 
 class TreeLineAgent:
     """Main TreeLine AI customer support agent."""
@@ -24,7 +28,8 @@ class TreeLineAgent:
         collection_name: Optional[str] = None,
         llm_model: Optional[str] = None,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        initialize_knowledge_base: bool = True
     ):
         # Get configuration from environment or use defaults
         self.persist_directory = persist_directory or os.getenv(
@@ -36,12 +41,18 @@ class TreeLineAgent:
         self.llm_model = llm_model or os.getenv("LLM_MODEL", "gpt-4-turbo")
         self.temperature = temperature or float(os.getenv("TEMPERATURE", "0.7"))
         self.max_tokens = max_tokens or int(os.getenv("MAX_TOKENS", "1000"))
+        # standalone (ingests and serves), writer (the one process that ingests)
+        # or reader (serves from the writer's index, e.g. one of N workers)
+        self.role = os.getenv("AGENT_ROLE", "standalone").lower()
+        if self.role not in AGENT_ROLES:
+            raise ValueError(f"Unknown AGENT_ROLE: {self.role} (expected one of {', '.join(AGENT_ROLES)})")
         
         # Initialize components
         self.vector_store_manager = VectorStoreManager(
             persist_directory=self.persist_directory,
             collection_name=self.collection_name,
-            embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+            embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002"),
+            read_only=self.role == "reader"
         )
         
         self.rag_pipeline = RAGPipeline(
@@ -52,17 +63,33 @@ class TreeLineAgent:
         )
         
         # Initialize knowledge base if directory exists
-        self._initialize_knowledge_base()
+        if initialize_knowledge_base:
+            self.initialize_knowledge_base()
     
-    def _initialize_knowledge_base(self):
-        """Initialize knowledge base from documents directory."""
+    def initialize_knowledge_base(self) -> int:
+        """Initialize knowledge base from documents directory; returns documents (re-)ingested."""
+        if self.role == "reader":
+            logger.info("[AGENT] Reader role: serving the index maintained by the writer")
+            return 0
         knowledge_dir = "./data/knowledge_base"
         if os.path.exists(knowledge_dir):
             docs_loaded = self.rag_pipeline.load_knowledge_from_directory(knowledge_dir)
             if docs_loaded > 0:
                 print(f"Loaded {docs_loaded} documents into knowledge base")
-        else:
-            print("No knowledge base directory found. Agent will use fallback responses.")
+            return docs_loaded
+        print("No knowledge base directory found. Agent will use fallback responses.")
+        return 0
+    
+    @staticmethod
+    def _empty_message_response(session_id: Optional[str]) -> Dict[str, Any]:
+        """Response for an empty customer message."""
+        return {
+            "response": "I'd be happy to help! Could you please tell me what you need assistance with?",
+            "session_id": session_id,
+            "sources_used": 0,
+            "knowledge_base_size": 0,
+            "fallback_used": True
+        }
     
     def generate_response(
         self,
@@ -72,19 +99,81 @@ class TreeLineAgent:
     ) -> Dict[str, Any]:
         """Generate a response to a customer message."""
         if not message or not message.strip():
-            return {
-                "response": "I'd be happy to help! Could you please tell me what you need assistance with?",
-                "session_id": session_id,
-                "sources_used": 0,
-                "knowledge_base_size": 0,
-                "fallback_used": True
-            }
+            return self._empty_message_response(session_id)
+        
+        result = self.rag_pipeline.generate_response(
+            query=message.strip(),
+            session_id=session_id,
+            include_sources=include_sources
+        )
+        result["knowledge_base_version"] = self.vector_store_manager.kb_version
+        return result
+    
+    async def agenerate_response(
+        self,
+        message: str,
+        session_id: Optional[str] = None,
+        include_sources: bool = False
+    ) -> Dict[str, Any]:
+        """Generate a response to a customer message without blocking the event loop."""
+        if not message or not message.strip():
+            return self._empty_message_response(session_id)
         
-        return self.rag_pipeline.generate_response(
+        result = await self.rag_pipeline.agenerate_response(
             query=message.strip(),
             session_id=session_id,
             include_sources=include_sources
         )
+        result["knowledge_base_version"] = self.vector_store_manager.kb_version
+        return result
+    
+    async def agenerate_batch(
+        self,
+        messages: List[str],
+        session_ids: Optional[List[Optional[str]]] = None,
+        include_sources: bool = False,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Generate responses to many customer messages, returned in order."""
+        session_ids = session_ids or [None] * len(messages)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        pending = []
+        for index, (message, session_id) in enumerate(zip(messages, session_ids)):
+            if not message or not message.strip():
+                results[index] = self._empty_message_response(session_id)
+            else:
+                pending.append(index)
+        
+        generated = await self.rag_pipeline.agenerate_batch(
+            queries=[messages[index].strip() for index in pending],
+            session_ids=[session_ids[index] for index in pending],
+            include_sources=include_sources,
+            max_concurrency=max_concurrency
+        ) if pending else []
+        for index, result in zip(pending, generated):
+            result["knowledge_base_version"] = self.vector_store_manager.kb_version
+            results[index] = result
+        return results
+    
+    async def astream_response(
+        self,
+        message: str,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response to a customer message as token events."""
+        if not message or not message.strip():
+            response = self._empty_message_response(session_id)
+            yield {"type": "token", "content": response.pop("response")}
+            yield {"type": "done", **response}
+            return
+        
+        async for event in self.rag_pipeline.astream_response(
+            query=message.strip(),
+            session_id=session_id
+        ):
+            if event["type"] == "done":
+                event["knowledge_base_version"] = self.vector_store_manager.kb_version
+            yield event
     
     def add_knowledge(
         self,
@@ -103,13 +192,30 @@ class TreeLineAgent:
         self,
         query: str,
         k: int = 4,
-        include_scores: bool = False
+        include_scores: bool = False,
+        mode: Optional[str] = None
     ) -> list:
-        """Search the knowledge base."""
+        """Search the knowledge base (``mode``: vector, keyword or hybrid)."""
         return self.rag_pipeline.search_knowledge(
             query=query,
             k=k,
-            include_scores=include_scores
+            include_scores=include_scores,
+            mode=mode
+        )
+    
+    def search_knowledge_many(
+        self,
+        queries: List[str],
+        k: int = 4,
+        include_scores: bool = False,
+        mode: Optional[str] = None
+    ) -> List[list]:
+        """Search the knowledge base for several queries at once."""
+        return self.rag_pipeline.search_knowledge_many(
+            queries=queries,
+            k=k,
+            include_scores=include_scores,
+            mode=mode
         )
     
     def get_status(self) -> Dict[str, Any]:
@@ -122,76 +228,108 @@ class TreeLineAgent:
             "llm_model": self.llm_model,
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
+            "role": self.role,
             "knowledge_base": {
                 "collection_name": kb_info["name"],
                 "document_count": kb_info["count"],
-                "persist_directory": self.persist_directory
+                "persist_directory": self.persist_directory,
+                "generation": self.vector_store_manager.generation
             },
+            "response_cache": (
+                self.rag_pipeline.response_cache.stats
+                if self.rag_pipeline.response_cache is not None else None
+            ),
             "openai_api_configured": bool(os.getenv("OPENAI_API_KEY"))
         }
 
 
 # Global agent instance
 _agent_instance = None
+_agent_lock = threading.Lock()
 
 
 def get_agent() -> TreeLineAgent:
     """Get or create the global agent instance."""
     global _agent_instance
-    if _agent_instance is None:
-        _agent_instance = TreeLineAgent()
-    return _agent_instance
+    with _agent_lock:
+        if _agent_instance is None:
+            _agent_instance = TreeLineAgent()
+        return _agent_instance
 
 
-# For standalone execution
-if __name__ == "__main__":
-    import uvicorn
-    from fastapi import FastAPI
-    from pydantic import BaseModel
-    
-    # Create FastAPI app for standalone mode
-    app = FastAPI(
-        title="TreeLine AI Agent",
-        description="Standalone AI agent service",
-        version="0.1.0"
-    )
-    
-    class GenerateRequest(BaseModel):
-        message: str
-        session_id: Optional[str] = None
-        include_sources: bool = False
+class AgentWarmup:
+    """Builds the global agent in a background thread and reports progress.
     
-    class GenerateResponse(BaseModel):
-        response: str
-        session_id: Optional[str]
-        sources_used: int
-        knowledge_base_size: int
-        fallback_used: Optional[bool] = None
-        error: Optional[str] = None
-    
-    @app.post("/generate", response_model=GenerateResponse)
-    async def generate_response(request: GenerateRequest):
-        """Generate a response using the AI agent."""
-        agent = get_agent()
-        result = agent.generate_response(
-            message=request.message,
-            session_id=request.session_id,
-            include_sources=request.include_sources
-        )
-        return GenerateResponse(**result)
+    Phases run in order: ``loading_models`` (LLM, embedding model and vector
+    store clients), ``ingesting`` (knowledge base directory) and ``ready``;
+    ``failed`` records the error. The service can bind its port and answer
+    health checks while this runs.
+    """
     
-    @app.get("/status")
-    async def get_status():
-        """Get agent status."""
-        agent = get_agent()
-        return agent.get_status()
+    def __init__(self):
+        self.phase = "pending"
+        self.error: Optional[str] = None
+        self.documents_loaded: Optional[int] = None
+        self.durations: Dict[str, float] = {}
+        self._phase_started_at = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
     
-    @app.get("/health")
-    async def health_check():
-        """Health check endpoint."""
-        return {"status": "healthy", "service": "treeline-ai-agent"}
+    @property
+    def ready(self) -> bool:
+        return self.phase == "ready"
     
-    agent = get_agent()
+    def start(self):
+        """Start warming up unless already started."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agent-warmup", daemon=True)
+                self._thread.start()
+    
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _enter(self, phase: str):
+        now = time.monotonic()
+        if self.phase not in ("pending", "ready", "failed"):
+            self.durations[self.phase] = round(now - self._phase_started_at, 3)
+        self.phase = phase
+        self._phase_started_at = now
+        logger.info(f"[WARMUP] {phase}")
+    
+    def _run(self):
+        global _agent_instance
+        try:
+            self._enter("loading_models")
+            agent = TreeLineAgent(initialize_knowledge_base=False)
+            self._enter("ingesting")
+            self.documents_loaded = agent.initialize_knowledge_base()
+            with _agent_lock:
+                _agent_instance = agent
+            self._enter("ready")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"[WARMUP] Failed during {self.phase}: {e}")
+            self._enter("failed")
+    
+    def status(self) -> Dict[str, Any]:
+        """Current phase, completed phase durations and any error."""
+        return {
+            "ready": self.ready,
+            "phase": self.phase,
+            "phase_seconds": round(time.monotonic() - self._phase_started_at, 3),
+            "durations": dict(self.durations),
+            "documents_loaded": self.documents_loaded,
+            "error": self.error
+        }
 
-    # Run the standalone service
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+
+warmup = AgentWarmup()
+
+
+# For standalone execution
+if __name__ == "__main__":
+    from agent.api import main
+    
+    main()
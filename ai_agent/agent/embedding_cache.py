@@ -0,0 +1,230 @@
+"""Persistent embedding cache in front of the embedding provider."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from agent.logger import TreeLineLogger
+
+logger = TreeLineLogger().logger
+
+CacheKey = Tuple[str, str, str]
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-level embedding cache: an in-memory LRU over a SQLite file.
+
+    Vectors are stored as float32 blobs keyed by (model name, kind, text hash),
+    where ``kind`` separates document embeddings from query embeddings. The
+    SQLite layer is bounded to ``max_entries`` rows and evicts the least
+    recently used rows once the bound is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 200_000,
+        memory_entries: int = 10_000
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, kind, text_hash)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+    def _remember(self, key: CacheKey, vector: np.ndarray):
+        """Insert into the in-memory LRU layer."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, kind: str, text_hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the given text hashes (misses are omitted)."""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for text_hash in text_hashes:
+                key = (model, kind, text_hash)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[text_hash] = vector
+                else:
+                    missing.append(text_hash)
+
+            # SQLite limits bound parameters per statement
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND kind = ? AND text_hash IN ({placeholders})",
+                    [model, kind, *batch]
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? "
+                        "WHERE model = ? AND kind = ? AND text_hash = ?",
+                        [(time.time(), model, kind, text_hash) for text_hash, _ in rows]
+                    )
+                for text_hash, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember((model, kind, text_hash), vector)
+                    found[text_hash] = vector
+            if missing:
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, kind: str, items: Dict[str, List[float]]):
+        """Store vectors keyed by text hash."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text_hash, values in items.items():
+                vector = np.asarray(values, dtype=np.float32)
+                self._remember((model, kind, text_hash), vector)
+                rows.append((model, kind, text_hash, vector.tobytes(), now))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, kind, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+            self._writes_since_eviction += len(rows)
+            # Checking the row count on every write is wasteful; do it periodically
+            if self._writes_since_eviction >= max(1, self.max_entries // 100):
+                self._writes_since_eviction = 0
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used rows beyond ``max_entries``. Caller holds the lock."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN ("
+                "SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+            self._conn.commit()
+            logger.info(f"[EMBED_CACHE] Evicted {excess} least recently used embeddings")
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed several queries in one provider call.
+
+    The OpenAI and sentence-transformers models used here embed queries and
+    documents the same way, so a batch of queries goes through
+    ``embed_documents``.
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return embeddings.embed_documents(texts)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from an ``EmbeddingCache``."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, kind: str, texts: List[str]) -> List[List[float]]:
+        """Embed texts, calling the provider only for cache misses."""
+        text_hashes = [hash_text(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, kind, list(dict.fromkeys(text_hashes)))
+
+        # Embed each distinct missing text once
+        pending: Dict[str, str] = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in cached:
+                pending.setdefault(text_hash, text)
+
+        computed: Dict[str, List[float]] = {}
+        if pending:
+            pending_texts = list(pending.values())
+            if kind == "query" and len(pending_texts) == 1:
+                vectors = [self.embeddings.embed_query(pending_texts[0])]
+            elif kind == "query":
+                vectors = embed_queries(self.embeddings, pending_texts)
+            else:
+                vectors = self.embeddings.embed_documents(pending_texts)
+            computed = dict(zip(pending, vectors))
+            self.cache.put_many(self.model_name, kind, computed)
+
+        self.hits += len(texts) - len(pending)
+        self.misses += len(pending)
+
+        results = []
+        for text_hash in text_hashes:
+            if text_hash in computed:
+                results.append(list(computed[text_hash]))
+            else:
+                results.append(cached[text_hash].tolist())
+        return results
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search documents."""
+        if not texts:
+            return []
+        return self._embed("document", texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query text."""
+        return self._embed("query", [text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several query texts with one provider call."""
+        if not texts:
+            return []
+        return self._embed("query", texts)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,198 @@
+"""Recall@k versus latency report for the vector index options.
+
+Copies the knowledge base vectors into candidate HNSW (Chroma) and IVF
+(NumPy) indexes and measures each against exact search, so index
+parameters can be chosen from numbers on our own corpus::
+
+    python -m agent.index_report --k 10 --hnsw-ef-search 16,32,64,128 --ivf-probes 1,2,4,8,16
+"""
+
+import argparse
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.numpy_store import NumpyVectorStore, _normalize
+from agent.vector_store import VectorStoreManager, hnsw_metadata_from_env
+
+
+@dataclass
+class ReportRow:
+    """One measured index configuration."""
+
+    index: str
+    params: str
+    recall: float
+    p50_ms: float
+    p95_ms: float
+
+    def format(self, k: int) -> str:
+        return f"{self.index:<8} {self.params:<36} recall@{k}={self.recall:.3f}  p50={self.p50_ms:.2f}ms  p95={self.p95_ms:.2f}ms"
+
+
+def load_corpus(manager: VectorStoreManager, page_size: int = 1000) -> Tuple[List[str], np.ndarray]:
+    """Read every chunk ID and embedding from the active backend."""
+    if manager.client is None:
+        rows = list(manager.vector_store._iter_rows())
+        return [chunk_id for chunk_id, _, _ in rows], np.stack([vector for _, vector, _ in rows])
+
+    collection = manager.client.get_collection(manager.collection_name)
+    ids, vectors, offset = [], [], 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+        offset += len(page["ids"])
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[List[int]]:
+    """Exact cosine top-k row indices for each query."""
+    scores = _normalize(queries) @ _normalize(corpus).T
+    top = np.argpartition(-scores, min(k, corpus.shape[0]) - 1, axis=1)[:, :k]
+    return [row[np.argsort(-scores[i, row])].tolist() for i, row in enumerate(top)]
+
+
+def recall_at_k(truth: Sequence[Sequence[int]], found: Sequence[Sequence[int]]) -> float:
+    """Mean fraction of the exact top-k that an approximate search returned."""
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    total = sum(len(t) for t in truth)
+    return hits / total if total else 1.0
+
+
+def measure(
+    index: str,
+    params: str,
+    search: Callable[[np.ndarray], List[int]],
+    queries: np.ndarray,
+    truth: List[List[int]]
+) -> ReportRow:
+    """Run every query through ``search`` and compare with the exact results."""
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return ReportRow(
+        index, params, recall_at_k(truth, found),
+        float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+    )
+
+
+def hnsw_rows(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    truth: List[List[int]],
+    k: int,
+    m: int,
+    construction_ef: int,
+    ef_search_values: Sequence[int]
+) -> List[ReportRow]:
+    """Build an in-memory Chroma collection per ``ef_search`` and measure it."""
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.EphemeralClient(Settings(anonymized_telemetry=False))
+    ids = [str(i) for i in range(len(corpus))]
+    rows = []
+    for ef_search in ef_search_values:
+        collection = client.create_collection(f"report-{uuid.uuid4().hex}", metadata={
+            "hnsw:space": "cosine",
+            "hnsw:M": m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": ef_search,
+        })
+        for start in range(0, len(corpus), 5000):
+            collection.add(ids=ids[start:start + 5000], embeddings=corpus[start:start + 5000].tolist())
+
+        def search(query: np.ndarray, collection=collection) -> List[int]:
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            return [int(i) for i in result["ids"][0]]
+
+        rows.append(measure("hnsw", f"M={m} ef_construction={construction_ef} ef_search={ef_search}", search, queries, truth))
+        client.delete_collection(collection.name)
+    return rows
+
+
+def ivf_rows(
+    ids: List[str],
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    truth: List[List[int]],
+    k: int,
+    lists: int,
+    probe_values: Sequence[int]
+) -> List[ReportRow]:
+    """Build a temporary IVF NumPy index and measure each probe count."""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = NumpyVectorStore(Path(directory) / "index", embedding=None, index_type="ivf", ivf_lists=lists)
+        store.upsert(ids, corpus, documents=[str(i) for i in range(len(ids))])
+        store.persist()
+        n_lists = store.metadata.get("ivf_lists", 1)
+        for probes in probe_values:
+            def search(query: np.ndarray, probes: int = probes) -> List[int]:
+                results = store.similarity_search_by_vector_with_score(query, k=k, probes=probes)
+                return [int(doc.page_content) for doc, _ in results]
+
+            rows.append(measure("ivf", f"lists={n_lists} probes={probes}", search, queries, truth))
+    return rows
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    hnsw = hnsw_metadata_from_env()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persist-directory", default="./data/vector_db")
+    parser.add_argument("--collection", default="treeline_knowledge_base")
+    parser.add_argument("--queries", type=int, default=200, help="stored vectors sampled as queries")
+    parser.add_argument("--queries-file", help="text file with one query per line (embedded with the model)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--hnsw-m", type=int, default=hnsw["hnsw:M"])
+    parser.add_argument("--hnsw-construction-ef", type=int, default=hnsw["hnsw:construction_ef"])
+    parser.add_argument("--hnsw-ef-search", type=_int_list, default=[hnsw["hnsw:search_ef"]])
+    parser.add_argument("--ivf-lists", type=int, default=0, help="0 picks about sqrt(n)")
+    parser.add_argument("--ivf-probes", type=_int_list, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--skip-hnsw", action="store_true")
+    parser.add_argument("--skip-ivf", action="store_true")
+    args = parser.parse_args(argv)
+
+    manager = VectorStoreManager(persist_directory=args.persist_directory, collection_name=args.collection)
+    ids, corpus = load_corpus(manager)
+    if not len(ids):
+        print("The knowledge base is empty.")
+        return
+    corpus = _normalize(corpus).astype(np.float32)
+
+    if args.queries_file:
+        lines = [line.strip() for line in Path(args.queries_file).read_text(encoding="utf-8").splitlines()]
+        queries = np.asarray(manager.embeddings.embed_documents([line for line in lines if line]), dtype=np.float32)
+    else:
+        rng = np.random.default_rng(0)
+        queries = corpus[rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)]
+    queries = _normalize(queries)
+
+    truth = exact_top_k(corpus, queries, args.k)
+    rows = [measure("exact", f"n={len(corpus)} dim={corpus.shape[1]}", lambda q: exact_top_k(corpus, q[None, :], args.k)[0], queries, truth)]
+    if not args.skip_hnsw:
+        rows += hnsw_rows(corpus, queries, truth, args.k, args.hnsw_m, args.hnsw_construction_ef, args.hnsw_ef_search)
+    if not args.skip_ivf:
+        rows += ivf_rows(ids, corpus, queries, truth, args.k, args.ivf_lists, args.ivf_probes)
+
+    print(f"{len(queries)} queries against {len(corpus)} vectors")
+    for row in rows:
+        print(row.format(args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Knowledge base ingestion job for multi-worker deployments.
+
+With ``AGENT_ROLE=reader`` service workers never write to the index; this
+job is the single writer. It applies knowledge base changes and publishes a
+new index generation after each run, which readers pick up atomically::
+
+    python -m agent.ingest                 # one run, e.g. from cron or a deploy hook
+    python -m agent.ingest --interval 60   # keep re-scanning every minute
+"""
+
+import argparse
+import os
+import time
+from typing import Optional, Sequence
+
+from agent.logger import TreeLineLogger
+from agent.vector_store import VectorStoreManager
+
+logger = TreeLineLogger().logger
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directory", default="./data/knowledge_base")
+    parser.add_argument("--interval", type=float, default=0, help="seconds between runs (0 runs once)")
+    args = parser.parse_args(argv)
+
+    manager = VectorStoreManager(
+        persist_directory=os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/vector_db"),
+        collection_name=os.getenv("COLLECTION_NAME", "treeline_knowledge_base"),
+        embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    )
+    while True:
+        loaded = manager.load_documents_from_directory(args.directory)
+        logger.info(f"[INGEST] {loaded} documents (re-)ingested, index generation {manager.generation}")
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
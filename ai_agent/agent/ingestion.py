@@ -0,0 +1,204 @@
+"""Batched, concurrent embedding and upsert of knowledge base chunks."""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from agent.logger import TreeLineLogger
+
+logger = TreeLineLogger().logger
+
+UpsertFn = Callable[[List[str], List[List[float]], List[Document]], None]
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    """Extract an HTTP status code from a provider exception, if any."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """True if the provider throttled the request (HTTP 429)."""
+    if _status_code(exc) == 429 or type(exc).__name__ == "RateLimitError":
+        return True
+    message = str(exc).lower()
+    return "429" in message or "rate limit" in message
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """True for errors worth retrying: throttling, timeouts, 5xx and dropped connections."""
+    if is_rate_limit_error(exc):
+        return True
+    status = _status_code(exc)
+    if status is not None and status >= 500:
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+class AdaptiveBackoff:
+    """Backoff delay shared by all embedding workers.
+
+    A 429 doubles the delay (with jitter) and makes every worker pause before
+    its next request; each success halves it again, so throughput recovers
+    once the provider stops throttling.
+    """
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Sleep for the current shared delay, if any."""
+        delay = self.delay
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_rate_limit(self):
+        """Increase the shared delay after a 429."""
+        with self._lock:
+            self.delay = min(self.max_delay, max(self.base_delay, self.delay * 2))
+            self.delay += random.uniform(0, self.delay * 0.1)
+
+    def on_success(self):
+        """Decay the shared delay after a successful request."""
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base_delay / 4 else 0.0
+
+
+@dataclass
+class IngestionResult:
+    """Outcome of an ingestion run."""
+
+    upserted_ids: List[str] = field(default_factory=list)
+    failed_ids: List[str] = field(default_factory=list)
+    failed_sources: Set[str] = field(default_factory=set)
+    dimension: Optional[int] = None
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+
+
+class IngestionEngine:
+    """Embeds chunks in batches over a bounded worker pool and upserts them.
+
+    Each batch is embedded in sub-batches; when a sub-batch fails the vectors
+    already obtained are kept and only the remaining chunks are retried
+    (with a smaller sub-batch after throttling), so nothing is embedded twice.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        upsert: UpsertFn,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        backoff: Optional[AdaptiveBackoff] = None
+    ):
+        self.embeddings = embeddings
+        self.upsert = upsert
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff or AdaptiveBackoff()
+        self._timing_lock = threading.Lock()
+
+    def ingest(self, chunks: Iterable[Tuple[str, Document]]) -> IngestionResult:
+        """Embed and upsert ``(chunk_id, document)`` pairs, returning which ones succeeded.
+
+        Batches are submitted as soon as they fill, so the producer (file
+        parsing and splitting) overlaps with embedding. At most twice
+        ``max_concurrency`` batches are in flight at any time.
+        """
+        result = IngestionResult()
+        in_flight: Dict[Future, Tuple[List[str], List[Document]]] = {}
+
+        def collect(done):
+            for future in done:
+                batch_ids, batch_docs = in_flight.pop(future)
+                try:
+                    future.result()
+                    result.upserted_ids.extend(batch_ids)
+                except Exception as e:
+                    logger.error(f"[INGEST] Batch of {len(batch_ids)} chunks failed: {e}")
+                    result.failed_ids.extend(batch_ids)
+                    result.failed_sources.update(
+                        doc.metadata.get("source", "") for doc in batch_docs
+                    )
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            def submit(batch_ids, batch_docs):
+                future = executor.submit(self._process_batch, batch_ids, batch_docs, result)
+                in_flight[future] = (batch_ids, batch_docs)
+                while len(in_flight) >= self.max_concurrency * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+            batch_ids: List[str] = []
+            batch_docs: List[Document] = []
+            for chunk_id, doc in chunks:
+                batch_ids.append(chunk_id)
+                batch_docs.append(doc)
+                if len(batch_ids) >= self.batch_size:
+                    submit(batch_ids, batch_docs)
+                    batch_ids, batch_docs = [], []
+            if batch_ids:
+                submit(batch_ids, batch_docs)
+
+            collect(wait(in_flight).done)
+
+        return result
+
+    def _process_batch(self, ids: List[str], documents: List[Document], result: IngestionResult):
+        """Embed one batch (resuming after partial failures) and upsert it."""
+        texts = [doc.page_content for doc in documents]
+        vectors: Dict[int, List[float]] = {}
+        sub_batch_size = len(texts)
+        attempts = 0
+
+        embed_start = time.perf_counter()
+        while len(vectors) < len(texts):
+            pending = [i for i in range(len(texts)) if i not in vectors]
+            chunk = pending[:sub_batch_size]
+            self.backoff.wait()
+            try:
+                embedded = self.embeddings.embed_documents([texts[i] for i in chunk])
+            except Exception as e:
+                attempts += 1
+                if attempts > self.max_retries or not is_transient_error(e):
+                    raise
+                if is_rate_limit_error(e):
+                    self.backoff.on_rate_limit()
+                    sub_batch_size = max(1, sub_batch_size // 2)
+                    logger.warning(
+                        f"[INGEST] Rate limited, retrying {len(pending)} chunks in sub-batches "
+                        f"of {sub_batch_size} after {self.backoff.delay:.1f}s"
+                    )
+                else:
+                    time.sleep(min(self.backoff.max_delay, self.backoff.base_delay * 2 ** attempts))
+                continue
+            self.backoff.on_success()
+            vectors.update(zip(chunk, embedded))
+        embed_seconds = time.perf_counter() - embed_start
+
+        ordered = [vectors[i] for i in range(len(texts))]
+        upsert_start = time.perf_counter()
+        self.upsert(ids, ordered, documents)
+        upsert_seconds = time.perf_counter() - upsert_start
+
+        with self._timing_lock:
+            result.embed_seconds += embed_seconds
+            result.upsert_seconds += upsert_seconds
+            if ordered and result.dimension is None:
+                result.dimension = len(ordered[0])
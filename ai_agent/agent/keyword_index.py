@@ -0,0 +1,157 @@
+"""In-process BM25 keyword index kept alongside the vector store."""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain.schema import Document
+
+# Identifiers such as ``ERR-404``, ``api.v2`` or ``reset_password`` stay one token
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._\-/:][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+_IDENTIFIER = re.compile(r"\d|[._\-/:]|[a-z][A-Z]|^[A-Z]{2,}$")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it "
+    "its me my no not of on or our so that the their then there these they this to "
+    "was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms of a text; compound identifiers also yield their parts."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+def keyword_ratio(query: str) -> float:
+    """Fraction of a query's content words that look like identifiers or codes."""
+    words = [word.strip("\"'`?!,;()") for word in query.split()]
+    words = [word for word in words if word and word.lower() not in STOPWORDS]
+    if not words:
+        return 0.0
+    return sum(1 for word in words if _IDENTIFIER.search(word)) / len(words)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Document]],
+    k: int = 60
+) -> List[Tuple[Document, float]]:
+    """Fuse ranked result lists, scoring each passage by ``sum(1 / (k + rank))``."""
+    scores: Dict[str, float] = defaultdict(float)
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            scores[document.page_content] += 1.0 / (k + rank)
+            documents.setdefault(document.page_content, document)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [(documents[content], score) for content, score in fused]
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of the knowledge base.
+
+    Postings are kept in memory and updated as chunks are upserted or deleted,
+    so a keyword search costs no embedding call and no storage round trip.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._documents: Dict[str, Document] = {}
+        self._term_counts: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, ids: Sequence[str], documents: Sequence[Document]):
+        """Index chunks, replacing any already indexed under the same IDs."""
+        with self._lock:
+            self.remove(ids)
+            for chunk_id, document in zip(ids, documents):
+                counts = Counter(tokenize(document.page_content))
+                self._documents[chunk_id] = document
+                self._term_counts[chunk_id] = counts
+                self._lengths[chunk_id] = sum(counts.values())
+                self._total_length += self._lengths[chunk_id]
+                for term, count in counts.items():
+                    self._postings[term][chunk_id] = count
+
+    def remove(self, ids: Iterable[str]):
+        """Drop chunks from the index."""
+        with self._lock:
+            for chunk_id in ids:
+                counts = self._term_counts.pop(chunk_id, None)
+                if counts is None:
+                    continue
+                del self._documents[chunk_id]
+                self._total_length -= self._lengths.pop(chunk_id)
+                for term in counts:
+                    postings = self._postings[term]
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def remove_source(self, source: str):
+        """Drop every chunk ingested from a source path."""
+        with self._lock:
+            self.remove([
+                chunk_id for chunk_id, document in self._documents.items()
+                if document.metadata.get("source") == source
+            ])
+
+    def clear(self):
+        """Drop every chunk."""
+        with self._lock:
+            self._documents.clear()
+            self._term_counts.clear()
+            self._lengths.clear()
+            self._postings.clear()
+            self._total_length = 0
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """Return the ``k`` best matching chunks with their BM25 scores."""
+        terms = set(tokenize(query))
+        with self._lock:
+            total = len(self._documents)
+            if not terms or not total:
+                return []
+            average_length = self._total_length / total
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, count in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] += idf * count * (self.k1 + 1) / (count + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for chunk_id, score in ranked:
+                document = self._documents[chunk_id]
+                if filter and any(document.metadata.get(key) != value for key, value in filter.items()):
+                    continue
+                results.append((document, score))
+                if len(results) == k:
+                    break
+            return results
@@ -0,0 +1,239 @@
+"""Parallel parsing and chunking of knowledge base files."""
+
+import hashlib
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
+
+from agent.manifest import compute_content_hash
+
+SUPPORTED_EXTENSIONS = {'.txt', '.md', '.json'}
+
+# One splitter per worker process, built on first use
+_splitters = {}
+
+
+def make_chunk_id(source: str, chunk_index: int, content: str) -> str:
+    """Derive a deterministic chunk ID from its source, position and content."""
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    key = f"{source}\x00{chunk_index}\x00{content_hash}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def build_text_splitter(chunk_size: int = 1000, chunk_overlap: int = 200) -> RecursiveCharacterTextSplitter:
+    """Create the text splitter used for knowledge base documents."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+
+def split_document(
+    document: Document,
+    text_splitter: RecursiveCharacterTextSplitter
+) -> Tuple[List[str], List[Document]]:
+    """Split one document into chunks with deterministic IDs."""
+    source = document.metadata.get("source", "")
+    ids = []
+    chunks = []
+    for chunk_index, chunk in enumerate(text_splitter.split_documents([document])):
+        chunk.metadata["chunk_index"] = chunk_index
+        ids.append(make_chunk_id(source, chunk_index, chunk.page_content))
+        chunks.append(chunk)
+    return ids, chunks
+
+
+@dataclass
+class ParsedFile:
+    """Result of parsing and chunking one knowledge base file.
+
+    Small files carry their chunks in ``chunks``; large files carry a lazy
+    ``chunk_stream`` instead so their content is never held in memory at once.
+    """
+
+    source: str
+    content_hash: Optional[str] = None
+    unchanged: bool = False
+    chunk_ids: List[str] = field(default_factory=list)
+    chunks: List[Document] = field(default_factory=list)
+    chunk_stream: Optional[Iterator[Tuple[str, Document]]] = None
+    error: Optional[str] = None
+
+    def iter_chunks(self) -> Iterator[Tuple[str, Document]]:
+        """Yield ``(chunk_id, chunk)`` pairs, releasing them as they are consumed."""
+        if self.chunk_stream is not None:
+            yield from self.chunk_stream
+            return
+        chunk_ids, chunks = self.chunk_ids, self.chunks
+        self.chunk_ids, self.chunks = [], []
+        yield from zip(chunk_ids, chunks)
+
+
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Return this process's splitter for the given settings."""
+    key = (chunk_size, chunk_overlap)
+    if key not in _splitters:
+        _splitters[key] = build_text_splitter(chunk_size, chunk_overlap)
+    return _splitters[key]
+
+
+def _file_metadata(file_path: Path) -> dict:
+    """Metadata attached to every chunk of a file."""
+    return {
+        "source": str(file_path),
+        "filename": file_path.name,
+        "file_type": file_path.suffix
+    }
+
+
+def parse_file(
+    path: str,
+    known_hash: Optional[str] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200
+) -> ParsedFile:
+    """Read, hash and chunk a file. Skips splitting if its hash is ``known_hash``."""
+    file_path = Path(path)
+    try:
+        raw = file_path.read_bytes()
+        content_hash = compute_content_hash(raw)
+        if content_hash == known_hash:
+            return ParsedFile(source=path, content_hash=content_hash, unchanged=True)
+
+        document = Document(page_content=raw.decode('utf-8'), metadata=_file_metadata(file_path))
+        del raw
+        chunk_ids, chunks = split_document(document, _get_splitter(chunk_size, chunk_overlap))
+        return ParsedFile(
+            source=path,
+            content_hash=content_hash,
+            chunk_ids=chunk_ids,
+            chunks=chunks
+        )
+    except Exception as e:
+        return ParsedFile(source=path, error=str(e))
+
+
+def compute_file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """Hash a file's content without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_text_segments(path: str, segment_size: int = 1 << 20) -> Iterator[str]:
+    """Yield a text file in segments of roughly ``segment_size`` characters.
+
+    Segments end on a paragraph (or line) break where possible so the splitter
+    sees natural boundaries.
+    """
+    remainder = ""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(segment_size)
+            if not block:
+                break
+            text = remainder + block
+            cut = text.rfind("\n\n")
+            if cut <= 0:
+                cut = text.rfind("\n")
+            if cut <= 0:
+                remainder = ""
+                yield text
+            else:
+                remainder = text[cut:]
+                yield text[:cut]
+    if remainder.strip():
+        yield remainder
+
+
+def stream_large_file(
+    path: str,
+    known_hash: Optional[str] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    segment_size: int = 1 << 20
+) -> ParsedFile:
+    """Hash a large file and chunk it lazily, one segment at a time."""
+    file_path = Path(path)
+    try:
+        content_hash = compute_file_hash(path)
+    except Exception as e:
+        return ParsedFile(source=path, error=str(e))
+    if content_hash == known_hash:
+        return ParsedFile(source=path, content_hash=content_hash, unchanged=True)
+
+    def chunk_stream() -> Iterator[Tuple[str, Document]]:
+        splitter = _get_splitter(chunk_size, chunk_overlap)
+        chunk_index = 0
+        for segment in iter_text_segments(path, segment_size):
+            for text in splitter.split_text(segment):
+                metadata = _file_metadata(file_path)
+                metadata["chunk_index"] = chunk_index
+                yield (
+                    make_chunk_id(path, chunk_index, text),
+                    Document(page_content=text, metadata=metadata)
+                )
+                chunk_index += 1
+
+    return ParsedFile(source=path, content_hash=content_hash, chunk_stream=chunk_stream())
+
+
+def iter_parsed_files(
+    files: Iterable[Tuple[str, Optional[str], int]],
+    workers: int = 1,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    stream_threshold: int = 8 << 20
+) -> Iterator[ParsedFile]:
+    """Parse ``(path, known_hash, size)`` entries, yielding results as they complete.
+
+    With more than one worker, files are parsed in a process pool so CPU-bound
+    splitting runs on every core while the caller embeds earlier results. Only
+    ``2 * workers`` files are in flight at once, and files larger than
+    ``stream_threshold`` bytes are chunked lazily in this process, so memory
+    use does not grow with the size of the corpus.
+    """
+    small_files = []
+    large_files = []
+    for path, known_hash, size in files:
+        (large_files if size > stream_threshold else small_files).append((path, known_hash))
+
+    if workers <= 1 or len(small_files) <= 1:
+        for path, known_hash in small_files:
+            yield parse_file(path, known_hash, chunk_size, chunk_overlap)
+        for path, known_hash in large_files:
+            yield stream_large_file(path, known_hash, chunk_size, chunk_overlap)
+        return
+
+    # "spawn" avoids forking a process that already runs embedding threads
+    context = multiprocessing.get_context("spawn")
+    pending = iter(small_files)
+    with ProcessPoolExecutor(max_workers=min(workers, len(small_files)), mp_context=context) as executor:
+        in_flight = set()
+
+        def refill():
+            for path, known_hash in pending:
+                in_flight.add(executor.submit(parse_file, path, known_hash, chunk_size, chunk_overlap))
+                if len(in_flight) >= workers * 2:
+                    break
+
+        refill()
+        # Large files are streamed here while the pool works on small ones
+        for path, known_hash in large_files:
+            yield stream_large_file(path, known_hash, chunk_size, chunk_overlap)
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                yield future.result()
+            refill()
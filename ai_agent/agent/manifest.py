@@ -0,0 +1,105 @@
+"""Ingestion manifest for incremental knowledge base loading."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from agent.logger import TreeLineLogger
+
+logger = TreeLineLogger().logger
+
+
+def compute_content_hash(content: bytes) -> str:
+    """Return the SHA-256 hex digest of a file's raw content."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class IngestionManifest:
+    """Tracks which knowledge base files are embedded, keyed by path and content hash.
+
+    Each entry records the file's ``mtime``/``size`` (fast path), its content
+    hash (slow path) and the chunk IDs written to the vector store, so changed
+    or deleted files can have their chunks removed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = Path(manifest_path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        """Load the manifest from disk, starting empty if it is missing or unreadable."""
+        if not self.manifest_path.exists():
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.entries = data.get("files", {})
+        except Exception as e:
+            logger.warning(f"[MANIFEST] Ignoring unreadable manifest {self.manifest_path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Persist the manifest atomically."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(self.manifest_path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "files": self.entries}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        """Return the entry for a source path, if any."""
+        return self.entries.get(source)
+
+    def sources(self) -> Set[str]:
+        """Return every source path currently tracked."""
+        return set(self.entries)
+
+    def matches_stat(self, source: str, stat: os.stat_result) -> bool:
+        """Fast path: True if the file's mtime and size are unchanged."""
+        entry = self.entries.get(source)
+        return (
+            entry is not None
+            and entry.get("mtime") == stat.st_mtime
+            and entry.get("size") == stat.st_size
+        )
+
+    def matches_hash(self, source: str, content_hash: str) -> bool:
+        """Slow path: True if the file's content hash is unchanged."""
+        entry = self.entries.get(source)
+        return entry is not None and entry.get("content_hash") == content_hash
+
+    def touch(self, source: str, stat: os.stat_result):
+        """Refresh the stat fields of an entry whose content did not change."""
+        entry = self.entries[source]
+        entry["mtime"] = stat.st_mtime
+        entry["size"] = stat.st_size
+
+    def update(
+        self,
+        source: str,
+        stat: os.stat_result,
+        content_hash: str,
+        chunk_ids: List[str]
+    ):
+        """Record a freshly ingested file."""
+        self.entries[source] = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "content_hash": content_hash,
+            "chunk_ids": list(chunk_ids),
+        }
+
+    def remove(self, source: str) -> List[str]:
+        """Forget a source and return the chunk IDs it owned."""
+        entry = self.entries.pop(source, None)
+        return list(entry.get("chunk_ids", [])) if entry else []
+
+    def clear(self):
+        """Forget every entry."""
+        self.entries = {}
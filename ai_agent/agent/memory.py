@@ -0,0 +1,200 @@
+"""Per-session conversation memory with a bounded, summarized context."""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+
+from agent.logger import TreeLineLogger
+from agent.tokens import TokenCounter
+
+logger = TreeLineLogger().logger
+
+
+@dataclass
+class ConversationTurn:
+    """One customer message and the agent's answer."""
+
+    user_message: str
+    ai_response: str
+    tokens: int = 0
+
+    def format(self) -> str:
+        """Render the turn for the prompt."""
+        return f"Customer: {self.user_message}\nTreeLine: {self.ai_response}"
+
+
+@dataclass
+class SessionMemory:
+    """Recent turns of a session plus a summary of everything older."""
+
+    turns: List[ConversationTurn] = field(default_factory=list)
+    summary: str = ""
+    # Conversation rows of the session accounted for: loaded or added here
+    known_turns: int = 0
+    checked_at: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ConversationMemory:
+    """LRU of session histories backed by the ``conversations`` table.
+
+    A session missing from memory is loaded once from the database (written by
+    the backend). Recent turns are kept verbatim while they fit in
+    ``token_budget``; older turns are folded into a rolling summary with
+    ``summarize``, once, so the history fed to the prompt stays the same size
+    however long the conversation grows.
+
+    Turns of a session may be served by other worker processes. At most every
+    ``sync_seconds`` a cached session's row count is compared with the
+    table, and the session is reloaded when the table has turns it has not
+    seen.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, str], str],
+        database_url: Optional[str] = None,
+        max_sessions: int = 1000,
+        token_budget: int = 1000,
+        load_limit: int = 50,
+        model_name: str = "gpt-4-turbo",
+        count_tokens: Optional[Callable[[str], int]] = None,
+        sync_seconds: float = 1.0
+    ):
+        self.summarize = summarize
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self.load_limit = load_limit
+        self.sync_seconds = sync_seconds
+
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._engine = None
+        if database_url:
+            self._engine = create_engine(database_url, pool_pre_ping=True)
+
+        self.count_tokens = count_tokens or TokenCounter(model_name)
+
+    def _load_turns(self, session_id: str) -> Tuple[List[ConversationTurn], int]:
+        """Read a session's most recent turns, and its total turn count, from the conversations table."""
+        if self._engine is None:
+            return [], 0
+        try:
+            with self._engine.connect() as conn:
+                rows = conn.execute(
+                    text(
+                        "SELECT user_message, ai_response, COUNT(*) OVER () FROM conversations "
+                        "WHERE session_id = :session_id ORDER BY created_at DESC LIMIT :limit"
+                    ),
+                    {"session_id": session_id, "limit": self.load_limit}
+                ).fetchall()
+        except Exception as e:
+            logger.warning(f"[MEMORY] Could not load history for session {session_id}: {e}")
+            return [], 0
+        turns = [
+            ConversationTurn(user_message, ai_response, self.count_tokens(f"{user_message}\n{ai_response}"))
+            for user_message, ai_response, _ in reversed(rows)
+        ]
+        return turns, rows[0][2] if rows else 0
+
+    def _count_turns(self, session_id: str) -> Optional[int]:
+        """Number of the session's rows in the conversations table, or ``None`` if unknown."""
+        try:
+            with self._engine.connect() as conn:
+                return conn.execute(
+                    text("SELECT COUNT(*) FROM conversations WHERE session_id = :session_id"),
+                    {"session_id": session_id}
+                ).scalar()
+        except Exception as e:
+            logger.warning(f"[MEMORY] Could not check history for session {session_id}: {e}")
+            return None
+
+    def _is_stale(self, session: SessionMemory, session_id: str) -> bool:
+        """Whether other workers added turns to a cached session since it was loaded."""
+        if self._engine is None or time.monotonic() - session.checked_at < self.sync_seconds:
+            return False
+        session.checked_at = time.monotonic()
+        count = self._count_turns(session_id)
+        return count is not None and count > session.known_turns
+
+    def _session(self, session_id: str) -> SessionMemory:
+        """Return a session's memory, loading it on first use or when it is stale."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+        if session is not None and not self._is_stale(session, session_id):
+            return session
+
+        turns, known_turns = self._load_turns(session_id)
+        loaded = SessionMemory(turns=turns, known_turns=known_turns)
+        with self._lock:
+            if session is not None and self._sessions.get(session_id) is session:
+                self._sessions[session_id] = loaded
+            session = self._sessions.setdefault(session_id, loaded)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def add_turn(self, session_id: str, user_message: str, ai_response: str):
+        """Record a completed turn."""
+        session = self._session(session_id)
+        turn = ConversationTurn(
+            user_message, ai_response, self.count_tokens(f"{user_message}\n{ai_response}")
+        )
+        with session.lock:
+            session.turns.append(turn)
+            session.known_turns += 1
+
+    def _compact(self, session: SessionMemory):
+        """Fold the oldest turns into the summary until the rest fit the budget. Caller holds the lock."""
+        kept_tokens = 0
+        keep_from = len(session.turns)
+        for index in range(len(session.turns) - 1, -1, -1):
+            kept_tokens += session.turns[index].tokens
+            if kept_tokens > self.token_budget:
+                break
+            keep_from = index
+
+        overflow = session.turns[:keep_from]
+        if not overflow:
+            return
+        try:
+            session.summary = self.summarize(
+                session.summary, "\n".join(turn.format() for turn in overflow)
+            ).strip()
+        except Exception as e:
+            # Drop the overflow rather than exceed the budget
+            logger.warning(f"[MEMORY] Summarization failed, dropping {len(overflow)} old turns: {e}")
+        session.turns = session.turns[keep_from:]
+
+    def get_history(self, session_id: Optional[str]) -> str:
+        """Return the summary and recent turns of a session, formatted for the prompt."""
+        if not session_id:
+            return ""
+        session = self._session(session_id)
+        with session.lock:
+            self._compact(session)
+            parts = []
+            if session.summary:
+                parts.append(f"Summary of earlier conversation: {session.summary}")
+            parts.extend(turn.format() for turn in session.turns)
+        return "\n".join(parts)
+
+    def last_user_message(self, session_id: Optional[str]) -> Optional[str]:
+        """Return the customer's previous message in a session, if any."""
+        if not session_id:
+            return None
+        session = self._session(session_id)
+        with session.lock:
+            return session.turns[-1].user_message if session.turns else None
+
+    def clear(self, session_id: str):
+        """Forget a session's in-memory history."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
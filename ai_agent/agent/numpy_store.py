@@ -0,0 +1,503 @@
+"""In-process vector store backed by memory-mapped NumPy arrays."""
+
+import itertools
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from agent.loader import make_chunk_id
+from agent.logger import TreeLineLogger
+
+logger = TreeLineLogger().logger
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, leaving zero rows untouched."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids for an IVF coarse quantizer."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), n_lists * 256), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(n_lists):
+            members = sample[assignment == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids.astype(np.float32)
+
+
+def _load_array(path: Path, dtype) -> np.ndarray:
+    """Memory-map an array file; empty files cannot be mapped and load as empty arrays."""
+    if path.suffix == ".npy":
+        return np.load(path, mmap_mode="r")
+    if path.stat().st_size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class NumpyVectorStore(VectorStore):
+    """Brute-force cosine search over a contiguous float32 matrix.
+
+    Scores are cosine distances (``1 - cosine similarity``, lower is closer)
+    so that, as with Chroma, ``similarity_search_with_score`` results rank
+    ascending.
+
+    The index directory holds the L2-normalized vectors (``vectors.npy``),
+    the chunk texts as one UTF-8 blob with row offsets, and the metadata as
+    a small table of distinct dicts referenced by row. Every array is
+    memory-mapped at startup, so loading costs no copy and the OS page cache
+    is shared between worker processes.
+
+    With ``index_type="ivf"`` the persisted rows are also partitioned into
+    ``ivf_lists`` k-means clusters and a search only scores the rows of the
+    ``ivf_probes`` clusters closest to the query, trading recall for
+    latency on large knowledge bases.
+
+    Writes go to an in-memory overlay (new rows plus a mask of deleted ones)
+    until ``persist`` writes a new index version: a subdirectory of the store
+    directory, named by the ``CURRENT`` pointer file. Also exposes the subset of the
+    Chroma collection API that ``VectorStoreManager`` uses (``upsert``,
+    ``delete``, ``get``, ``count``).
+    """
+
+    FILES = ("vectors.npy", "offsets.npy", "texts.bin", "meta_idx.npy", "chunk_index.npy", "ids.json", "metadata.json")
+    IVF_FILES = ("ivf_centroids.npy", "ivf_order.npy", "ivf_offsets.npy")
+    POINTER = "CURRENT"
+
+    def __init__(
+        self,
+        directory: Path,
+        embedding: Embeddings,
+        name: str = "treeline_knowledge_base",
+        index_type: str = "flat",
+        ivf_lists: int = 0,
+        ivf_probes: int = 8,
+        read_only: bool = False
+    ):
+        self.directory = Path(directory)
+        self.embedding = embedding
+        self.name = name
+        if index_type not in ("flat", "ivf"):
+            raise ValueError(f"Unknown index type: {index_type}")
+        self.index_type = index_type
+        # 0 picks about sqrt(n) lists when the index is built
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self._lock = threading.RLock()
+        self._load()
+        if self.index_type == "ivf" and self._ivf_centroids is None and len(self._ids) > 1 and not read_only:
+            # Index written as flat before IVF was configured
+            self._dirty = True
+            self.persist()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Collection-level metadata, as reported by ``get_collection_info``."""
+        metadata = {"vector_backend": "numpy", "dimension": self.dimension, "index_type": self.index_type}
+        if self._ivf_centroids is not None:
+            metadata.update(ivf_lists=len(self._ivf_centroids), ivf_probes=self.ivf_probes)
+        return metadata
+
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension, or 0 while the store is empty."""
+        if self._vectors.shape[0]:
+            return int(self._vectors.shape[1])
+        if self._added:
+            return int(next(iter(self._added.values()))[0].shape[0])
+        return 0
+
+    # Loading and persistence
+
+    def _index_dir(self) -> Path:
+        """Directory of the current index version.
+
+        ``CURRENT`` names it; indexes written before versioning keep their
+        files in the store directory itself.
+        """
+        try:
+            version = (self.directory / self.POINTER).read_text(encoding="utf-8").strip()
+        except OSError:
+            return self.directory
+        return self.directory / version
+
+    def _load(self):
+        """Memory-map the index files, or start empty."""
+        with self._lock:
+            index_dir = self._index_dir()
+            self._added: Dict[str, Tuple[np.ndarray, Document]] = {}
+            self._added_matrix: Optional[np.ndarray] = None
+            self._dirty = False
+            if not all((index_dir / name).exists() for name in self.FILES):
+                self._vectors = np.empty((0, 0), dtype=np.float32)
+                self._offsets = np.zeros(1, dtype=np.int64)
+                self._texts = np.empty(0, dtype=np.uint8)
+                self._meta_idx = np.empty(0, dtype=np.int32)
+                self._chunk_index = np.empty(0, dtype=np.int32)
+                self._ids: List[str] = []
+                self._metadata_table: List[dict] = []
+            else:
+                self._vectors = _load_array(index_dir / "vectors.npy", np.float32)
+                self._offsets = _load_array(index_dir / "offsets.npy", np.int64)
+                self._texts = _load_array(index_dir / "texts.bin", np.uint8)
+                self._meta_idx = _load_array(index_dir / "meta_idx.npy", np.int32)
+                self._chunk_index = _load_array(index_dir / "chunk_index.npy", np.int32)
+                self._ids = json.loads((index_dir / "ids.json").read_text(encoding="utf-8"))
+                self._metadata_table = json.loads((index_dir / "metadata.json").read_text(encoding="utf-8"))
+            self._ivf_centroids = self._ivf_order = self._ivf_offsets = None
+            if self.index_type == "ivf" and all((index_dir / name).exists() for name in self.IVF_FILES):
+                self._ivf_centroids = np.load(index_dir / "ivf_centroids.npy", mmap_mode="r")
+                self._ivf_order = np.load(index_dir / "ivf_order.npy", mmap_mode="r")
+                self._ivf_offsets = np.load(index_dir / "ivf_offsets.npy", mmap_mode="r")
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._alive = np.ones(len(self._ids), dtype=bool)
+        logger.info(f"[NUMPY_INDEX] Mapped {len(self._ids)} vectors from {index_dir}")
+
+    def _row_document(self, row: int) -> Document:
+        """Rebuild the document stored at a row of the mapped segment."""
+        text = bytes(self._texts[self._offsets[row]:self._offsets[row + 1]]).decode("utf-8")
+        metadata = dict(self._metadata_table[self._meta_idx[row]])
+        if self._chunk_index[row] >= 0:
+            metadata["chunk_index"] = int(self._chunk_index[row])
+        return Document(page_content=text, metadata=metadata)
+
+    def _iter_rows(self) -> Iterable[Tuple[str, np.ndarray, Document]]:
+        """Yield every live ``(id, vector, document)``, mapped rows first."""
+        for row in np.flatnonzero(self._alive):
+            yield self._ids[row], self._vectors[row], self._row_document(row)
+        for chunk_id, (vector, document) in self._added.items():
+            yield chunk_id, vector, document
+
+    def persist(self):
+        """Write pending changes to disk and re-map the files."""
+        with self._lock:
+            if not self._dirty:
+                return
+            ids, vectors, blobs, meta_idx, chunk_index = [], [], [], [], []
+            table: Dict[str, int] = {}
+            for chunk_id, vector, document in self._iter_rows():
+                metadata = dict(document.metadata)
+                chunk_index.append(int(metadata.pop("chunk_index", -1)))
+                key = json.dumps(metadata, sort_keys=True)
+                meta_idx.append(table.setdefault(key, len(table)))
+                ids.append(chunk_id)
+                vectors.append(vector)
+                blobs.append(document.page_content.encode("utf-8"))
+
+            previous_dir = self._index_dir()
+            version = f"v{uuid.uuid4().hex[:12]}"
+            version_dir = self.directory / version
+            version_dir.mkdir(parents=True)
+            matrix = np.stack(vectors).astype(np.float32) if vectors else np.empty((0, 0), dtype=np.float32)
+            np.save(version_dir / "vectors.npy", matrix)
+            np.save(version_dir / "offsets.npy", np.concatenate([[0], np.cumsum([len(b) for b in blobs])]).astype(np.int64))
+            (version_dir / "texts.bin").write_bytes(b"".join(blobs))
+            np.save(version_dir / "meta_idx.npy", np.asarray(meta_idx, dtype=np.int32))
+            np.save(version_dir / "chunk_index.npy", np.asarray(chunk_index, dtype=np.int32))
+            (version_dir / "ids.json").write_text(json.dumps(ids), encoding="utf-8")
+            (version_dir / "metadata.json").write_text(
+                json.dumps([json.loads(key) for key in table]), encoding="utf-8"
+            )
+            if self.index_type == "ivf":
+                self._write_ivf(version_dir, matrix)
+
+            # Readers never see a half-written index: the pointer is replaced
+            # atomically, and the previous version is kept for readers that
+            # read the old pointer just before the swap
+            pointer_tmp = self.directory / (self.POINTER + ".tmp")
+            pointer_tmp.write_text(version, encoding="utf-8")
+            os.replace(pointer_tmp, self.directory / self.POINTER)
+            self._remove_old_versions(keep={version, previous_dir.name})
+            if previous_dir != self.directory:
+                # Unversioned files are superseded once a versioned index was replaced
+                for name in self.FILES + self.IVF_FILES:
+                    (self.directory / name).unlink(missing_ok=True)
+            self._load()
+
+    def _remove_old_versions(self, keep: set):
+        """Delete index versions other than ``keep`` (and any left by an interrupted persist)."""
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name.startswith("v") and path.name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _write_ivf(self, directory: Path, matrix: np.ndarray):
+        """Cluster the rows and write the inverted lists."""
+        n_lists = self.ivf_lists or int(np.sqrt(len(matrix)))
+        if n_lists < 2 or len(matrix) < n_lists:
+            return
+        centroids = _kmeans(matrix, n_lists)
+        assignment = np.concatenate([
+            np.argmax(matrix[start:start + 65536] @ centroids.T, axis=1)
+            for start in range(0, len(matrix), 65536)
+        ])
+        order = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+        np.save(directory / "ivf_centroids.npy", centroids)
+        np.save(directory / "ivf_order.npy", order)
+        np.save(directory / "ivf_offsets.npy", offsets)
+        logger.info(f"[NUMPY_INDEX] Built IVF index with {n_lists} lists over {len(matrix)} vectors")
+
+    def _candidate_rows(self, query: np.ndarray, probes: Optional[int]) -> np.ndarray:
+        """Segment rows in the IVF lists closest to the query."""
+        closest = np.argpartition(-(self._ivf_centroids @ query), probes - 1)[:probes]
+        return np.concatenate([
+            self._ivf_order[self._ivf_offsets[list_id]:self._ivf_offsets[list_id + 1]] for list_id in closest
+        ])
+
+    # Collection-style writes
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        documents: Optional[List[str]] = None
+    ):
+        """Insert or replace pre-embedded chunks."""
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        dimension = self.dimension
+        if dimension and vectors.shape[1] != dimension:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {dimension}")
+        metadatas = metadatas or [{}] * len(ids)
+        documents = documents or [""] * len(ids)
+        with self._lock:
+            for chunk_id, vector, metadata, text in zip(ids, vectors, metadatas, documents):
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    self._alive[row] = False
+                self._added[chunk_id] = (vector, Document(page_content=text, metadata=dict(metadata or {})))
+            self._added_matrix = None
+            self._dirty = True
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete chunks by ID and/or metadata equality filter."""
+        with self._lock:
+            for chunk_id in ids or []:
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    self._alive[row] = False
+                self._added.pop(chunk_id, None)
+            if where:
+                self._alive &= ~self._segment_mask(where)
+                for chunk_id in [cid for cid, (_, doc) in self._added.items() if self._matches(doc, where)]:
+                    del self._added[chunk_id]
+            self._added_matrix = None
+            self._dirty = True
+        return True
+
+    def reset(self):
+        """Delete every chunk and the index files."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._load()
+
+    def count(self) -> int:
+        """Number of live chunks."""
+        with self._lock:
+            return int(self._alive.sum()) + len(self._added)
+
+    def get(self, include: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0) -> Dict[str, list]:
+        """Page through chunks, in the shape returned by a Chroma collection.
+
+        Mapped rows come first, then the overlay; only the rows of the page
+        are decoded.
+        """
+        end = offset + limit if limit is not None else None
+        with self._lock:
+            live = np.flatnonzero(self._alive)
+            page = [(self._ids[row], self._row_document(row)) for row in live[offset:end]]
+            if end is None or end > len(live):
+                overlay = itertools.islice(
+                    self._added.items(), max(0, offset - len(live)), None if end is None else end - len(live)
+                )
+                page.extend((chunk_id, document) for chunk_id, (_, document) in overlay)
+        return {
+            "ids": [chunk_id for chunk_id, _ in page],
+            "documents": [document.page_content for _, document in page],
+            "metadatas": [document.metadata for _, document in page]
+        }
+
+    # Search
+
+    @staticmethod
+    def _matches(document: Document, filter: dict) -> bool:
+        return all(document.metadata.get(key) == value for key, value in filter.items())
+
+    def _segment_mask(self, filter: dict) -> np.ndarray:
+        """Rows of the mapped segment whose metadata matches an equality filter."""
+        mask = np.ones(len(self._ids), dtype=bool)
+        other = {key: value for key, value in filter.items() if key != "chunk_index"}
+        if "chunk_index" in filter:
+            mask &= self._chunk_index == int(filter["chunk_index"])
+        if other:
+            matching = [
+                index for index, metadata in enumerate(self._metadata_table)
+                if all(metadata.get(key) == value for key, value in other.items())
+            ]
+            mask &= np.isin(self._meta_idx, matching)
+        return mask
+
+    QUERY_BLOCK = 64
+
+    def _segment_scores(self, queries: np.ndarray, alive: np.ndarray, probes: Optional[int]) -> np.ndarray:
+        """Scores of the mapped rows for a block of queries; rows never scored are ``-inf``."""
+        probes = probes or self.ivf_probes
+        if self._ivf_centroids is None or probes >= len(self._ivf_centroids):
+            return np.where(alive, queries @ self._vectors.T, -np.inf)
+        # Only rows in the probed IVF lists are scored
+        scores = np.full((len(queries), len(self._ids)), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            candidates = self._candidate_rows(query, probes)
+            scores[row, candidates] = np.where(alive[candidates], self._vectors[candidates] @ query, -np.inf)
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int, added_ids: List[str]) -> List[Tuple[Document, float]]:
+        """Documents of the ``k`` highest similarities of one query, with their cosine distances.
+
+        Mapped rows come first in the score vector.
+        """
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for index in top:
+            if scores[index] == -np.inf:
+                break
+            if index < len(self._ids):
+                document = self._row_document(index)
+            else:
+                document = self._added[added_ids[index - len(self._ids)]][1]
+            results.append((document, 1.0 - float(scores[index])))
+        return results
+
+    def similarity_search_by_vectors_with_score(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        probes: Optional[int] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Top-k rows by cosine distance for each of several embeddings (lower is closer).
+
+        Queries are scored as a matrix product, ``QUERY_BLOCK`` queries at a
+        time. ``probes`` overrides ``ivf_probes``; it has no effect on a flat
+        index.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        results = []
+        with self._lock:
+            alive = self._alive & self._segment_mask(filter) if filter else self._alive
+            added_ids = list(self._added)
+            overlay_mask = None
+            if added_ids:
+                if self._added_matrix is None:
+                    self._added_matrix = np.stack([self._added[cid][0] for cid in added_ids])
+                if filter:
+                    overlay_mask = np.array([self._matches(self._added[cid][1], filter) for cid in added_ids])
+
+            for start in range(0, len(queries), self.QUERY_BLOCK):
+                block = queries[start:start + self.QUERY_BLOCK]
+                scores = []
+                if len(self._ids):
+                    scores.append(self._segment_scores(block, alive, probes))
+                if added_ids:
+                    overlay = block @ self._added_matrix.T
+                    scores.append(overlay if overlay_mask is None else np.where(overlay_mask, overlay, -np.inf))
+                if not scores:
+                    results.extend([] for _ in block)
+                    continue
+                results.extend(self._top_k(row, k, added_ids) for row in np.concatenate(scores, axis=1))
+        return results
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        probes: Optional[int] = None
+    ) -> List[Tuple[Document, float]]:
+        """Top-k rows by cosine distance to an embedding (lower is closer)."""
+        return self.similarity_search_by_vectors_with_score([embedding], k=k, filter=filter, probes=probes)[0]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Top-k documents with their cosine distance to the query."""
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        """Top-k documents most similar to the query."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        """Top-k documents most similar to an embedding."""
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        """Relevance is the cosine similarity, clipped to [0, 1]."""
+        return lambda distance: max(0.0, min(1.0, 1.0 - distance))
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Embed and store texts.
+
+        Without ``ids``, chunk IDs are derived from source, position and
+        content like ingested chunks, so they never collide with other rows.
+        """
+        texts = list(texts)
+        if ids is None:
+            ids = [
+                make_chunk_id((metadata or {}).get("source", ""), (metadata or {}).get("chunk_index", i), text)
+                for i, (text, metadata) in enumerate(zip(texts, metadatas or [{}] * len(texts)))
+            ]
+        self.upsert(ids, self.embedding.embed_documents(texts), metadatas, texts)
+        self.persist()
+        return ids
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        persist_directory: str = "./data/vector_db/numpy_index",
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        """Create a store in ``persist_directory`` from texts."""
+        store = cls(Path(persist_directory), embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
@@ -1,27 +1,54 @@
 """RAG (Retrieval-Augmented Generation) pipeline implementation."""
 
+import asyncio
 import os
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 
-from langchain.chains import RetrievalQA
+import numpy as np
 from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain.schema import Document
 
+from .context import ContextBuilder
+from .memory import ConversationMemory
+from .response_cache import SemanticResponseCache
 from .vector_store import VectorStoreManager
 
+from agent.logger import TreeLineLogger
+from agent.tokens import TokenCounter
+
+logger = TreeLineLogger().logger
+
 
 class RAGPipeline:
     """RAG pipeline for customer support using ChromaDB and OpenAI."""
     
+    TECHNICAL_DIFFICULTIES_MESSAGE = (
+        "I apologize, but I'm experiencing technical difficulties right now. "
+        "Please contact our human support team for assistance with your question."
+    )
+    
     def __init__(
         self,
         vector_store_manager: Optional[VectorStoreManager] = None,
         llm_model: str = "gpt-4-turbo",
         temperature: float = 0.7,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        response_cache: Optional[SemanticResponseCache] = None,
+        memory: Optional[ConversationMemory] = None
     ):
         self.vector_store_manager = vector_store_manager or VectorStoreManager()
+        self.count_tokens = TokenCounter(llm_model)
+        
+        # Answer near-duplicate questions without another retrieval and completion
+        if response_cache is None and os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true":
+            response_cache = SemanticResponseCache(
+                embed_query=self.vector_store_manager.embed_query,
+                similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.95")),
+                ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+                max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+            )
+        self.response_cache = response_cache
         
         # Initialize LLM
         self.llm = ChatOpenAI(
@@ -33,12 +60,15 @@ class RAGPipeline:
         
         # Customer support prompt template
         self.prompt_template = PromptTemplate(
-            input_variables=["context", "question"],
+            input_variables=["context", "history", "question"],
             template="""You are TreeLine, a helpful AI customer support agent. Use the following context information to answer the customer's question. If the context doesn't contain relevant information, provide a helpful general response and suggest they contact human support for specific issues.
 
 Context:
 {context}
 
+Conversation so far:
+{history}
+
 Customer Question: {question}
 
 Response Guidelines:
@@ -51,15 +81,62 @@ Response Guidelines:
 Answer:"""
         )
         
-        # Initialize retrieval chain
-        self.retrieval_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vector_store_manager.as_retriever(
-                search_kwargs={"k": 4}
-            ),
-            chain_type_kwargs={"prompt": self.prompt_template},
-            return_source_documents=True
+        # Prompt used when no knowledge base is available
+        self.fallback_prompt = PromptTemplate(
+            input_variables=["question"],
+            template="""You are TreeLine, a helpful AI customer support agent. The customer has asked: {question}
+
+Since I don't have access to specific company information right now, I'll provide a helpful general response and guide them to appropriate next steps.
+
+Provide a friendly, professional response that:
+- Acknowledges their question
+- Offers general helpful guidance if possible
+- Suggests contacting human support for specific account or technical issues
+- Maintains a positive, supportive tone
+
+Answer:"""
+        )
+        
+        # Prompt used to fold old turns into a session's rolling summary
+        self.summary_prompt = PromptTemplate(
+            input_variables=["summary", "turns"],
+            template="""Summarize this customer support conversation in a few sentences. Keep the customer's problem, relevant account or product details, and anything already tried or promised.
+
+Previous summary:
+{summary}
+
+New messages:
+{turns}
+
+Summary:"""
+        )
+        
+        # Per-session history, backed by the conversations table the backend writes
+        if memory is None and os.getenv("MEMORY_ENABLED", "true").lower() == "true":
+            memory = ConversationMemory(
+                summarize=self._summarize_history,
+                database_url=os.getenv("DATABASE_URL"),
+                max_sessions=int(os.getenv("MEMORY_MAX_SESSIONS", "1000")),
+                token_budget=int(os.getenv("MEMORY_TOKEN_BUDGET", "1000")),
+                load_limit=int(os.getenv("MEMORY_LOAD_LIMIT", "50")),
+                count_tokens=self.count_tokens,
+                sync_seconds=float(os.getenv("MEMORY_SYNC_SECONDS", "1.0"))
+            )
+        self.memory = memory
+        
+        # Default ranking for search_knowledge: vector, keyword or hybrid
+        self.search_mode = os.getenv("SEARCH_MODE", "vector")
+        
+        # Concurrent LLM calls per batch request
+        self.batch_max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+        
+        # Retrieved chunks are filtered by relevance and packed to a token budget
+        self.retrieval_k = int(os.getenv("CONTEXT_FETCH_K", "8"))
+        self.context_builder = ContextBuilder(
+            count_tokens=self.count_tokens,
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+            min_relevance=float(os.getenv("CONTEXT_MIN_RELEVANCE", "0.25")),
+            max_overlap=getattr(self.vector_store_manager, "chunk_overlap", 200)
         )
     
     def generate_response(
@@ -76,80 +153,416 @@ Answer:"""
             
             if collection_info["count"] == 0:
                 # No knowledge base available, use general response
-                return self._generate_fallback_response(query, session_id)
-            
-            # Use RAG pipeline
-            result = self.retrieval_chain.invoke({"query": query})
-            
-            response_data = {
-                "response": result["result"],
-                "session_id": session_id,
-                "sources_used": len(result.get("source_documents", [])),
-                "knowledge_base_size": collection_info["count"]
-            }
-            
-            if include_sources:
-                response_data["source_documents"] = [
-                    {
-                        "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
-                        "metadata": doc.metadata
-                    }
-                    for doc in result.get("source_documents", [])
-                ]
-            
-            return response_data
+                response = self._generate_fallback_response(query, session_id)
+            else:
+                response = self._generate_rag_response(
+                    query, session_id, collection_info["count"], include_sources
+                )
             
         except Exception as e:
             print(f"Error in RAG pipeline: {e}")
             return self._generate_fallback_response(query, session_id, error=str(e))
+        
+        self._remember_turn(session_id, query, response)
+        return response
     
-    def _generate_fallback_response(
+    def _generate_rag_response(
+        self,
+        query: str,
+        session_id: Optional[str],
+        knowledge_base_size: int,
+        include_sources: bool
+    ) -> Dict[str, Any]:
+        """Retrieve context and answer with the LLM."""
+        history, retrieval_query = self._prepare_context(query, session_id)
+        
+        cached, vector, kb_version = self._lookup_cached_response(query, session_id, include_sources, history)
+        if cached is not None:
+            return cached
+        
+        documents = self._retrieve(retrieval_query)
+        answer = self.llm.invoke(self._format_prompt(query, documents, history))
+        
+        response = self._build_response(
+            {"result": answer.content, "source_documents": documents},
+            session_id, knowledge_base_size, include_sources=True
+        )
+        return self._store_cached_response(query, vector, kb_version, response, include_sources)
+    
+    async def agenerate_response(
         self,
         query: str,
         session_id: Optional[str] = None,
-        error: Optional[str] = None
+        include_sources: bool = False
     ) -> Dict[str, Any]:
-        """Generate a fallback response when RAG pipeline fails or no knowledge base exists."""
+        """Generate a response without blocking the event loop."""
         
-        fallback_prompt = PromptTemplate(
-            input_variables=["question"],
-            template="""You are TreeLine, a helpful AI customer support agent. The customer has asked: {question}
+        try:
+            # Chroma's client is synchronous; keep it off the event loop
+            collection_info = await asyncio.to_thread(self.vector_store_manager.get_collection_info)
+            
+            if collection_info["count"] == 0:
+                response = await self._agenerate_fallback_response(query, session_id)
+            else:
+                response = await self._agenerate_rag_response(
+                    query, session_id, collection_info["count"], include_sources
+                )
+            
+        except Exception as e:
+            print(f"Error in RAG pipeline: {e}")
+            return await self._agenerate_fallback_response(query, session_id, error=str(e))
+        
+        self._remember_turn(session_id, query, response)
+        return response
+    
+    async def _agenerate_rag_response(
+        self,
+        query: str,
+        session_id: Optional[str],
+        knowledge_base_size: int,
+        include_sources: bool
+    ) -> Dict[str, Any]:
+        """Async variant of ``_generate_rag_response``."""
+        # Loading history, summarizing and embedding the query are blocking calls
+        history, retrieval_query = await asyncio.to_thread(self._prepare_context, query, session_id)
+        cached, vector, kb_version = await asyncio.to_thread(
+            self._lookup_cached_response, query, session_id, include_sources, history
+        )
+        if cached is not None:
+            return cached
+        
+        documents = await asyncio.to_thread(self._retrieve, retrieval_query)
+        answer = await self.llm.ainvoke(self._format_prompt(query, documents, history))
+        
+        response = self._build_response(
+            {"result": answer.content, "source_documents": documents},
+            session_id, knowledge_base_size, include_sources=True
+        )
+        return self._store_cached_response(query, vector, kb_version, response, include_sources)
+    
+    async def agenerate_batch(
+        self,
+        queries: List[str],
+        session_ids: Optional[List[Optional[str]]] = None,
+        include_sources: bool = False,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Generate responses to many queries, returned in the order of ``queries``.
 
-Since I don't have access to specific company information right now, I'll provide a helpful general response and guide them to appropriate next steps.
+        All queries are embedded with one call and retrieved with one
+        multi-query vector search; the LLM calls then run concurrently, at
+        most ``max_concurrency`` at a time. ``BATCH_MAX_CONCURRENCY`` is both
+        the default and the upper bound.
+        """
+        session_ids = session_ids or [None] * len(queries)
+        semaphore = asyncio.Semaphore(min(max_concurrency or self.batch_max_concurrency, self.batch_max_concurrency))
+        
+        async def fallback(query: str, session_id: Optional[str], error: Optional[str] = None) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._agenerate_fallback_response(query, session_id, error=error)
+        
+        try:
+            collection_info = await asyncio.to_thread(self.vector_store_manager.get_collection_info)
+            if collection_info["count"] == 0:
+                return list(await asyncio.gather(*(
+                    fallback(query, session_id) for query, session_id in zip(queries, session_ids)
+                )))
+            prepared = await asyncio.to_thread(self._prepare_batch, queries, session_ids, include_sources)
+        except Exception as e:
+            print(f"Error in RAG pipeline batch: {e}")
+            return list(await asyncio.gather(*(
+                fallback(query, session_id, str(e)) for query, session_id in zip(queries, session_ids)
+            )))
+        
+        async def answer(query: str, session_id: Optional[str], item: Dict[str, Any]) -> Dict[str, Any]:
+            if item["cached"] is not None:
+                response = item["cached"]
+            else:
+                try:
+                    async with semaphore:
+                        result = await self.llm.ainvoke(self._format_prompt(query, item["documents"], item["history"]))
+                except Exception as e:
+                    print(f"Error in RAG pipeline batch: {e}")
+                    return await fallback(query, session_id, str(e))
+                response = self._build_response(
+                    {"result": result.content, "source_documents": item["documents"]},
+                    session_id, collection_info["count"], include_sources=True
+                )
+                response = self._store_cached_response(
+                    query, item["vector"], item["kb_version"], response, include_sources
+                )
+            self._remember_turn(session_id, query, response)
+            return response
+        
+        return list(await asyncio.gather(*(
+            answer(query, session_id, item) for query, session_id, item in zip(queries, session_ids, prepared)
+        )))
+    
+    def _prepare_batch(
+        self,
+        queries: List[str],
+        session_ids: List[Optional[str]],
+        include_sources: bool
+    ) -> List[Dict[str, Any]]:
+        """Load histories, check the cache and retrieve context for a batch of queries."""
+        contexts = [self._prepare_context(query, session_id) for query, session_id in zip(queries, session_ids)]
+        retrieval_queries = [retrieval_query for _, retrieval_query in contexts]
+        
+        # One embedding call covers the cache lookups and the retrieval
+        texts = list(dict.fromkeys(retrieval_queries + (list(queries) if self.response_cache is not None else [])))
+        embeddings = dict(zip(texts, self.vector_store_manager.embed_queries(texts)))
+        
+        prepared = []
+        for query, session_id, (history, retrieval_query) in zip(queries, session_ids, contexts):
+            cached, vector, kb_version = self._lookup_cached_response(
+                query, session_id, include_sources, history, embedding=embeddings.get(query)
+            )
+            prepared.append({
+                "history": history,
+                "retrieval_query": retrieval_query,
+                "cached": cached,
+                "vector": vector,
+                "kb_version": kb_version,
+                "documents": []
+            })
+        
+        misses = [item for item in prepared if item["cached"] is None]
+        scored = self.vector_store_manager.similarity_search_by_vectors_with_relevance_scores(
+            [embeddings[item["retrieval_query"]] for item in misses], k=self.retrieval_k
+        )
+        for item, results in zip(misses, scored):
+            item["documents"] = self.context_builder.build(results)
+        return prepared
+    
+    async def astream_response(
+        self,
+        query: str,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response as it is generated.
 
-Provide a friendly, professional response that:
-- Acknowledges their question
-- Offers general helpful guidance if possible
-- Suggests contacting human support for specific account or technical issues
-- Maintains a positive, supportive tone
+        Yields ``{"type": "token", "content": ...}`` events as the LLM produces
+        tokens, then one ``{"type": "done", ...}`` event carrying the same
+        metadata as ``generate_response``.
+        """
+        done = {
+            "type": "done",
+            "session_id": session_id,
+            "sources_used": 0,
+            "knowledge_base_size": 0
+        }
+        
+        try:
+            collection_info = await asyncio.to_thread(self.vector_store_manager.get_collection_info)
+            documents = None
+            
+            if collection_info["count"] == 0:
+                stream = self.llm.astream(self.fallback_prompt.format(question=query))
+                done["fallback_used"] = True
+            else:
+                history, retrieval_query = await asyncio.to_thread(self._prepare_context, query, session_id)
+                cached, vector, kb_version = await asyncio.to_thread(
+                    self._lookup_cached_response, query, session_id, False, history
+                )
+                if cached is not None:
+                    self._remember_turn(session_id, query, cached)
+                    yield {"type": "token", "content": cached.pop("response")}
+                    yield {"type": "done", **cached}
+                    return
+                
+                documents = await asyncio.to_thread(self._retrieve, retrieval_query)
+                stream = self.llm.astream(self._format_prompt(query, documents, history))
+                done["sources_used"] = len(documents)
+                done["knowledge_base_size"] = collection_info["count"]
+            
+            parts = []
+            async for chunk in stream:
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield {"type": "token", "content": chunk.content}
+            
+            response = {"response": "".join(parts)}
+            if documents is not None:
+                response = self._build_response(
+                    {"result": response["response"], "source_documents": documents},
+                    session_id, collection_info["count"], include_sources=True
+                )
+                self._store_cached_response(query, vector, kb_version, response, False)
+            self._remember_turn(session_id, query, response)
+            
+        except Exception as e:
+            print(f"Error in RAG pipeline stream: {e}")
+            yield {"type": "token", "content": self.TECHNICAL_DIFFICULTIES_MESSAGE}
+            done.update(fallback_used=True, error=str(e))
+        
+        yield done
+    
+    def _prepare_context(self, query: str, session_id: Optional[str]) -> Tuple[str, str]:
+        """Return the session history for the prompt and the query to retrieve with.
 
-Answer:"""
+        Follow-up questions ("what about the annual plan?") retrieve poorly on
+        their own, so the previous customer message is searched along with them.
+        """
+        if self.memory is None or not session_id:
+            return "", query
+        previous = self.memory.last_user_message(session_id)
+        history = self.memory.get_history(session_id)
+        retrieval_query = f"{previous}\n{query}" if previous else query
+        return history, retrieval_query
+    
+    def _retrieve(self, query: str) -> List[Document]:
+        """Retrieve scored chunks and assemble them into a bounded context."""
+        scored = self.vector_store_manager.similarity_search_with_relevance_scores(
+            query, k=self.retrieval_k
         )
+        return self.context_builder.build(scored)
+    
+    def _format_prompt(self, query: str, documents: List[Document], history: str) -> str:
+        """Fill the support prompt with retrieved context and session history."""
+        return self.prompt_template.format(
+            context="\n\n".join(doc.page_content for doc in documents),
+            history=history or "(This is the start of the conversation.)",
+            question=query
+        )
+    
+    def _summarize_history(self, summary: str, turns: str) -> str:
+        """Fold older turns into a session's rolling summary."""
+        prompt = self.summary_prompt.format(summary=summary or "(none)", turns=turns)
+        return self.llm.invoke(prompt).content
+    
+    def _remember_turn(self, session_id: Optional[str], query: str, response: Dict[str, Any]):
+        """Add a completed turn to the session's memory."""
+        if self.memory is None or not session_id or response.get("error"):
+            return
+        self.memory.add_turn(session_id, query, response["response"])
+    
+    def _lookup_cached_response(
+        self,
+        query: str,
+        session_id: Optional[str],
+        include_sources: bool,
+        history: str = "",
+        embedding: Optional[List[float]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray], Optional[str]]:
+        """Look a query up in the response cache.
+
+        Returns the cached response (or ``None`` on a miss) together with the
+        query embedding and knowledge base version to store a fresh answer under.
+        Answers to follow-ups depend on the conversation, so only the first
+        turn of a session uses the cache. A precomputed query ``embedding``
+        saves the embedding call.
+        """
+        if self.response_cache is None or history:
+            return None, None, None
+        
+        try:
+            kb_version = self.vector_store_manager.kb_version
+            if embedding is not None:
+                vector = self.response_cache.normalize(embedding)
+            else:
+                vector = self.response_cache.embed(query)
+            hit = self.response_cache.get(vector, kb_version)
+        except Exception as e:
+            logger.warning(f"[RESPONSE_CACHE] Lookup failed, generating a fresh response: {e}")
+            return None, None, None
+        
+        if hit is None:
+            return None, vector, kb_version
+        
+        response, similarity = hit
+        if not include_sources:
+            response.pop("source_documents", None)
+        response.update(session_id=session_id, cache_hit=True, cache_similarity=round(similarity, 4))
+        return response, vector, kb_version
+    
+    def _store_cached_response(
+        self,
+        query: str,
+        vector: Optional[np.ndarray],
+        kb_version: Optional[str],
+        response: Dict[str, Any],
+        include_sources: bool
+    ) -> Dict[str, Any]:
+        """Cache a freshly generated response and return it as requested."""
+        if vector is not None:
+            self.response_cache.put(query, vector, kb_version, response)
+        if not include_sources:
+            response.pop("source_documents", None)
+        return response
+    
+    def _build_response(
+        self,
+        result: Dict[str, Any],
+        session_id: Optional[str],
+        knowledge_base_size: int,
+        include_sources: bool
+    ) -> Dict[str, Any]:
+        """Build the response payload from a retrieval chain result."""
+        response_data = {
+            "response": result["result"],
+            "session_id": session_id,
+            "sources_used": len(result.get("source_documents", [])),
+            "knowledge_base_size": knowledge_base_size
+        }
+        
+        if include_sources:
+            response_data["source_documents"] = [
+                {
+                    "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
+                    "metadata": doc.metadata
+                }
+                for doc in result.get("source_documents", [])
+            ]
+        
+        return response_data
+    
+    def _generate_fallback_response(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Generate a fallback response when RAG pipeline fails or no knowledge base exists."""
         
         try:
             # Use LLM directly for fallback response
-            chain = fallback_prompt | self.llm
-            response = chain.invoke({"question": query})
-            
-            return {
-                "response": response.content,
-                "session_id": session_id,
-                "sources_used": 0,
-                "knowledge_base_size": 0,
-                "fallback_used": True,
-                "error": error
-            }
+            response = self.llm.invoke(self.fallback_prompt.format(question=query))
+            return self._fallback_payload(response.content, session_id, error)
             
         except Exception as e:
             # Ultimate fallback
-            return {
-                "response": "I apologize, but I'm experiencing technical difficulties right now. Please contact our human support team for assistance with your question.",
-                "session_id": session_id,
-                "sources_used": 0,
-                "knowledge_base_size": 0,
-                "fallback_used": True,
-                "error": str(e)
-            }
+            return self._fallback_payload(self.TECHNICAL_DIFFICULTIES_MESSAGE, session_id, str(e))
+    
+    async def _agenerate_fallback_response(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Async variant of ``_generate_fallback_response``."""
+        
+        try:
+            response = await self.llm.ainvoke(self.fallback_prompt.format(question=query))
+            return self._fallback_payload(response.content, session_id, error)
+            
+        except Exception as e:
+            return self._fallback_payload(self.TECHNICAL_DIFFICULTIES_MESSAGE, session_id, str(e))
+    
+    @staticmethod
+    def _fallback_payload(
+        response: str,
+        session_id: Optional[str],
+        error: Optional[str]
+    ) -> Dict[str, Any]:
+        """Build the response payload for a fallback answer."""
+        return {
+            "response": response,
+            "session_id": session_id,
+            "sources_used": 0,
+            "knowledge_base_size": 0,
+            "fallback_used": True,
+            "error": error
+        }
     
     def add_knowledge(
         self,
@@ -170,11 +583,31 @@ Answer:"""
         self,
         query: str,
         k: int = 4,
-        include_scores: bool = False
+        include_scores: bool = False,
+        mode: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Search the knowledge base."""
+        """Search the knowledge base.
+
+        ``mode`` is ``"vector"``, ``"keyword"`` (BM25) or ``"hybrid"`` (both,
+        fused by reciprocal rank); it defaults to ``SEARCH_MODE``, ``"vector"``
+        unless set. The meaning of ``score`` depends on the mode: vector
+        search returns distances (lower is better), keyword and hybrid
+        search return BM25 and fusion scores (higher is better).
+        """
+        mode = mode or self.search_mode
+        if mode == "hybrid":
+            results = self.vector_store_manager.hybrid_search(query, k=k)
+        elif mode == "keyword":
+            results = self.vector_store_manager.keyword_search(query, k=k)
+        elif mode == "vector":
+            if include_scores:
+                results = self.vector_store_manager.similarity_search_with_score(query, k=k)
+            else:
+                results = [(doc, None) for doc in self.vector_store_manager.similarity_search(query, k=k)]
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+        
         if include_scores:
-            results = self.vector_store_manager.similarity_search_with_score(query, k=k)
             return [
                 {
                     "content": doc.page_content,
@@ -183,15 +616,45 @@ Answer:"""
                 }
                 for doc, score in results
             ]
+        return [
+            {
+                "content": doc.page_content,
+                "metadata": doc.metadata
+            }
+            for doc, _ in results
+        ]
+    
+    def search_knowledge_many(
+        self,
+        queries: List[str],
+        k: int = 4,
+        include_scores: bool = False,
+        mode: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search the knowledge base for several queries, results in query order.
+
+        Vector and hybrid modes embed every query with one call and search
+        them in one vector store query. Scores are as in ``search_knowledge``.
+        """
+        mode = mode or self.search_mode
+        if mode == "hybrid":
+            results = self.vector_store_manager.hybrid_search_many(queries, k=k)
+        elif mode == "keyword":
+            results = [self.vector_store_manager.keyword_search(query, k=k) for query in queries]
+        elif mode == "vector":
+            results = self.vector_store_manager.similarity_search_many(queries, k=k)
         else:
-            results = self.vector_store_manager.similarity_search(query, k=k)
-            return [
-                {
-                    "content": doc.page_content,
-                    "metadata": doc.metadata
-                }
-                for doc in results
+            raise ValueError(f"Unknown search mode: {mode}")
+        
+        return [
+            [
+                {"content": doc.page_content, "metadata": doc.metadata, "score": score}
+                if include_scores else
+                {"content": doc.page_content, "metadata": doc.metadata}
+                for doc, score in result
             ]
+            for result in results
+        ]
     
     def get_knowledge_base_info(self) -> Dict[str, Any]:
         """Get information about the knowledge base."""
@@ -0,0 +1,139 @@
+"""Per-document ingestion state stored in the ``knowledge_base`` table."""
+
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    Uuid,
+    create_engine,
+    delete,
+    select,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+
+from agent.logger import TreeLineLogger
+
+logger = TreeLineLogger().logger
+
+metadata_obj = MetaData()
+
+knowledge_base = Table(
+    "knowledge_base",
+    metadata_obj,
+    Column("id", Uuid, primary_key=True, default=uuid.uuid4),
+    Column("document_name", String(255), nullable=False),
+    Column("document_path", Text),
+    Column("chunk_count", Integer, default=0),
+    Column("last_updated", DateTime(timezone=True)),
+    Column("metadata", JSON().with_variant(postgresql.JSONB, "postgresql")),
+)
+
+# Upserts are keyed by path; also created by init.sql
+document_path_index = Index("idx_knowledge_base_document_path", knowledge_base.c.document_path, unique=True)
+
+
+class KnowledgeBaseRegistry:
+    """Records what the ingestion pipeline has indexed, one row per document.
+
+    Rows carry the chunk count and, in ``metadata``, the content hash,
+    embedding model, chunking settings and ingestion timing, so the backend
+    and admin UI can show knowledge base state from one indexed table.
+    Database errors are logged and never fail an ingestion.
+    """
+
+    def __init__(self, database_url: str):
+        self._engine = create_engine(database_url, pool_pre_ping=True)
+        self._initialized = False
+
+    def _ensure_table(self):
+        """Create the table and its path index if init.sql did not."""
+        if not self._initialized:
+            with self._engine.begin() as conn:
+                knowledge_base.create(conn, checkfirst=True)
+                document_path_index.create(conn, checkfirst=True)
+            self._initialized = True
+
+    def _insert(self):
+        """Dialect-specific INSERT supporting ON CONFLICT."""
+        if self._engine.dialect.name == "postgresql":
+            return postgresql.insert(knowledge_base)
+        return sqlite.insert(knowledge_base)
+
+    def record(self, documents: List[Dict[str, Any]]):
+        """Insert or update rows keyed by ``document_path``.
+
+        Each item has ``document_name``, ``document_path``, ``chunk_count``
+        and ``metadata``.
+        """
+        if not documents:
+            return
+        now = datetime.now(timezone.utc)
+        rows = [{"id": uuid.uuid4(), "last_updated": now, **document} for document in documents]
+        try:
+            self._ensure_table()
+            statement = self._insert()
+            statement = statement.on_conflict_do_update(
+                index_elements=[knowledge_base.c.document_path],
+                set_={
+                    "document_name": statement.excluded.document_name,
+                    "chunk_count": statement.excluded.chunk_count,
+                    "last_updated": statement.excluded.last_updated,
+                    "metadata": statement.excluded.metadata,
+                }
+            )
+            with self._engine.begin() as conn:
+                conn.execute(statement, rows)
+        except Exception as e:
+            logger.warning(f"[REGISTRY] Could not record {len(rows)} documents: {e}")
+
+    def remove(self, document_paths: Iterable[str]):
+        """Delete the rows of documents that left the knowledge base."""
+        document_paths = list(document_paths)
+        if not document_paths:
+            return
+        try:
+            self._ensure_table()
+            with self._engine.begin() as conn:
+                conn.execute(delete(knowledge_base).where(knowledge_base.c.document_path.in_(document_paths)))
+        except Exception as e:
+            logger.warning(f"[REGISTRY] Could not remove {len(document_paths)} documents: {e}")
+
+    def clear(self):
+        """Delete every row."""
+        try:
+            self._ensure_table()
+            with self._engine.begin() as conn:
+                conn.execute(delete(knowledge_base))
+        except Exception as e:
+            logger.warning(f"[REGISTRY] Could not clear the knowledge base table: {e}")
+
+    def is_empty(self) -> bool:
+        """True if no document is recorded (or the table cannot be read)."""
+        try:
+            self._ensure_table()
+            with self._engine.connect() as conn:
+                return conn.execute(select(knowledge_base.c.id).limit(1)).first() is None
+        except Exception as e:
+            logger.warning(f"[REGISTRY] Could not read the knowledge base table: {e}")
+            return False
+
+    def documents(self) -> List[Dict[str, Any]]:
+        """Return every recorded document, by path."""
+        self._ensure_table()
+        with self._engine.connect() as conn:
+            rows = conn.execute(select(knowledge_base).order_by(knowledge_base.c.document_path))
+            return [dict(row._mapping) for row in rows]
+
+    def close(self):
+        """Dispose of the connection pool."""
+        self._engine.dispose()
@@ -0,0 +1,144 @@
+"""Semantic cache for generated responses."""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agent.logger import TreeLineLogger
+
+logger = TreeLineLogger().logger
+
+
+@dataclass
+class CachedResponse:
+    """A cached response and the normalized embedding of the query that produced it."""
+
+    query: str
+    vector: np.ndarray
+    response: Dict[str, Any]
+    created_at: float
+
+
+class SemanticResponseCache:
+    """Serves answers to queries that are near-duplicates of earlier ones.
+
+    Queries are matched by cosine similarity of their embeddings against
+    ``similarity_threshold``. Every entry belongs to one knowledge base
+    version; when the version changes the whole cache is dropped, since any
+    answer may depend on the documents that changed. Entries also expire
+    after ``ttl_seconds`` and the least recently used ones are evicted beyond
+    ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        embed_query: Callable[[str], List[float]],
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000
+    ):
+        self.embed_query = embed_query
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[int, CachedResponse]" = OrderedDict()
+        self._next_key = 0
+        self._kb_version: Optional[str] = None
+        self._lock = threading.Lock()
+        # Stacked entry vectors, rebuilt lazily after the entries change
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[int] = []
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, query: str) -> np.ndarray:
+        """Embed and L2-normalize a query."""
+        return self.normalize(self.embed_query(query))
+
+    @staticmethod
+    def normalize(embedding: List[float]) -> np.ndarray:
+        """L2-normalize a query embedding computed elsewhere."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _sync_version(self, kb_version: str):
+        """Drop every entry if the knowledge base changed. Caller holds the lock."""
+        if kb_version != self._kb_version:
+            if self._entries:
+                logger.info(f"[RESPONSE_CACHE] Knowledge base changed, dropping {len(self._entries)} entries")
+            self._entries.clear()
+            self._matrix = None
+            self._kb_version = kb_version
+
+    def _expire(self):
+        """Drop entries older than the TTL. Caller holds the lock."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [key for key, entry in self._entries.items() if entry.created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _search(self, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        """Return the key and similarity of the closest entry. Caller holds the lock."""
+        if not self._entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key].vector for key in self._matrix_keys])
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        return self._matrix_keys[best], float(similarities[best])
+
+    def get(self, vector: np.ndarray, kb_version: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return a copy of the cached response for a query embedding, with its similarity."""
+        with self._lock:
+            self._sync_version(kb_version)
+            self._expire()
+            key, similarity = self._search(vector)
+            if key is None or similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self._entries[key].response), similarity
+
+    def put(self, query: str, vector: np.ndarray, kb_version: str, response: Dict[str, Any]):
+        """Cache a response for a query embedding.
+
+        Responses generated against a knowledge base version other than the
+        current one are not cached.
+        """
+        with self._lock:
+            if self._kb_version is None:
+                self._kb_version = kb_version
+            elif kb_version != self._kb_version:
+                return
+            self._entries[self._next_key] = CachedResponse(
+                query=query,
+                vector=vector,
+                response=copy.deepcopy(response),
+                created_at=time.time()
+            )
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current size."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
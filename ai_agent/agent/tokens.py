@@ -0,0 +1,40 @@
+"""Token counting with the LLM's tokenizer."""
+
+from agent.logger import TreeLineLogger
+
+logger = TreeLineLogger().logger
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with langchain-openai
+    tiktoken = None
+
+
+class TokenCounter:
+    """Counts tokens for a model, estimating when the tokenizer is unavailable."""
+
+    def __init__(self, model_name: str = "gpt-4-turbo"):
+        self.model_name = model_name
+        self._encoding = None
+        self._encoding_loaded = tiktoken is None
+
+    def _get_encoding(self):
+        """Load the model's tokenizer on first use."""
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model_name)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # tiktoken downloads its tables on first use, which fails offline
+                logger.warning(f"[TOKENS] Tokenizer unavailable, estimating token counts: {e}")
+        return self._encoding
+
+    def __call__(self, text: str) -> int:
+        """Count the tokens in a text."""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return len(text) // 4 + 1
+        return len(encoding.encode(text, disallowed_special=()))
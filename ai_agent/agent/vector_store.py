@@ -1,7 +1,12 @@
 """Vector store management using ChromaDB."""
 
+import functools
+import hashlib
+import json
 import os
-from typing import List, Optional
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 import chromadb
@@ -9,14 +14,93 @@ from chromadb.config import Settings
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
 from agent.logger import TreeLineLogger
+from agent.embedding_cache import CachedEmbeddings, EmbeddingCache, embed_queries
+from agent.ingestion import AdaptiveBackoff, IngestionEngine, IngestionResult
+from agent.keyword_index import BM25Index, keyword_ratio, reciprocal_rank_fusion
+from agent.loader import (
+    SUPPORTED_EXTENSIONS,
+    build_text_splitter,
+    iter_parsed_files,
+    split_document,
+)
+from agent.manifest import IngestionManifest
+from agent.numpy_store import NumpyVectorStore
+from agent.registry import KnowledgeBaseRegistry
 
 logger = TreeLineLogger().logger
 
 
+# HNSW parameters Chroma uses when a collection's metadata does not set them
+# (num_threads defaults to the CPU count, so it is not compared)
+CHROMA_HNSW_DEFAULTS = {
+    "hnsw:space": "l2",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 10,
+}
+
+# Environment variable of each HNSW collection parameter
+HNSW_ENV_VARS = {
+    "hnsw:space": "HNSW_SPACE",
+    "hnsw:M": "HNSW_M",
+    "hnsw:construction_ef": "HNSW_CONSTRUCTION_EF",
+    "hnsw:search_ef": "HNSW_SEARCH_EF",
+    "hnsw:num_threads": "HNSW_NUM_THREADS",
+}
+
+
+def hnsw_metadata_from_env() -> dict:
+    """Chroma HNSW collection parameters from the environment."""
+    metadata = {
+        "hnsw:space": os.getenv("HNSW_SPACE", "l2"),
+        "hnsw:M": int(os.getenv("HNSW_M", "16")),
+        "hnsw:construction_ef": int(os.getenv("HNSW_CONSTRUCTION_EF", "100")),
+        "hnsw:search_ef": int(os.getenv("HNSW_SEARCH_EF", "64")),
+    }
+    if os.getenv("HNSW_NUM_THREADS"):
+        metadata["hnsw:num_threads"] = int(os.getenv("HNSW_NUM_THREADS"))
+    return metadata
+
+
+@functools.lru_cache(maxsize=None)
+def local_embeddings(model_name: str) -> HuggingFaceEmbeddings:
+    """Load a local embedding model once per process.
+
+    Loaded in a preforking parent (gunicorn ``preload_app``), the model's
+    pages are shared copy-on-write by every worker.
+    """
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _dedupe_documents(documents: List[Document], k: Optional[int] = None) -> List[Document]:
+    """Drop search results that repeat an earlier passage, keeping at most ``k``.
+
+    Searches fetch ``k * 2`` results so that ``k`` remain after duplicates
+    are dropped.
+    """
+    seen = set()
+    unique = []
+    for doc in documents:
+        if doc.page_content not in seen:
+            seen.add(doc.page_content)
+            unique.append(doc)
+    return unique[:k]
+
+
+def _dedupe_scored(results: List[Tuple[Document, float]], k: Optional[int] = None) -> List[Tuple[Document, float]]:
+    """Drop scored search results that repeat an earlier passage, keeping at most ``k``."""
+    seen = set()
+    unique = []
+    for doc, score in results:
+        if doc.page_content not in seen:
+            seen.add(doc.page_content)
+            unique.append((doc, score))
+    return unique[:k]
+
+
 class VectorStoreManager:
     """Manages ChromaDB vector store for RAG pipeline."""
     
@@ -24,11 +108,15 @@ class VectorStoreManager:
         self,
         persist_directory: str = "./data/vector_db",
         collection_name: str = "treeline_knowledge_base",
-        embedding_model: str = "text-embedding-ada-002"
+        embedding_model: str = "text-embedding-ada-002",
+        read_only: bool = False
     ):
         self.persist_directory = Path(persist_directory)
         self.collection_name = collection_name
         self.embedding_model = embedding_model
+        # Readers (AGENT_ROLE=reader) never write and follow the writer's
+        # published index generation instead
+        self.read_only = read_only
         
         # Ensure directory exists
         self.persist_directory.mkdir(parents=True, exist_ok=True)
@@ -38,88 +126,357 @@ class VectorStoreManager:
 
         if embedding_provider == "local":
             local_model = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-            self.embeddings = HuggingFaceEmbeddings(model_name=local_model)
-            # self.embeddings =  HuggingFaceEmbeddings(model_name="mxbai/Embed-Large-V1", model_kwargs={"device": "cpu"})
+            base_embeddings = local_embeddings(local_model)
+            # base_embeddings =  HuggingFaceEmbeddings(model_name="mxbai/Embed-Large-V1", model_kwargs={"device": "cpu"})
+            self.embedding_model_name = f"local/{local_model}"
             logger.info(f"[EMBEDDINGS] Using local embedding model: {local_model}")
         else:
-            self.embeddings = OpenAIEmbeddings(
+            base_embeddings = OpenAIEmbeddings(
                 model=embedding_model,
                 openai_api_key=os.getenv("OPENAI_API_KEY")
             )
+            self.embedding_model_name = f"openai/{embedding_model}"
             logger.info(f"[EMBEDDINGS] Using OpenAI embedding model: {embedding_model}")
 
+        # Cache document and query embeddings on disk, keyed by model and text hash
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true":
+            self.embedding_cache = EmbeddingCache(
+                self.persist_directory / "embedding_cache.sqlite3",
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000")),
+                memory_entries=int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+            )
+            self.embeddings = CachedEmbeddings(
+                base_embeddings, self.embedding_cache, self.embedding_model_name
+            )
+        else:
+            self.embedding_cache = None
+            self.embeddings = base_embeddings
 
-        
+        # "chroma" (default) or "numpy": an in-process, memory-mapped index for
+        # knowledge bases that fit in memory
+        self.vector_backend = os.getenv("VECTOR_BACKEND", "chroma").lower()
+        # ANN index parameters, fixed when the index or collection is created
+        self.collection_metadata = hnsw_metadata_from_env()
+        if self.vector_backend == "numpy":
+            self.client = None
+            self.vector_store = self._open_numpy_store()
+        else:
+            # Initialize ChromaDB client
 
-        
-        # Initialize ChromaDB client
-
-        self.client = chromadb.PersistentClient(
-            path=str(self.persist_directory),
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True,
-                is_persistent=True,
-                chroma_api_impl="chromadb.api.fastapi.FastAPI",
-                chroma_server_host="http://chroma-server:8000",
-                chroma_server_http_port=8000
+            self.client = chromadb.PersistentClient(
+                path=str(self.persist_directory),
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=True,
+                    is_persistent=True,
+                    chroma_api_impl="chromadb.api.fastapi.FastAPI",
+                    chroma_server_host="http://chroma-server:8000",
+                    chroma_server_http_port=8000
+                )
             )
-        )
-        
-        # Initialize vector store
-        self.vector_store = Chroma(
-            client=self.client,
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=str(self.persist_directory)
-        )
+            
+            # Initialize vector store
+            self._check_collection_metadata()
+            self.vector_store = Chroma(
+                client=self.client,
+                collection_name=collection_name,
+                embedding_function=self.embeddings,
+                persist_directory=str(self.persist_directory),
+                collection_metadata=self.collection_metadata
+            )
+        logger.info(f"[VECTOR_DB] Using {self.vector_backend} vector backend")
         logger.info(f"[DEBUG] Persist directory resolved to: {self.persist_directory}")
 
         # Text splitter for document processing
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
+        self.text_splitter = build_text_splitter(self.chunk_size, self.chunk_overlap)
+
+        # Process pool for parsing/splitting large directories (0 = one per core)
+        self.ingestion_workers = int(os.getenv("INGESTION_WORKERS", "0")) or os.cpu_count() or 1
+        self.parallel_min_files = int(os.getenv("INGESTION_PARALLEL_MIN_FILES", "8"))
+        # Files above this size are chunked lazily instead of read whole
+        self.stream_threshold = int(os.getenv("INGESTION_STREAM_THRESHOLD_BYTES", str(8 << 20)))
+
+        # Verbose per-batch ingestion reporting (chunk counts, dimension, timing)
+        self.ingestion_diagnostics = os.getenv("INGESTION_DIAGNOSTICS", "false").lower() == "true"
+
+        # Batched, concurrent embedding with rate-limit-aware backoff
+        self._write_lock = threading.Lock()
+        self.ingestion_engine = IngestionEngine(
+            embeddings=self.embeddings,
+            upsert=self._upsert_embedded,
+            batch_size=int(os.getenv("INGESTION_BATCH_SIZE", "64")),
+            max_concurrency=int(os.getenv("INGESTION_MAX_CONCURRENCY", "4")),
+            max_retries=int(os.getenv("INGESTION_MAX_RETRIES", "6")),
+            backoff=AdaptiveBackoff(
+                base_delay=float(os.getenv("INGESTION_BACKOFF_BASE", "1.0")),
+                max_delay=float(os.getenv("INGESTION_BACKOFF_MAX", "60.0"))
+            )
+        )
+
+        # Tracks embedded files so restarts only re-ingest what changed
+        self.manifest = IngestionManifest(
+            self.persist_directory / "ingestion_manifest.json"
+        )
+
+        # Collection count and metadata, kept in memory so queries don't pay a
+        # storage round trip; refreshed after every write and periodically
+        self.collection_info_refresh_seconds = float(os.getenv("COLLECTION_INFO_REFRESH_SECONDS", "60"))
+        self._collection_info: Optional[dict] = None
+        self._collection_info_at = 0.0
+        self._collection_info_lock = threading.Lock()
+
+        # Per-document ingestion state in the knowledge_base table, read by the backend
+        database_url = os.getenv("DATABASE_URL")
+        registry_enabled = os.getenv("KNOWLEDGE_BASE_REGISTRY_ENABLED", "true").lower() == "true"
+        self.registry = (
+            KnowledgeBaseRegistry(database_url) if database_url and registry_enabled and not read_only else None
+        )
+
+        # BM25 index over the same chunks, built from the collection on first
+        # keyword search and updated with every write afterwards
+        self.keyword_index = BM25Index() if os.getenv("KEYWORD_INDEX_ENABLED", "true").lower() == "true" else None
+        self._keyword_index_loaded = False
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+        # Queries where at least this share of words are codes or identifiers skip the embedding
+        self.keyword_query_ratio = float(os.getenv("HYBRID_KEYWORD_RATIO", "0.5"))
+
+        # Changes on every write so caches of generated answers can be invalidated
+        self._kb_version_path = self.persist_directory / "kb_version"
+        self._kb_version = self._load_kb_version()
+
+        # Generation counter published by the writer once a write is complete;
+        # readers re-open the index when it changes
+        self._generation_path = self.persist_directory / "index_generation.json"
+        self.generation = self._read_generation()["generation"]
+        self.generation_check_seconds = float(os.getenv("INDEX_GENERATION_CHECK_SECONDS", "2"))
+        self._generation_checked_at = time.monotonic()
+        self._generation_lock = threading.Lock()
+        # Depth of ingestion runs in progress; a run persists the numpy index,
+        # refreshes collection info and publishes a generation once, at its end
+        self._run_depth = 0
+
+    def _open_numpy_store(self) -> NumpyVectorStore:
+        """Memory-map the numpy backend's index files."""
+        return NumpyVectorStore(
+            self.persist_directory / "numpy_index",
+            self.embeddings,
+            name=self.collection_name,
+            index_type=os.getenv("VECTOR_INDEX_TYPE", "flat").lower(),
+            ivf_lists=int(os.getenv("IVF_LISTS", "0")),
+            ivf_probes=int(os.getenv("IVF_PROBES", "8")),
+            read_only=self.read_only
         )
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("Vector store is read-only (AGENT_ROLE=reader); writes go through the writer")
+
+    def _read_generation(self) -> dict:
+        """Read the last published index generation."""
+        try:
+            return json.loads(self._generation_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"generation": 0, "kb_version": self._kb_version}
+
+    def _publish_generation(self):
+        """Announce a completed write to readers by bumping the generation file atomically."""
+        self.generation = self._read_generation()["generation"] + 1
+        try:
+            tmp_path = self._generation_path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps({"generation": self.generation, "kb_version": self._kb_version}), encoding="utf-8"
+            )
+            os.replace(tmp_path, self._generation_path)
+        except OSError as e:
+            logger.warning(f"[VECTOR_DB] Could not publish index generation: {e}")
+
+    def sync_generation(self, force: bool = False) -> bool:
+        """Readers: re-open the index if the writer published a newer generation.
+
+        Checked at most every ``generation_check_seconds`` from the query
+        path. In-flight searches finish on the index they started with.
+        Returns True if the index was re-opened.
+        """
+        if not self.read_only:
+            return False
+        now = time.monotonic()
+        if not force and now - self._generation_checked_at < self.generation_check_seconds:
+            return False
+        self._generation_checked_at = now
+        with self._generation_lock:
+            published = self._read_generation()
+            if published["generation"] == self.generation:
+                return False
+            if self.client is None:
+                self.vector_store = self._open_numpy_store()
+            if self.keyword_index is not None:
+                # Rebuilt from the collection on the next keyword search
+                self.keyword_index = BM25Index()
+                self._keyword_index_loaded = False
+            self._kb_version = published["kb_version"]
+            self.generation = published["generation"]
+            self.refresh_collection_info()
+        logger.info(f"[VECTOR_DB] Re-opened index at generation {self.generation}")
+        return True
+
+    @property
+    def kb_version(self) -> str:
+        """Opaque version of the knowledge base content, changed by every write."""
+        return self._kb_version
+
+    def _load_kb_version(self) -> str:
+        """Read the persisted knowledge base version."""
+        try:
+            return self._kb_version_path.read_text(encoding="utf-8").strip() or "0" * 16
+        except OSError:
+            return "0" * 16
+
+    def _bump_kb_version(self, change: str, ids: Iterable[str] = ()):
+        """Chain a write into the knowledge base version and persist it."""
+        digest = hashlib.sha256(self._kb_version.encode("utf-8"))
+        digest.update(change.encode("utf-8"))
+        for chunk_id in ids:
+            digest.update(chunk_id.encode("utf-8"))
+        self._kb_version = digest.hexdigest()[:16]
+        try:
+            tmp_path = self._kb_version_path.with_suffix(".tmp")
+            tmp_path.write_text(self._kb_version, encoding="utf-8")
+            os.replace(tmp_path, self._kb_version_path)
+        except OSError as e:
+            logger.warning(f"[VECTOR_DB] Could not persist knowledge base version: {e}")
+        if not self._run_depth:
+            self._publish_generation()
+
+    def _collection(self, create: bool = False):
+        """Return the collection holding the chunks (the store itself for the numpy backend)."""
+        if self.client is None:
+            return self.vector_store
+        if create:
+            return self.client.get_or_create_collection(self.collection_name, metadata=self.collection_metadata)
+        return self.client.get_collection(self.collection_name)
+
+    def _check_collection_metadata(self):
+        """Warn when an existing collection was built with other HNSW parameters.
+
+        Chroma ignores the metadata of ``get_or_create_collection`` for an
+        existing collection, and collections created without HNSW metadata
+        use Chroma's defaults, so missing keys are compared against those.
+        Only parameters set explicitly in the environment are compared: the
+        built-in defaults apply to new collections and are not a request to
+        rebuild an existing one.
+        """
+        try:
+            existing = self.client.get_collection(self.collection_name).metadata or {}
+        except Exception:
+            return
+        current = {**CHROMA_HNSW_DEFAULTS, **existing}
+        differing = {
+            key: (current[key], value) for key, value in self.collection_metadata.items()
+            if os.getenv(HNSW_ENV_VARS.get(key, "")) and key in current and current[key] != value
+        }
+        if differing:
+            logger.warning(
+                f"[VECTOR_DB] Collection '{self.collection_name}' keeps the HNSW parameters it was "
+                f"created with; delete and re-ingest it to apply (current, configured): {differing}"
+            )
+
+    def _persist(self):
+        """Flush pending writes of the numpy backend to disk, unless an ingestion run is in progress."""
+        if self.client is None and not self._run_depth:
+            self.vector_store.persist()
+
+    def _refresh_after_write(self):
+        """Re-read collection info after a write, unless an ingestion run is in progress."""
+        if not self._run_depth:
+            self.refresh_collection_info()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query with the store's embedding model."""
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries with one call to the embedding model."""
+        if not texts:
+            return []
+        return embed_queries(self.embeddings, texts)
     
+    def split_documents(self, documents: List[Document]) -> Tuple[List[str], List[Document]]:
+        """Split documents into chunks with deterministic IDs.
+
+        Chunk IDs are derived from source path, chunk index and content, so
+        re-adding the same content maps onto the same IDs.
+        """
+        chunks_by_id = {}
+        for document in documents:
+            for chunk_id, chunk in zip(*split_document(document, self.text_splitter)):
+                chunks_by_id[chunk_id] = chunk
+        return list(chunks_by_id), list(chunks_by_id.values())
+
+    def _upsert_embedded(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[Document]
+    ):
+        """Upsert pre-embedded chunks into the collection."""
+        with self._write_lock:
+            collection = self._collection(create=True)
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=[doc.metadata for doc in documents],
+                documents=[doc.page_content for doc in documents]
+            )
+            if self._keyword_index_loaded:
+                self.keyword_index.add(ids, documents)
+
+    def ingest_chunks(self, chunks: Iterable[Tuple[str, Document]]) -> IngestionResult:
+        """Embed ``(chunk_id, chunk)`` pairs in concurrent batches and upsert them."""
+        self._check_writable()
+        result = self.ingestion_engine.ingest(chunks)
+        if result.upserted_ids:
+            with self._write_lock:
+                self._persist()
+            self._bump_kb_version("upsert", result.upserted_ids)
+            self._refresh_after_write()
+
+        logger.info(
+            f"[VECTOR_DB] Upserted {len(result.upserted_ids)} embedded chunks to collection "
+            f"'{self.collection_name}' ({len(result.failed_ids)} failed)"
+        )
+        if self.ingestion_diagnostics:
+            # Only report on data produced during insertion; never call the model again here
+            logger.info(
+                f"[DIAGNOSTICS] chunks={len(result.upserted_ids) + len(result.failed_ids)} "
+                f"dimension={result.dimension or 'unknown'} "
+                f"embed={result.embed_seconds * 1000:.1f}ms upsert={result.upsert_seconds * 1000:.1f}ms "
+                f"(summed over {self.ingestion_engine.max_concurrency} workers)"
+            )
+        return result
+
     def add_documents(self, documents: List[Document]) -> List[str]:
-        """Add documents to the vector store."""
+        """Add documents to the vector store.
+
+        Writes are upserts keyed by deterministic chunk IDs, so re-adding the
+        same content is idempotent. Returns the IDs of the chunks written.
+        """
         if not documents:
             return []
         
-        # Split documents into chunks
-        split_docs = self.text_splitter.split_documents(documents)
-        
-        # ************** LOGS **************
-        # ************** LOGS **************
-        # ************** LOGS **************
-        logger.info(f"[SPLIT] Split into {len(split_docs)} chunks")
-        if split_docs:
-            logger.info(f"[SPLIT] First chunk preview:\n{split_docs[0].page_content[:300]}")
-        # ************** LOGS **************
-        # ************** LOGS **************
-        # ************** LOGS **************
-
-        # Add to vector store
-        ids = self.vector_store.add_documents(split_docs)
-        self.vector_store.persist()
-
-        # ************** LOGS **************
-        # ************** LOGS **************
-        # ************** LOGS **************
-        logger.info(f"[VECTOR_DB] Added {len(ids)} embedded chunks to collection '{self.collection_name}'")
-        # Inspecte les embeddings générés (attention, ça peut être long)
-        sample_text = split_docs[0].page_content if split_docs else None
-        if sample_text:
-            sample_embedding = self.embeddings.embed_query(sample_text)
-            logger.info(f"[EMBED] Sample embedding (first 10 floats): {sample_embedding[:10]}")
-            logger.info(f"[EMBED] Length of embedding: {len(sample_embedding)} dimensions")
-
-        # ************** LOGS **************
-        # ************** LOGS **************
-        # ************** LOGS **************
-        return ids
+        split_start = time.perf_counter()
+        chunk_ids, split_docs = self.split_documents(documents)
+        if self.ingestion_diagnostics:
+            logger.info(
+                f"[DIAGNOSTICS] documents={len(documents)} chunks={len(split_docs)} "
+                f"split={(time.perf_counter() - split_start) * 1000:.1f}ms"
+            )
+
+        if self.ingestion_diagnostics and split_docs:
+            logger.info(f"[DIAGNOSTICS] First chunk preview:\n{split_docs[0].page_content[:300]}")
+
+        return self.ingest_chunks(zip(chunk_ids, split_docs)).upserted_ids
     
     def add_texts(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[str]:
         """Add raw texts to the vector store."""
@@ -141,11 +498,12 @@ class VectorStoreManager:
         filter: Optional[dict] = None
     ) -> List[Document]:
         """Search for similar documents."""
-        return self.vector_store.similarity_search(
+        self.sync_generation()
+        return _dedupe_documents(self.vector_store.similarity_search(
             query=query,
-            k=k,
+            k=k * 2,
             filter=filter
-        )
+        ), k)
     
     def similarity_search_with_score(
         self,
@@ -154,79 +512,434 @@ class VectorStoreManager:
         filter: Optional[dict] = None
     ) -> List[tuple[Document, float]]:
         """Search for similar documents with similarity scores."""
-        return self.vector_store.similarity_search_with_score(
+        self.sync_generation()
+        return _dedupe_scored(self.vector_store.similarity_search_with_score(
             query=query,
-            k=k,
+            k=k * 2,
             filter=filter
-        )
+        ), k)
+    
+    def similarity_search_with_relevance_scores(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[tuple[Document, float]]:
+        """Search for similar documents with relevance scores in [0, 1] (higher is better)."""
+        self.sync_generation()
+        return _dedupe_scored(self.vector_store.similarity_search_with_relevance_scores(
+            query=query,
+            k=k * 2,
+            filter=filter
+        ), k)
+    
+    def _ensure_keyword_index(self, page_size: int = 1000) -> bool:
+        """Build the keyword index from the collection if not done yet."""
+        if self.keyword_index is None:
+            return False
+        if self._keyword_index_loaded:
+            return True
+        with self._write_lock:
+            if self._keyword_index_loaded:
+                return True
+            try:
+                collection = self._collection()
+                offset = 0
+                while True:
+                    page = collection.get(
+                        include=["documents", "metadatas"], limit=page_size, offset=offset
+                    )
+                    if not page["ids"]:
+                        break
+                    self.keyword_index.add(page["ids"], [
+                        Document(page_content=text or "", metadata=metadata or {})
+                        for text, metadata in zip(page["documents"], page["metadatas"])
+                    ])
+                    offset += len(page["ids"])
+            except Exception as e:
+                # No collection yet; the index starts empty and follows the writes
+                logger.info(f"[KEYWORD_INDEX] Starting with an empty index: {e}")
+                self.keyword_index.clear()
+            self._keyword_index_loaded = True
+        logger.info(f"[KEYWORD_INDEX] Indexed {len(self.keyword_index)} chunks")
+        return True
+
+    def keyword_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[tuple[Document, float]]:
+        """Search chunks by BM25 keyword relevance, without embedding the query."""
+        self.sync_generation()
+        if not self._ensure_keyword_index():
+            return []
+        return self.keyword_index.search(query, k=k, filter=filter)
+
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[tuple[Document, float]]:
+        """Search with vector and keyword rankings merged by reciprocal rank fusion.
+
+        Queries made up mostly of codes or identifiers are answered from the
+        keyword index alone when it finds enough matches, skipping the query
+        embedding. Scores are fused RRF scores.
+        """
+        self.sync_generation()
+        fetch_k = k * 2
+        keyword_results = [doc for doc, _ in self.keyword_search(query, k=fetch_k, filter=filter)]
+        if len(keyword_results) >= k and keyword_ratio(query) >= self.keyword_query_ratio:
+            return reciprocal_rank_fusion([keyword_results], k=self.rrf_k)[:k]
+
+        vector_results = self.similarity_search(query, k=fetch_k, filter=filter)
+        return reciprocal_rank_fusion([vector_results, keyword_results], k=self.rrf_k)[:k]
+    
+    def similarity_search_by_vectors_with_score(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[List[tuple[Document, float]]]:
+        """Search with several query embeddings in one vector store call.
+
+        Scores are those of ``similarity_search_with_score`` for the backend
+        (distances, lower is better: Chroma's configured space, NumPy cosine).
+        """
+        self.sync_generation()
+        if not embeddings:
+            return []
+        if self.client is None:
+            results = self.vector_store.similarity_search_by_vectors_with_score(embeddings, k=k * 2, filter=filter)
+        else:
+            try:
+                collection = self._collection()
+            except Exception:
+                return [[] for _ in embeddings]
+            response = collection.query(
+                query_embeddings=[list(map(float, embedding)) for embedding in embeddings],
+                n_results=k * 2,
+                where=filter,
+                include=["documents", "metadatas", "distances"]
+            )
+            results = [
+                [
+                    (Document(page_content=text or "", metadata=metadata or {}), distance)
+                    for text, metadata, distance in zip(texts, metadatas, distances)
+                ]
+                for texts, metadatas, distances in zip(
+                    response["documents"], response["metadatas"], response["distances"]
+                )
+            ]
+
+        return [_dedupe_scored(result, k) for result in results]
+
+    def similarity_search_by_vectors_with_relevance_scores(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[List[tuple[Document, float]]]:
+        """Batched ``similarity_search_with_relevance_scores`` for query embeddings."""
+        relevance = self.vector_store._select_relevance_score_fn()
+        return [
+            [(doc, relevance(score)) for doc, score in result]
+            for result in self.similarity_search_by_vectors_with_score(embeddings, k=k, filter=filter)
+        ]
+
+    def similarity_search_many(
+        self,
+        queries: List[str],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[List[tuple[Document, float]]]:
+        """Vector search for several queries: one embedding call, one vector store query."""
+        return self.similarity_search_by_vectors_with_score(self.embed_queries(queries), k=k, filter=filter)
+
+    def hybrid_search_many(
+        self,
+        queries: List[str],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[List[tuple[Document, float]]]:
+        """Batched ``hybrid_search``; only queries that need vectors are embedded, in one call."""
+        fetch_k = k * 2
+        keyword_results = [
+            [doc for doc, _ in self.keyword_search(query, k=fetch_k, filter=filter)]
+            for query in queries
+        ]
+        needs_vectors = [
+            index for index, query in enumerate(queries)
+            if len(keyword_results[index]) < k or keyword_ratio(query) < self.keyword_query_ratio
+        ]
+        vector_results = dict(zip(needs_vectors, self.similarity_search_many(
+            [queries[index] for index in needs_vectors], k=fetch_k, filter=filter
+        )))
+
+        results = []
+        for index in range(len(queries)):
+            rankings = [keyword_results[index]]
+            if index in vector_results:
+                rankings.insert(0, [doc for doc, _ in vector_results[index]])
+            results.append(reciprocal_rank_fusion(rankings, k=self.rrf_k)[:k])
+        return results
     
+    def delete_chunks(self, ids: List[str]):
+        """Delete chunks from the vector store by ID."""
+        self._check_writable()
+        if not ids:
+            return
+        with self._write_lock:
+            self.vector_store.delete(ids=ids)
+            self._persist()
+            if self._keyword_index_loaded:
+                self.keyword_index.remove(ids)
+        self._bump_kb_version("delete", ids)
+        self._refresh_after_write()
+        logger.info(f"[VECTOR_DB] Deleted {len(ids)} stale chunks from collection '{self.collection_name}'")
+
+    def delete_source_chunks(self, source: str):
+        """Delete every chunk that was ingested from a given source path."""
+        self._check_writable()
+        try:
+            with self._write_lock:
+                collection = self._collection()
+                collection.delete(where={"source": source})
+                self._persist()
+                if self._keyword_index_loaded:
+                    self.keyword_index.remove_source(source)
+            self._bump_kb_version("delete_source", [source])
+            self._refresh_after_write()
+        except Exception as e:
+            logger.warning(f"[VECTOR_DB] Could not delete chunks for {source}: {e}")
+
     def delete_collection(self):
         """Delete the entire collection."""
+        self._check_writable()
         try:
-            self.client.delete_collection(self.collection_name)
+            if self.client is None:
+                self.vector_store.reset()
+            else:
+                self.client.delete_collection(self.collection_name)
         except Exception:
             pass  # Collection might not exist
+        if self.keyword_index is not None:
+            with self._write_lock:
+                self.keyword_index.clear()
+                self._keyword_index_loaded = True
+        self.manifest.clear()
+        self.manifest.save()
+        if self.registry is not None:
+            self.registry.clear()
+        self._bump_kb_version("delete_collection")
+        self._set_collection_info(self._empty_collection_info())
     
-    def get_collection_info(self) -> dict:
-        """Get information about the collection."""
+    def _empty_collection_info(self) -> dict:
+        """Collection info for a collection that does not exist."""
+        return {
+            "name": self.collection_name,
+            "count": 0,
+            "metadata": {}
+        }
+
+    def _set_collection_info(self, info: dict):
+        """Replace the in-memory collection info."""
+        with self._collection_info_lock:
+            self._collection_info = info
+            self._collection_info_at = time.monotonic()
+
+    def refresh_collection_info(self) -> dict:
+        """Read the collection count and metadata from Chroma and keep them in memory."""
+        info = self._fetch_collection_info()
+        self._set_collection_info(info)
+        return dict(info)
+
+    def get_collection_info(self, refresh: bool = False) -> dict:
+        """Get information about the collection.
+
+        Served from memory; Chroma is only queried when ``refresh`` is set or
+        the cached info is older than ``collection_info_refresh_seconds``.
+        """
+        self.sync_generation()
+        with self._collection_info_lock:
+            info = self._collection_info
+            fresh = time.monotonic() - self._collection_info_at < self.collection_info_refresh_seconds
+        if info is not None and fresh and not refresh:
+            return dict(info)
+        return self.refresh_collection_info()
+
+    def _fetch_collection_info(self) -> dict:
+        """Query Chroma for the collection's count and metadata."""
         try:
-            collection = self.client.get_collection(self.collection_name)
+            collection = self._collection()
             return {
                 "name": collection.name,
                 "count": collection.count(),
                 "metadata": collection.metadata
             }
         except Exception:
-            return {
-                "name": self.collection_name,
-                "count": 0,
-                "metadata": {}
-            }
+            return self._empty_collection_info()
     
     def load_documents_from_directory(self, directory_path: str) -> int:
-        """Load documents from a directory."""
+        """Incrementally load documents from a directory.
+
+        Only new or modified files are split and embedded; chunks belonging to
+        modified or deleted files are removed. The pipeline is iterator based
+        (files, then chunks, then embedding batches, then upserts): files are
+        parsed in a process pool, large files are chunked lazily, and chunks
+        stream into the embedding stage, so peak memory is bounded by the batch
+        size rather than the corpus size. The numpy index is rewritten once
+        per run, not once per changed file, and readers see the whole run as
+        one index generation (all at once on the numpy backend; Chroma
+        readers share the collection and see writes as they land). Returns
+        the number of files (re-)ingested.
+        """
+        self._check_writable()
+        kb_version = self._kb_version
+        self._run_depth += 1
+        try:
+            return self._load_documents_from_directory(directory_path)
+        finally:
+            self._run_depth -= 1
+            if not self._run_depth and self._kb_version != kb_version:
+                with self._write_lock:
+                    self._persist()
+                self.refresh_collection_info()
+                self._publish_generation()
+
+    def _load_documents_from_directory(self, directory_path: str) -> int:
+        """One ingestion run; see ``load_documents_from_directory``."""
         directory = Path(directory_path)
         if not directory.exists():
             return 0
-        
-        documents = []
-        supported_extensions = {'.txt', '.md', '.json'}
-        
-        for file_path in directory.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
+        run_start = time.perf_counter()
+
+        # The manifest is meaningless if the collection was wiped underneath it
+        if self.manifest.sources() and self.get_collection_info(refresh=True)["count"] == 0:
+            logger.info("[LOAD] Collection is empty, discarding stale ingestion manifest")
+            self.manifest.clear()
+            if self.registry is not None:
+                self.registry.clear()
+
+        # Directory scan: the mtime/size fast path needs only a stat per file
+        stats = {}
+        to_parse = []
+        for file_path in sorted(directory.rglob('*')):
+            if not (file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS):
+                continue
+            source = str(file_path)
+            try:
+                stats[source] = file_path.stat()
+            except OSError as e:
+                print(f"Error loading {file_path}: {e}")
+                continue
+            if not self.manifest.matches_stat(source, stats[source]):
+                entry = self.manifest.get(source)
+                to_parse.append((source, entry["content_hash"] if entry else None, stats[source].st_size))
+
+        # Backfill the table for documents ingested before it was maintained
+        if self.registry is not None and self.manifest.sources() and self.registry.is_empty():
+            self._record_documents([
+                (source, self.manifest.get(source)["content_hash"], len(self.manifest.get(source)["chunk_ids"]))
+                for source in self.manifest.sources()
+            ], {})
+
+        # Remove chunks of deleted files
+        stale_ids = []
+        deleted_sources = self.manifest.sources() - set(stats)
+        for source in deleted_sources:
+            stale_ids.extend(self.manifest.remove(source))
+        self.delete_chunks(stale_ids)
+        if self.registry is not None:
+            self.registry.remove(deleted_sources)
+
+        if not to_parse:
+            logger.info(f"[LOAD] Scanned {directory_path}: {len(stats)} unchanged, {len(stale_ids)} stale chunks removed")
+            self.manifest.save()
+            return 0
+
+        collection_has_chunks = self.get_collection_info()["count"] > 0
+        changed = []
+        unreadable = set()
+
+        def changed_chunks() -> Iterator[Tuple[str, Document]]:
+            """Yield chunks of changed files as they are parsed, one file at a time."""
+            workers = self.ingestion_workers if len(to_parse) >= self.parallel_min_files else 1
+            parsed_files = iter_parsed_files(
+                to_parse, workers, self.chunk_size, self.chunk_overlap, self.stream_threshold
+            )
+            for parsed in parsed_files:
+                if parsed.error:
+                    print(f"Error loading {parsed.source}: {parsed.error}")
+                    continue
+                if parsed.unchanged:
+                    self.manifest.touch(parsed.source, stats[parsed.source])
+                    continue
+
+                # Drop the file's previous chunks before its new ones are upserted
+                tracked = self.manifest.get(parsed.source) is not None
+                self.delete_chunks(self.manifest.remove(parsed.source))
+                if not tracked and collection_has_chunks:
+                    # May hold chunks from an earlier, non-incremental ingestion
+                    self.delete_source_chunks(parsed.source)
+
+                chunk_ids = []
+                changed.append((parsed.source, parsed.content_hash, chunk_ids))
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        
-                    doc = Document(
-                        page_content=content,
-                        metadata={
-                            "source": str(file_path),
-                            "filename": file_path.name,
-                            "file_type": file_path.suffix
-                        }
-                    )
-                    documents.append(doc)
+                    for chunk_id, chunk in parsed.iter_chunks():
+                        chunk_ids.append(chunk_id)
+                        yield chunk_id, chunk
                 except Exception as e:
-                    print(f"Error loading {file_path}: {e}")
-        
-        # ************** LOGS **************
-        # ************** LOGS **************
-        # ************** LOGS **************
-        logger.info(f"[LOAD] Loaded {len(documents)} documents from {directory_path}")
-        if documents:
-            logger.info(f"[LOAD] First document preview:\n{documents[0].page_content[:300]}")
-        # ************** LOGS **************
-        # ************** LOGS **************
-        # ************** LOGS **************
+                    print(f"Error loading {parsed.source}: {e}")
+                    unreadable.add(parsed.source)
 
+        result = self.ingest_chunks(changed_chunks())
 
+        # Files with failed chunks stay out of the manifest and are retried next run
+        ingested = []
+        for source, content_hash, chunk_ids in changed:
+            if source in result.failed_sources or source in unreadable:
+                continue
+            self.manifest.update(source, stats[source], content_hash, chunk_ids)
+            ingested.append((source, content_hash, len(chunk_ids)))
 
+        if self.registry is not None:
+            # Timing of the ingestion run that (re-)indexed the documents
+            self._record_documents(ingested, {
+                "ingestion_run_seconds": round(time.perf_counter() - run_start, 3),
+                "ingestion_run_files": len(ingested),
+                "embed_seconds": round(result.embed_seconds, 3)
+            })
 
-        if documents:
-            self.add_documents(documents)
-        
-        return len(documents)
+        logger.info(
+            f"[LOAD] Scanned {directory_path}: {len(ingested)} new or modified, "
+            f"{len(stats) - len(changed)} unchanged, {len(stale_ids)} stale chunks removed"
+        )
+        self.manifest.save()
+        return len(ingested)
+    
+    def _record_documents(self, documents: List[Tuple[str, str, int]], timing: dict):
+        """Write ``(source, content_hash, chunk_count)`` rows to the knowledge_base table."""
+        rows = []
+        for source, content_hash, chunk_count in documents:
+            entry = self.manifest.get(source) or {}
+            rows.append({
+                "document_name": Path(source).name,
+                "document_path": source,
+                "chunk_count": chunk_count,
+                "metadata": {
+                    "content_hash": content_hash,
+                    "size_bytes": entry.get("size"),
+                    "embedding_model": self.embedding_model_name,
+                    "chunk_size": self.chunk_size,
+                    "chunk_overlap": self.chunk_overlap,
+                    "vector_backend": self.vector_backend,
+                    **timing
+                }
+            })
+        self.registry.record(rows)
     
     def as_retriever(self, **kwargs):
         """Return the vector store as a retriever."""
@@ -0,0 +1,26 @@
+"""Gunicorn settings for running the AI agent service with several workers.
+
+    AGENT_ROLE=reader WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py agent.api:app
+
+Workers are readers: they serve the index and follow the generation
+published by the single writer (``python -m agent.ingest``). The app is
+preloaded so a local embedding model is loaded once in the master and its
+pages are shared by the forked workers.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    """Load the local embedding model before the workers are forked."""
+    if os.getenv("EMBEDDING_PROVIDER", "openai") == "local":
+        from agent.vector_store import local_embeddings
+        
+        local_embeddings(os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+        server.log.info("Local embedding model preloaded for the workers")
@@ -1,13 +1,28 @@
 """AI Agent tests."""
 
+import asyncio
 import pytest
 import os
-from unittest.mock import Mock, patch
+import time
+import numpy as np
+from unittest.mock import AsyncMock, Mock, patch
 from langchain.schema import Document
 
-from agent.core import TreeLineAgent
-from agent.vector_store import VectorStoreManager
+from agent.context import ContextBuilder
+from agent import core
+from agent.core import AgentWarmup, TreeLineAgent
+from agent.vector_store import VectorStoreManager, _dedupe_documents
+from agent.loader import iter_parsed_files, iter_text_segments, make_chunk_id, parse_file
 from agent.rag_pipeline import RAGPipeline
+from agent.embedding_cache import CachedEmbeddings, EmbeddingCache
+from agent.index_report import exact_top_k, recall_at_k
+from agent.ingestion import AdaptiveBackoff, IngestionEngine, is_rate_limit_error
+from agent.keyword_index import BM25Index, keyword_ratio, reciprocal_rank_fusion
+from agent.manifest import IngestionManifest, compute_content_hash
+from agent.numpy_store import NumpyVectorStore
+from agent.registry import KnowledgeBaseRegistry
+from agent.memory import ConversationMemory
+from agent.response_cache import SemanticResponseCache
 
 
 class TestVectorStoreManager:
@@ -32,12 +47,13 @@ class TestVectorStoreManager:
         texts = ["This is a test document", "Another test document"]
         metadatas = [{"source": "test1"}, {"source": "test2"}]
         
-        with patch.object(temp_vector_store.vector_store, 'add_documents') as mock_add:
-            mock_add.return_value = ["id1", "id2"]
+        with patch.object(temp_vector_store, '_upsert_embedded') as mock_upsert, \
+             patch.object(temp_vector_store.ingestion_engine, 'embeddings') as mock_embeddings:
+            mock_embeddings.embed_documents.side_effect = lambda batch: [[0.1, 0.2] for _ in batch]
             ids = temp_vector_store.add_texts(texts, metadatas)
             
             assert len(ids) == 2
-            mock_add.assert_called_once()
+            mock_upsert.assert_called_once()
     
     def test_get_collection_info(self, temp_vector_store):
         """Test getting collection information."""
@@ -49,6 +65,612 @@ class TestVectorStoreManager:
         assert info["name"] == "test_collection"
 
 
+class TestChunkIds:
+    """Test deterministic chunk IDs."""
+    
+    def test_chunk_id_is_deterministic(self):
+        """Test the same chunk always gets the same ID."""
+        assert make_chunk_id("faq.md", 0, "text") == make_chunk_id("faq.md", 0, "text")
+    
+    def test_chunk_id_depends_on_source_index_and_content(self):
+        """Test each ID component changes the ID."""
+        base = make_chunk_id("faq.md", 0, "text")
+        
+        assert make_chunk_id("other.md", 0, "text") != base
+        assert make_chunk_id("faq.md", 1, "text") != base
+        assert make_chunk_id("faq.md", 0, "other text") != base
+    
+    def test_dedupe_documents(self):
+        """Test repeated passages are dropped from search results."""
+        docs = [
+            Document(page_content="A", metadata={}),
+            Document(page_content="B", metadata={}),
+            Document(page_content="A", metadata={}),
+        ]
+        
+        assert [doc.page_content for doc in _dedupe_documents(docs)] == ["A", "B"]
+        assert [doc.page_content for doc in _dedupe_documents(docs, k=1)] == ["A"]
+    
+    def test_search_over_fetches_before_dedupe(self):
+        """Test duplicates do not leave a search with fewer than k results."""
+        manager = VectorStoreManager.__new__(VectorStoreManager)
+        manager.sync_generation = Mock()
+        manager.vector_store = mock_store = Mock()
+        mock_store.similarity_search.return_value = [
+            Document(page_content=text, metadata={}) for text in ["A", "A", "B", "C"]
+        ]
+        
+        found = manager.similarity_search("query", k=2)
+        
+        assert mock_store.similarity_search.call_args.kwargs["k"] == 4
+        assert [doc.page_content for doc in found] == ["A", "B"]
+
+
+class TestLoader:
+    """Test parallel parsing and chunking of knowledge base files."""
+    
+    @pytest.fixture
+    def kb_files(self, tmp_path):
+        """Create a few knowledge base files."""
+        paths = []
+        for i in range(3):
+            file_path = tmp_path / f"doc{i}.md"
+            file_path.write_text(f"Document {i}. " + "word " * 400)
+            paths.append(str(file_path))
+        return paths
+    
+    def test_parse_file_chunks_with_ids(self, kb_files):
+        """Test a file is split into chunks with deterministic IDs."""
+        parsed = parse_file(kb_files[0])
+        
+        assert parsed.error is None
+        assert len(parsed.chunks) == len(parsed.chunk_ids) > 1
+        assert parsed.chunk_ids == parse_file(kb_files[0]).chunk_ids
+        assert parsed.chunks[1].metadata["chunk_index"] == 1
+    
+    def test_parse_file_skips_known_hash(self, kb_files):
+        """Test an unchanged file is hashed but not split."""
+        content_hash = parse_file(kb_files[0]).content_hash
+        
+        parsed = parse_file(kb_files[0], known_hash=content_hash)
+        
+        assert parsed.unchanged is True
+        assert parsed.chunks == []
+    
+    def test_large_files_are_streamed(self, kb_files):
+        """Test files above the threshold are chunked lazily."""
+        parsed = next(iter_parsed_files([(kb_files[0], None, 10_000)], stream_threshold=1_000))
+        
+        assert parsed.chunk_stream is not None
+        chunks = list(parsed.iter_chunks())
+        assert len(chunks) > 1
+        assert [chunk.metadata["chunk_index"] for _, chunk in chunks] == list(range(len(chunks)))
+    
+    def test_iter_text_segments_cuts_on_paragraphs(self, tmp_path):
+        """Test segments end on paragraph breaks and cover the whole file."""
+        file_path = tmp_path / "big.md"
+        content = "\n\n".join(f"Paragraph {i} " + "x" * 50 for i in range(20))
+        file_path.write_text(content)
+        
+        segments = list(iter_text_segments(str(file_path), segment_size=200))
+        
+        assert len(segments) > 1
+        assert "".join(segments) == content
+        assert all(segment.rstrip().endswith("x") for segment in segments)
+    
+    @pytest.mark.slow
+    def test_iter_parsed_files_in_process_pool(self, kb_files):
+        """Test the process pool yields every file."""
+        parsed = list(iter_parsed_files([(path, None, 100) for path in kb_files], workers=2))
+        
+        assert sorted(p.source for p in parsed) == sorted(kb_files)
+        assert all(p.chunks for p in parsed)
+
+
+class TestIngestionManifest:
+    """Test incremental ingestion manifest."""
+    
+    @pytest.fixture
+    def kb_file(self, tmp_path):
+        """Create a knowledge base file."""
+        file_path = tmp_path / "faq.md"
+        file_path.write_text("How do I reset my password?")
+        return file_path
+    
+    def test_unchanged_file_matches_fast_path(self, tmp_path, kb_file):
+        """Test mtime/size fast path after an update."""
+        manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+        stat = kb_file.stat()
+        content_hash = compute_content_hash(kb_file.read_bytes())
+        
+        manifest.update(str(kb_file), stat, content_hash, ["id1", "id2"])
+        
+        assert manifest.matches_stat(str(kb_file), stat)
+        assert manifest.matches_hash(str(kb_file), content_hash)
+    
+    def test_modified_content_changes_hash(self, tmp_path, kb_file):
+        """Test that modified content no longer matches."""
+        manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+        manifest.update(str(kb_file), kb_file.stat(), compute_content_hash(kb_file.read_bytes()), ["id1"])
+        
+        kb_file.write_text("How do I change my email address?")
+        
+        assert not manifest.matches_hash(str(kb_file), compute_content_hash(kb_file.read_bytes()))
+    
+    def test_save_and_reload(self, tmp_path, kb_file):
+        """Test manifest persistence round trip."""
+        manifest_path = str(tmp_path / "manifest.json")
+        manifest = IngestionManifest(manifest_path)
+        manifest.update(str(kb_file), kb_file.stat(), "abc", ["id1", "id2"])
+        manifest.save()
+        
+        reloaded = IngestionManifest(manifest_path)
+        
+        assert reloaded.sources() == {str(kb_file)}
+        assert reloaded.remove(str(kb_file)) == ["id1", "id2"]
+        assert reloaded.sources() == set()
+    
+    def test_corrupt_manifest_starts_empty(self, tmp_path):
+        """Test that an unreadable manifest is ignored."""
+        manifest_path = tmp_path / "manifest.json"
+        manifest_path.write_text("{not json")
+        
+        manifest = IngestionManifest(str(manifest_path))
+        
+        assert manifest.sources() == set()
+
+
+class TestKnowledgeBaseRegistry:
+    """Test per-document ingestion state in the knowledge_base table."""
+    
+    def test_record_upserts_by_path(self, tmp_path):
+        """Test re-recording a document updates its row."""
+        registry = KnowledgeBaseRegistry(f"sqlite:///{tmp_path / 'kb.db'}")
+        
+        registry.record([{"document_name": "faq.md", "document_path": "kb/faq.md", "chunk_count": 2, "metadata": {"content_hash": "a"}}])
+        registry.record([{"document_name": "faq.md", "document_path": "kb/faq.md", "chunk_count": 3, "metadata": {"content_hash": "b"}}])
+        
+        documents = registry.documents()
+        assert len(documents) == 1
+        assert documents[0]["chunk_count"] == 3
+        assert documents[0]["metadata"] == {"content_hash": "b"}
+        registry.close()
+    
+    def test_load_directory_records_documents(self, tmp_path, monkeypatch):
+        """Test ingestion writes and removes rows as files come and go."""
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'kb.db'}")
+        with patch('agent.vector_store.chromadb.PersistentClient'), \
+             patch('agent.vector_store.Chroma'), \
+             patch('agent.vector_store.OpenAIEmbeddings') as mock_embeddings:
+            mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2, 0.3] for _ in texts]
+            store = VectorStoreManager(persist_directory=str(tmp_path / "db"))
+        store.get_collection_info = Mock(return_value={"name": "c", "count": 1, "metadata": {}})
+        kb_dir = tmp_path / "kb"
+        kb_dir.mkdir()
+        (kb_dir / "faq.md").write_text("How do I reset my password?")
+        (kb_dir / "billing.md").write_text("Invoices are sent monthly.")
+        
+        store.load_documents_from_directory(str(kb_dir))
+        
+        documents = store.registry.documents()
+        assert [doc["document_name"] for doc in documents] == ["billing.md", "faq.md"]
+        assert all(doc["chunk_count"] == 1 for doc in documents)
+        assert documents[0]["metadata"]["content_hash"]
+        assert "ingestion_run_seconds" in documents[0]["metadata"]
+        
+        (kb_dir / "billing.md").unlink()
+        store.load_documents_from_directory(str(kb_dir))
+        
+        assert [doc["document_name"] for doc in store.registry.documents()] == ["faq.md"]
+        store.registry.close()
+
+
+class TestEmbeddingCache:
+    """Test the persistent embedding cache."""
+    
+    @pytest.fixture
+    def provider(self):
+        """Create a mock embedding provider."""
+        mock_provider = Mock()
+        mock_provider.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0] for t in texts]
+        mock_provider.embed_query.side_effect = lambda text: [float(len(text)), 2.0]
+        return mock_provider
+    
+    def test_documents_embedded_once(self, tmp_path, provider):
+        """Test repeated documents are served from the cache."""
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+        embeddings = CachedEmbeddings(provider, cache, "test-model")
+        
+        first = embeddings.embed_documents(["a", "bb", "a"])
+        second = embeddings.embed_documents(["bb", "a"])
+        
+        assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+        assert second == [[2.0, 1.0], [1.0, 1.0]]
+        provider.embed_documents.assert_called_once_with(["a", "bb"])
+    
+    def test_queries_cached_separately(self, tmp_path, provider):
+        """Test query embeddings are cached under their own kind."""
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+        embeddings = CachedEmbeddings(provider, cache, "test-model")
+        
+        embeddings.embed_documents(["reset password"])
+        assert embeddings.embed_query("reset password") == [14.0, 2.0]
+        assert embeddings.embed_query("reset password") == [14.0, 2.0]
+        
+        provider.embed_query.assert_called_once_with("reset password")
+    
+    def test_cache_persists_across_instances(self, tmp_path, provider):
+        """Test vectors survive a restart."""
+        path = str(tmp_path / "cache.sqlite3")
+        CachedEmbeddings(provider, EmbeddingCache(path), "test-model").embed_documents(["a"])
+        
+        restarted = CachedEmbeddings(provider, EmbeddingCache(path), "test-model")
+        
+        assert restarted.embed_documents(["a"]) == [[1.0, 1.0]]
+        assert provider.embed_documents.call_count == 1
+    
+    def test_cache_keyed_by_model(self, tmp_path, provider):
+        """Test different models do not share vectors."""
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+        CachedEmbeddings(provider, cache, "model-a").embed_documents(["a"])
+        CachedEmbeddings(provider, cache, "model-b").embed_documents(["a"])
+        
+        assert provider.embed_documents.call_count == 2
+    
+    def test_size_bounded_eviction(self, tmp_path):
+        """Test the disk layer is bounded to max_entries."""
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=2, memory_entries=1)
+        for text_hash in ["h1", "h2", "h3", "h4"]:
+            cache.put_many("m", "document", {text_hash: [1.0]})
+        
+        assert len(cache.get_many("m", "document", ["h1", "h2", "h3", "h4"])) == 2
+
+
+class TestIngestionDiagnostics:
+    """Test the add_documents hot path."""
+    
+    @pytest.fixture
+    def patched_vector_store(self, tmp_path, monkeypatch):
+        """Create a vector store with Chroma and the embedding provider mocked."""
+        monkeypatch.setenv("INGESTION_DIAGNOSTICS", "true")
+        with patch('agent.vector_store.chromadb.PersistentClient'), \
+             patch('agent.vector_store.Chroma'), \
+             patch('agent.vector_store.OpenAIEmbeddings') as mock_embeddings:
+            mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1, 0.2, 0.3] for _ in texts]
+            store = VectorStoreManager(persist_directory=str(tmp_path / "db"))
+            yield store, mock_embeddings.return_value
+    
+    def test_add_documents_makes_no_extra_model_calls(self, patched_vector_store):
+        """Test diagnostics do not re-embed a sample chunk."""
+        store, provider = patched_vector_store
+        
+        ids = store.add_documents([Document(page_content="Some text", metadata={"source": "a.md"})])
+        
+        assert len(ids) == 1
+        provider.embed_query.assert_not_called()
+    
+    def test_load_directory_is_incremental(self, patched_vector_store, tmp_path):
+        """Test an unchanged corpus is not re-embedded on restart."""
+        store, provider = patched_vector_store
+        store.get_collection_info = Mock(return_value={"name": "c", "count": 1, "metadata": {}})
+        kb_dir = tmp_path / "kb"
+        kb_dir.mkdir()
+        (kb_dir / "faq.md").write_text("How do I reset my password?")
+        
+        assert store.load_documents_from_directory(str(kb_dir)) == 1
+        assert store.load_documents_from_directory(str(kb_dir)) == 0
+        assert provider.embed_documents.call_count == 1
+    
+    def test_add_documents_is_idempotent(self, patched_vector_store):
+        """Test re-adding the same document yields the same chunk IDs."""
+        store, _ = patched_vector_store
+        doc = Document(page_content="Some text", metadata={"source": "a.md"})
+        
+        assert store.add_documents([doc]) == store.add_documents([doc])
+    
+    def test_collection_info_is_cached(self, patched_vector_store):
+        """Test collection info is served from memory and refreshed after writes."""
+        store, _ = patched_vector_store
+        store.client.get_collection.reset_mock()  # startup HNSW parameter check
+        collection = store.client.get_collection.return_value
+        collection.count.return_value = 3
+        
+        assert store.get_collection_info()["count"] == 3
+        assert store.get_collection_info()["count"] == 3
+        assert store.client.get_collection.call_count == 1
+        
+        collection.count.return_value = 4
+        store.add_documents([Document(page_content="New text", metadata={"source": "b.md"})])
+        assert store.get_collection_info()["count"] == 4
+        assert store.client.get_collection.call_count == 2
+        
+        store.delete_collection()
+        assert store.get_collection_info()["count"] == 0
+    
+    def test_collection_without_hnsw_metadata_uses_chroma_defaults(self, patched_vector_store, monkeypatch):
+        """Test explicitly set HNSW parameters are compared against Chroma's defaults for bare collections."""
+        store, _ = patched_vector_store
+        store.client.get_collection.return_value.metadata = None
+        
+        with patch('agent.vector_store.logger') as mock_logger:
+            # Built-in defaults (search_ef=64) do not warn on every startup
+            store._check_collection_metadata()
+            monkeypatch.setenv("HNSW_SPACE", "l2")
+            monkeypatch.setenv("HNSW_NUM_THREADS", "4")
+            store.collection_metadata = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:search_ef": 64, "hnsw:num_threads": 4}
+            store._check_collection_metadata()
+            mock_logger.warning.assert_not_called()
+            
+            monkeypatch.setenv("HNSW_SPACE", "cosine")
+            store.collection_metadata = {"hnsw:space": "cosine", "hnsw:M": 16}
+            store._check_collection_metadata()
+            assert "('l2', 'cosine')" in mock_logger.warning.call_args[0][0]
+
+
+class RateLimitError(Exception):
+    """Stand-in for a provider 429 error."""
+    
+    status_code = 429
+
+
+class TestNumpyVectorStore:
+    """Test the memory-mapped NumPy vector backend."""
+    
+    @pytest.fixture
+    def embeddings(self):
+        """Embed texts by counting a few keywords."""
+        words = ["password", "refund", "invoice"]
+        embed = lambda text: [float(text.lower().count(word)) + 0.01 for word in words]
+        mock = Mock()
+        mock.embed_query.side_effect = embed
+        mock.embed_documents.side_effect = lambda texts: [embed(text) for text in texts]
+        return mock
+    
+    def test_search_survives_reload(self, tmp_path, embeddings):
+        """Test persisted vectors are memory-mapped back and searched by cosine distance."""
+        store = NumpyVectorStore(tmp_path / "index", embeddings)
+        store.add_texts(
+            ["Reset your password", "Refunds take five days", "Invoices are emailed monthly"],
+            metadatas=[{"source": "a.md", "chunk_index": 0}, {"source": "b.md", "chunk_index": 0}, {"source": "c.md"}],
+            ids=["a", "b", "c"]
+        )
+        
+        reloaded = NumpyVectorStore(tmp_path / "index", embeddings)
+        results = reloaded.similarity_search_with_score("how do I get a refund", k=2)
+        
+        assert isinstance(reloaded._vectors, np.memmap)
+        assert results[0][0].page_content == "Refunds take five days"
+        assert results[0][0].metadata == {"source": "b.md", "chunk_index": 0}
+        # Cosine distances, ranked ascending like Chroma's
+        assert 0.0 <= results[0][1] < results[1][1]
+        assert reloaded._select_relevance_score_fn()(results[0][1]) == pytest.approx(1.0 - results[0][1])
+        assert reloaded.similarity_search("password", k=1, filter={"source": "c.md"})[0].metadata["source"] == "c.md"
+    
+    def test_upsert_and_delete(self, tmp_path, embeddings):
+        """Test upserts replace rows and deletes by ID or source hide them before and after persisting."""
+        store = NumpyVectorStore(tmp_path / "index", embeddings)
+        store.add_texts(["Reset your password", "Refunds take five days"], metadatas=[{"source": "a.md"}, {"source": "b.md"}], ids=["a", "b"])
+        
+        store.upsert(["a"], embeddings.embed_documents(["Invoice copies"]), [{"source": "a.md"}], ["Invoice copies"])
+        store.delete(where={"source": "b.md"})
+        
+        assert store.count() == 1
+        assert store.similarity_search("refund", k=4)[0].page_content == "Invoice copies"
+        store.persist()
+        assert NumpyVectorStore(tmp_path / "index", embeddings).get()["ids"] == ["a"]
+    
+    def test_persist_swaps_versioned_directories(self, tmp_path, embeddings):
+        """Test each persist writes a new version, switches the pointer and keeps the previous one."""
+        store = NumpyVectorStore(tmp_path / "index", embeddings)
+        versions = []
+        for text in ("one", "two", "three"):
+            store.add_texts([text])
+            versions.append((tmp_path / "index" / "CURRENT").read_text())
+        
+        assert len(set(versions)) == 3
+        assert sorted(path.name for path in (tmp_path / "index").iterdir() if path.is_dir()) == sorted(versions[1:])
+        assert NumpyVectorStore(tmp_path / "index", embeddings).count() == 3
+    
+    def test_generated_ids_survive_deletes(self, tmp_path, embeddings):
+        """Test texts added without IDs after a delete do not overwrite existing rows."""
+        store = NumpyVectorStore(tmp_path / "index", embeddings)
+        first = store.add_texts(["one", "two"])
+        store.delete(ids=first[:1])
+        store.add_texts(["three"])
+        
+        assert sorted(store.get()["documents"]) == ["three", "two"]
+    
+    def test_get_pages_across_segment_and_overlay(self, tmp_path, embeddings):
+        """Test paging returns every live chunk once, mapped rows then unpersisted ones."""
+        store = NumpyVectorStore(tmp_path / "index", embeddings)
+        store.add_texts(["one", "two", "three"], ids=["a", "b", "c"])
+        store.delete(ids=["b"])
+        store.upsert(["d", "e"], embeddings.embed_documents(["four", "five"]), documents=["four", "five"])
+        
+        pages = [store.get(limit=2, offset=offset)["ids"] for offset in (0, 2, 4)]
+        
+        assert pages == [["a", "c"], ["d", "e"], []]
+        assert store.get()["documents"] == ["one", "three", "four", "five"]
+    
+    def test_batched_search_matches_single(self, tmp_path, embeddings):
+        """Test multi-query search returns the same results as one query at a time."""
+        store = NumpyVectorStore(tmp_path / "index", embeddings)
+        store.add_texts(["Reset your password", "Refunds take five days", "Invoices are emailed monthly"])
+        queries = embeddings.embed_documents(["refund", "password reset", "invoice"])
+        
+        batched = store.similarity_search_by_vectors_with_score(queries, k=2)
+        
+        assert batched == [store.similarity_search_by_vector_with_score(q, k=2) for q in queries]
+    
+    def test_ivf_probes_trade_recall(self, tmp_path):
+        """Test IVF search matches exact search when every list is probed."""
+        rng = np.random.default_rng(0)
+        corpus = rng.normal(size=(400, 8)).astype(np.float32)
+        store = NumpyVectorStore(tmp_path / "index", embedding=None, index_type="ivf", ivf_lists=10)
+        store.upsert([str(i) for i in range(400)], corpus, documents=[str(i) for i in range(400)])
+        store.persist()
+        queries = corpus[:20]
+        truth = exact_top_k(corpus, queries, 5)
+        
+        def found(probes):
+            return [
+                [int(doc.page_content) for doc, _ in store.similarity_search_by_vector_with_score(q, k=5, probes=probes)]
+                for q in queries
+            ]
+        
+        assert store.metadata["ivf_lists"] == 10
+        assert recall_at_k(truth, found(10)) == 1.0
+        assert recall_at_k(truth, found(1)) <= recall_at_k(truth, found(5))
+    
+    def test_manager_uses_numpy_backend(self, tmp_path, monkeypatch, embeddings):
+        """Test VECTOR_BACKEND=numpy bypasses Chroma entirely."""
+        monkeypatch.setenv("VECTOR_BACKEND", "numpy")
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+        with patch('agent.vector_store.chromadb.PersistentClient') as mock_client, \
+             patch('agent.vector_store.OpenAIEmbeddings', return_value=embeddings):
+            manager = VectorStoreManager(persist_directory=str(tmp_path / "db"))
+            manager.add_texts(["Refunds take five days"], [{"source": "b.md"}])
+        
+        mock_client.assert_not_called()
+        assert manager.get_collection_info()["count"] == 1
+        assert manager.similarity_search("refund")[0].page_content == "Refunds take five days"
+        assert manager.as_retriever().invoke("refund")[0].metadata["source"] == "b.md"
+
+
+class TestIndexGeneration:
+    """Test single-writer ingestion with read-only workers."""
+    
+    @pytest.fixture
+    def managers(self, tmp_path, monkeypatch):
+        """Create a writer and a reader over the same numpy index."""
+        monkeypatch.setenv("VECTOR_BACKEND", "numpy")
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+        embeddings = Mock()
+        embeddings.embed_query.side_effect = lambda text: [float("refund" in text.lower()) + 0.01, 1.0]
+        embeddings.embed_documents.side_effect = lambda texts: [embeddings.embed_query(text) for text in texts]
+        with patch('agent.vector_store.OpenAIEmbeddings', return_value=embeddings):
+            writer = VectorStoreManager(persist_directory=str(tmp_path / "db"))
+            reader = VectorStoreManager(persist_directory=str(tmp_path / "db"), read_only=True)
+        reader.generation_check_seconds = 0
+        return writer, reader
+    
+    def test_reader_follows_published_generation(self, managers):
+        """Test a reader re-opens the index once the writer publishes, and refuses writes."""
+        writer, reader = managers
+        assert reader.get_collection_info()["count"] == 0
+        
+        writer.add_texts(["Refunds take five days"], [{"source": "b.md"}])
+        
+        assert reader.similarity_search("refund")[0].page_content == "Refunds take five days"
+        assert reader.generation == writer.generation == 1
+        assert reader.kb_version == writer.kb_version
+        with pytest.raises(RuntimeError):
+            reader.delete_collection()
+    
+    def test_directory_run_is_one_generation(self, managers, tmp_path):
+        """Test an ingestion run publishes a single generation however many writes it makes."""
+        writer, reader = managers
+        kb_dir = tmp_path / "kb"
+        kb_dir.mkdir()
+        (kb_dir / "a.md").write_text("Refunds take five days")
+        (kb_dir / "b.md").write_text("Invoices are emailed monthly")
+        writer.load_documents_from_directory(str(kb_dir))
+        
+        (kb_dir / "a.md").unlink()
+        writer.load_documents_from_directory(str(kb_dir))
+        writer.load_documents_from_directory(str(kb_dir))
+        
+        assert writer.generation == 2
+        assert reader.get_collection_info()["count"] == 1
+    
+    def test_directory_run_persists_once(self, managers, tmp_path):
+        """Test modified files are rewritten into the numpy index with one persist per run."""
+        writer, reader = managers
+        kb_dir = tmp_path / "kb"
+        kb_dir.mkdir()
+        for i in range(5):
+            (kb_dir / f"{i}.md").write_text(f"Refund policy {i}")
+        writer.load_documents_from_directory(str(kb_dir))
+        for i in range(5):
+            (kb_dir / f"{i}.md").write_text(f"Updated refund policy {i}")
+        
+        with patch.object(writer.vector_store, "persist", wraps=writer.vector_store.persist) as persist:
+            assert writer.load_documents_from_directory(str(kb_dir)) == 5
+        
+        assert persist.call_count == 1
+        assert reader.get_collection_info()["count"] == 5
+        assert reader.similarity_search("refund", k=5)[0].page_content.startswith("Updated")
+
+
+class TestIngestionEngine:
+    """Test batched, concurrent ingestion."""
+    
+    @staticmethod
+    def make_chunks(count, source="a.md"):
+        """Create chunk IDs and documents."""
+        ids = [f"id{i}" for i in range(count)]
+        docs = [Document(page_content=f"chunk {i}", metadata={"source": source}) for i in range(count)]
+        return ids, docs
+    
+    def test_batches_and_upserts_all_chunks(self):
+        """Test chunks are split into batches and all upserted in order."""
+        embeddings = Mock()
+        embeddings.embed_documents.side_effect = lambda texts: [[1.0, 0.0] for _ in texts]
+        upsert = Mock()
+        engine = IngestionEngine(embeddings, upsert, batch_size=2, max_concurrency=2)
+        ids, docs = self.make_chunks(5)
+        
+        result = engine.ingest(zip(ids, docs))
+        
+        assert sorted(result.upserted_ids) == sorted(ids)
+        assert result.failed_ids == []
+        assert result.dimension == 2
+        assert embeddings.embed_documents.call_count == 3
+        assert upsert.call_count == 3
+    
+    def test_rate_limit_resumes_without_reembedding(self):
+        """Test a throttled batch retries only the chunks not yet embedded."""
+        calls = []
+        
+        def embed_documents(texts):
+            calls.append(list(texts))
+            if len(calls) == 1:
+                raise RateLimitError("Rate limit reached")
+            return [[1.0] for _ in texts]
+        
+        embeddings = Mock()
+        embeddings.embed_documents.side_effect = embed_documents
+        engine = IngestionEngine(
+            embeddings, Mock(), batch_size=4, max_concurrency=1,
+            backoff=AdaptiveBackoff(base_delay=0.0, max_delay=0.0)
+        )
+        ids, docs = self.make_chunks(4)
+        
+        result = engine.ingest(zip(ids, docs))
+        
+        assert result.upserted_ids == ids
+        assert calls[1:] == [["chunk 0", "chunk 1"], ["chunk 2", "chunk 3"]]
+    
+    def test_non_transient_error_fails_batch(self):
+        """Test a permanent error fails the batch and reports its sources."""
+        embeddings = Mock()
+        embeddings.embed_documents.side_effect = ValueError("invalid input")
+        engine = IngestionEngine(embeddings, Mock(), batch_size=10)
+        ids, docs = self.make_chunks(3, source="broken.md")
+        
+        result = engine.ingest(zip(ids, docs))
+        
+        assert result.upserted_ids == []
+        assert result.failed_ids == ids
+        assert result.failed_sources == {"broken.md"}
+        assert embeddings.embed_documents.call_count == 1
+    
+    def test_is_rate_limit_error(self):
+        """Test 429 detection."""
+        assert is_rate_limit_error(RateLimitError("slow down"))
+        assert not is_rate_limit_error(ValueError("bad request"))
+
+
 class TestRAGPipeline:
     """Test RAG pipeline functionality."""
     
@@ -108,6 +730,427 @@ class TestRAGPipeline:
             mock_fallback.assert_called_once()
 
 
+class TestAsyncGeneration:
+    """Test the non-blocking generation path."""
+    
+    @pytest.fixture
+    def async_rag_pipeline(self):
+        """Create RAG pipeline with the LLM and retriever mocked."""
+        mock_store = Mock(spec=VectorStoreManager)
+        mock_store.get_collection_info.return_value = {"name": "c", "count": 5, "metadata": {}}
+        with patch('agent.rag_pipeline.ChatOpenAI'):
+            pipeline = RAGPipeline(vector_store_manager=mock_store)
+        pipeline.response_cache = None
+        yield pipeline
+    
+    @pytest.mark.asyncio
+    async def test_agenerate_response_uses_ainvoke(self, async_rag_pipeline):
+        """Test the async path awaits retrieval and the LLM instead of blocking on invoke."""
+        async_rag_pipeline.vector_store_manager.similarity_search_with_relevance_scores.return_value = [
+            (Document(page_content="Password reset", metadata={}), 0.9)
+        ]
+        async_rag_pipeline.llm.ainvoke = AsyncMock(return_value=Mock(content="Reset it from the login page."))
+        
+        result = await async_rag_pipeline.agenerate_response("How do I reset my password?", "s1")
+        
+        assert result["response"] == "Reset it from the login page."
+        assert result["sources_used"] == 1
+        assert result["knowledge_base_size"] == 5
+        async_rag_pipeline.llm.invoke.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_agenerate_response_falls_back_on_error(self, async_rag_pipeline):
+        """Test retrieval errors produce an async fallback response."""
+        async_rag_pipeline.vector_store_manager.similarity_search_with_relevance_scores.side_effect = RuntimeError("boom")
+        
+        with patch.object(async_rag_pipeline, '_agenerate_fallback_response', new=AsyncMock(
+            return_value={"response": "Fallback", "fallback_used": True}
+        )) as mock_fallback:
+            result = await async_rag_pipeline.agenerate_response("Hi", "s1")
+        
+        assert result["fallback_used"] is True
+        mock_fallback.assert_awaited_once_with("Hi", "s1", error="boom")
+
+
+class TestBatchGeneration:
+    """Test batch generation and search."""
+    
+    @pytest.fixture
+    def batch_pipeline(self):
+        """Create RAG pipeline whose store returns one chunk per query."""
+        mock_store = Mock(spec=VectorStoreManager)
+        mock_store.get_collection_info.return_value = {"name": "c", "count": 5, "metadata": {}}
+        mock_store.embed_queries.side_effect = lambda texts: [[float(i), 1.0] for i, _ in enumerate(texts)]
+        mock_store.similarity_search_by_vectors_with_relevance_scores.side_effect = lambda vectors, k: [
+            [(Document(page_content=f"Chunk {i}", metadata={}), 0.9)] for i in range(len(vectors))
+        ]
+        with patch('agent.rag_pipeline.ChatOpenAI'):
+            pipeline = RAGPipeline(vector_store_manager=mock_store)
+        pipeline.response_cache = None
+        return pipeline
+    
+    @pytest.mark.asyncio
+    async def test_agenerate_batch_keeps_order_and_limits_concurrency(self, batch_pipeline):
+        """Test queries share one embedding call and LLM calls stay under the limit."""
+        running = {"now": 0, "max": 0}
+        
+        async def ainvoke(prompt):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01 if "Question 0" in prompt else 0)
+            running["now"] -= 1
+            return Mock(content=prompt.split("Customer Question: ")[1].split("\n")[0])
+        
+        batch_pipeline.llm.ainvoke = ainvoke
+        queries = [f"Question {i}" for i in range(5)]
+        
+        results = await batch_pipeline.agenerate_batch(queries, max_concurrency=2)
+        
+        assert [r["response"] for r in results] == queries
+        assert all(r["sources_used"] == 1 for r in results)
+        assert running["max"] == 2
+        batch_pipeline.vector_store_manager.embed_queries.assert_called_once()
+        batch_pipeline.vector_store_manager.similarity_search_by_vectors_with_relevance_scores.assert_called_once()
+        
+        # Requests cannot raise concurrency above BATCH_MAX_CONCURRENCY
+        running["max"] = 0
+        batch_pipeline.batch_max_concurrency = 3
+        await batch_pipeline.agenerate_batch(queries, max_concurrency=1000)
+        assert running["max"] == 3
+    
+    @pytest.mark.asyncio
+    async def test_agenerate_batch_isolates_llm_errors(self, batch_pipeline):
+        """Test one failed LLM call falls back without failing the batch."""
+        async def ainvoke(prompt):
+            if "Question 1" in prompt:
+                raise RuntimeError("rate limited")
+            return Mock(content="Answer")
+        
+        batch_pipeline.llm.ainvoke = ainvoke
+        with patch.object(batch_pipeline, '_agenerate_fallback_response', new=AsyncMock(
+            return_value={"response": "Fallback", "fallback_used": True}
+        )):
+            results = await batch_pipeline.agenerate_batch(["Question 0", "Question 1"])
+        
+        assert [r["response"] for r in results] == ["Answer", "Fallback"]
+    
+    def test_search_knowledge_many_uses_batched_search(self, batch_pipeline):
+        """Test vector batch search goes through one multi-query call."""
+        store = batch_pipeline.vector_store_manager
+        store.similarity_search_many.return_value = [
+            [(Document(page_content="Refunds", metadata={}), 0.1)],
+            [(Document(page_content="Passwords", metadata={}), 0.2)],
+        ]
+        
+        results = batch_pipeline.search_knowledge_many(["refund", "password"], include_scores=True, mode="vector")
+        
+        assert [r[0]["content"] for r in results] == ["Refunds", "Passwords"]
+        assert results[1][0]["score"] == 0.2
+        store.similarity_search_many.assert_called_once_with(["refund", "password"], k=4)
+
+
+class TestSemanticResponseCache:
+    """Test the semantic response cache."""
+    
+    VECTORS = {
+        "how do i reset my password": [1.0, 0.0, 0.0],
+        "how can i reset my password?": [0.99, 0.1, 0.0],
+        "what are your opening hours": [0.0, 1.0, 0.0],
+    }
+    
+    @pytest.fixture
+    def cache(self):
+        """Create a cache over a fixed embedding table."""
+        return SemanticResponseCache(
+            embed_query=lambda text: self.VECTORS[text],
+            similarity_threshold=0.95,
+            ttl_seconds=60,
+            max_entries=2
+        )
+    
+    def test_near_duplicate_hits(self, cache):
+        """Test a paraphrased question is served from the cache."""
+        cache.put("how do i reset my password", cache.embed("how do i reset my password"), "v1", {"response": "A"})
+        
+        hit = cache.get(cache.embed("how can i reset my password?"), "v1")
+        assert hit is not None
+        assert hit[0]["response"] == "A"
+        assert hit[1] > 0.95
+        assert cache.get(cache.embed("what are your opening hours"), "v1") is None
+    
+    def test_knowledge_base_change_invalidates(self, cache):
+        """Test entries are dropped when the knowledge base version changes."""
+        vector = cache.embed("how do i reset my password")
+        cache.get(vector, "v1")
+        cache.put("how do i reset my password", vector, "v1", {"response": "A"})
+        
+        assert cache.get(vector, "v2") is None
+        assert cache.stats["entries"] == 0
+        # Answers generated against an older version are not cached
+        cache.put("how do i reset my password", vector, "v1", {"response": "A"})
+        assert cache.stats["entries"] == 0
+    
+    def test_ttl_and_lru(self, cache):
+        """Test expired and least recently used entries are evicted."""
+        for query in self.VECTORS:
+            cache.put(query, cache.embed(query), "v1", {"response": query})
+        assert cache.stats["entries"] == 2
+        assert cache.get(cache.embed("how do i reset my password"), "v1")[0]["response"] != "how do i reset my password"
+        
+        with patch('agent.response_cache.time.time', return_value=time.time() + 120):
+            assert cache.get(cache.embed("what are your opening hours"), "v1") is None
+        assert cache.stats["entries"] == 0
+    
+    def test_pipeline_serves_cache_hit(self):
+        """Test a repeated question skips retrieval and the LLM."""
+        mock_store = Mock(spec=VectorStoreManager)
+        mock_store.get_collection_info.return_value = {"name": "c", "count": 5, "metadata": {}}
+        mock_store.kb_version = "v1"
+        cache = SemanticResponseCache(embed_query=lambda text: [1.0, 0.0])
+        with patch('agent.rag_pipeline.ChatOpenAI'):
+            pipeline = RAGPipeline(vector_store_manager=mock_store, response_cache=cache)
+        mock_store.similarity_search_with_relevance_scores.return_value = [
+            (Document(page_content="Password reset", metadata={}), 0.9)
+        ]
+        pipeline.llm.invoke.return_value = Mock(content="Reset it from the login page.")
+        
+        first = pipeline.generate_response("How do I reset my password?", "s1")
+        second = pipeline.generate_response("How do I reset my password", "s2")
+        
+        assert "cache_hit" not in first
+        assert second["cache_hit"] is True
+        assert second["session_id"] == "s2"
+        assert second["response"] == first["response"]
+        assert "source_documents" not in second
+        pipeline.llm.invoke.assert_called_once()
+
+
+class TestConversationMemory:
+    """Test per-session conversation memory."""
+    
+    @pytest.fixture
+    def conversations_db(self, tmp_path):
+        """Create a conversations table with two earlier turns."""
+        import sqlite3
+        db_path = tmp_path / "conversations.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE conversations (session_id TEXT, user_message TEXT, ai_response TEXT, created_at TEXT)"
+        )
+        conn.executemany("INSERT INTO conversations VALUES (?, ?, ?, ?)", [
+            ("s1", "I can't log in", "Have you tried resetting your password?", "2024-01-01 10:00:00"),
+            ("s1", "Yes, no email arrived", "Please check your spam folder.", "2024-01-01 10:01:00"),
+        ])
+        conn.commit()
+        conn.close()
+        return f"sqlite:///{db_path}"
+    
+    def test_history_loaded_from_database(self, conversations_db):
+        """Test a session's earlier turns are loaded once from the conversations table."""
+        memory = ConversationMemory(summarize=Mock(), database_url=conversations_db)
+        
+        history = memory.get_history("s1")
+        
+        assert history.index("I can't log in") < history.index("no email arrived")
+        assert memory.last_user_message("s1") == "Yes, no email arrived"
+        assert memory.get_history("unknown") == ""
+    
+    def test_turns_from_other_workers_reloaded(self, conversations_db):
+        """Test a cached session is reloaded once the table has turns it has not seen."""
+        import sqlite3
+        memory = ConversationMemory(summarize=Mock(), database_url=conversations_db, sync_seconds=0)
+        memory.add_turn("s1", "Still nothing", "Let me resend the email.")
+        assert memory.last_user_message("s1") == "Still nothing"
+    
+        # The local turn reaches the table, then another worker answers one more
+        conn = sqlite3.connect(conversations_db[len("sqlite:///"):])
+        conn.executemany("INSERT INTO conversations VALUES (?, ?, ?, ?)", [
+            ("s1", "Still nothing", "Let me resend the email.", "2024-01-01 10:02:00"),
+            ("s1", "It arrived, thanks", "Glad to help!", "2024-01-01 10:03:00"),
+        ])
+        conn.commit()
+        conn.close()
+    
+        assert memory.last_user_message("s1") == "It arrived, thanks"
+        assert memory.get_history("s1").count("Still nothing") == 1
+    
+    def test_old_turns_folded_into_summary_once(self):
+        """Test history stays within the token budget and old turns are summarized once."""
+        summarize = Mock(return_value="Customer cannot log in.")
+        memory = ConversationMemory(summarize=summarize, token_budget=60)
+        for i in range(6):
+            memory.add_turn("s1", f"Question number {i} about my account login", f"Answer number {i} " * 3)
+        
+        history = memory.get_history("s1")
+        
+        assert history.startswith("Summary of earlier conversation: Customer cannot log in.")
+        assert "Question number 5" in history
+        assert "Question number 0" not in history
+        assert summarize.call_count == 1
+        assert memory.get_history("s1") == history
+        assert summarize.call_count == 1
+    
+    def test_follow_up_uses_history(self):
+        """Test a follow-up question is retrieved and answered with the session history."""
+        mock_store = Mock(spec=VectorStoreManager)
+        mock_store.get_collection_info.return_value = {"name": "c", "count": 5, "metadata": {}}
+        memory = ConversationMemory(summarize=Mock())
+        with patch('agent.rag_pipeline.ChatOpenAI'):
+            pipeline = RAGPipeline(vector_store_manager=mock_store, memory=memory)
+        pipeline.response_cache = None
+        mock_store.similarity_search_with_relevance_scores.return_value = []
+        pipeline.llm.invoke.return_value = Mock(content="The annual plan costs $100.")
+        
+        pipeline.generate_response("How much is the monthly plan?", "s1")
+        pipeline.generate_response("And the annual one?", "s1")
+        
+        retrieval_query = mock_store.similarity_search_with_relevance_scores.call_args[0][0]
+        prompt = pipeline.llm.invoke.call_args[0][0]
+        assert "monthly plan" in retrieval_query and "annual one" in retrieval_query
+        assert "Customer: How much is the monthly plan?" in prompt
+
+
+class TestStreamingGeneration:
+    """Test token streaming."""
+    
+    @pytest.fixture
+    def streaming_pipeline(self):
+        """Create RAG pipeline whose LLM streams two tokens."""
+        mock_store = Mock(spec=VectorStoreManager)
+        mock_store.get_collection_info.return_value = {"name": "c", "count": 5, "metadata": {}}
+        with patch('agent.rag_pipeline.ChatOpenAI'):
+            pipeline = RAGPipeline(vector_store_manager=mock_store)
+        
+        async def astream(prompt):
+            for token in ["Hello", " there"]:
+                yield Mock(content=token)
+        
+        pipeline.llm = Mock()
+        pipeline.llm.astream = astream
+        mock_store.similarity_search_with_relevance_scores.return_value = [
+            (Document(page_content="Greeting guide", metadata={}), 0.8)
+        ]
+        return pipeline
+    
+    @pytest.mark.asyncio
+    async def test_astream_response_yields_tokens_then_done(self, streaming_pipeline):
+        """Test tokens are streamed before the final metadata event."""
+        events = [event async for event in streaming_pipeline.astream_response("Hi", "s1")]
+        
+        assert [e["content"] for e in events if e["type"] == "token"] == ["Hello", " there"]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["sources_used"] == 1
+        assert events[-1]["knowledge_base_size"] == 5
+
+
+class TestContextBuilder:
+    """Test token-budgeted context assembly."""
+    
+    @staticmethod
+    def _chunk(text, index, source="faq.md"):
+        """Create a retrieved chunk."""
+        return Document(page_content=text, metadata={"source": source, "chunk_index": index})
+    
+    def test_low_relevance_chunks_dropped(self):
+        """Test chunks below the relevance cutoff never reach the prompt."""
+        builder = ContextBuilder(count_tokens=len, token_budget=1000, min_relevance=0.5)
+        
+        context = builder.build([
+            (self._chunk("Refunds take five days.", 0), 0.4),
+            (self._chunk("Passwords are reset by email.", 3), 0.8),
+        ])
+        
+        assert [doc.page_content for doc in context] == ["Passwords are reset by email."]
+        assert context[0].metadata["relevance_score"] == 0.8
+    
+    def test_overlap_between_neighbours_removed(self):
+        """Test text shared by consecutive chunks is only included once."""
+        builder = ContextBuilder(count_tokens=len, token_budget=1000, min_relevance=0.0)
+        
+        context = builder.build([
+            (self._chunk("Open the settings page. Click reset password.", 1), 0.9),
+            (self._chunk("Click reset password. Check your inbox.", 2), 0.7),
+        ])
+        
+        assert [doc.page_content for doc in context] == [
+            "Open the settings page. Click reset password.",
+            "Check your inbox.",
+        ]
+    
+    def test_chunks_packed_within_budget(self):
+        """Test the most relevant chunks are kept and a smaller one fills the remaining budget."""
+        builder = ContextBuilder(count_tokens=len, token_budget=30, min_relevance=0.0, separator="")
+        
+        context = builder.build([
+            (self._chunk("x" * 20, 0, "a.md"), 0.9),
+            (self._chunk("y" * 20, 0, "b.md"), 0.8),
+            (self._chunk("z" * 10, 0, "c.md"), 0.7),
+        ])
+        
+        assert [doc.metadata["source"] for doc in context] == ["a.md", "c.md"]
+        assert sum(len(doc.page_content) for doc in context) <= 30
+
+
+class TestKeywordIndex:
+    """Test BM25 keyword search and hybrid fusion."""
+    
+    @pytest.fixture
+    def index(self):
+        """Create an index over three support chunks."""
+        index = BM25Index()
+        index.add(["a", "b", "c"], [
+            Document(page_content="Error E1042 means the API token expired.", metadata={"source": "errors.md"}),
+            Document(page_content="Reset your password from the login page.", metadata={"source": "faq.md"}),
+            Document(page_content="Call reset_password_v2 to reset a password via the API.", metadata={"source": "api.md"}),
+        ])
+        return index
+    
+    def test_exact_terms_ranked_first(self, index):
+        """Test error codes and identifiers match the chunks that contain them."""
+        assert index.search("E1042")[0][0].metadata["source"] == "errors.md"
+        assert index.search("reset_password_v2", k=1)[0][0].metadata["source"] == "api.md"
+        assert index.search("password", filter={"source": "faq.md"})[0][0].metadata["source"] == "faq.md"
+    
+    def test_removed_chunks_not_returned(self, index):
+        """Test deletes and source removals keep the index in step with the collection."""
+        index.remove(["a"])
+        index.remove_source("api.md")
+        
+        assert index.search("E1042") == []
+        assert [doc.metadata["source"] for doc, _ in index.search("reset password")] == ["faq.md"]
+        assert len(index) == 1
+    
+    def test_keyword_ratio_and_fusion(self):
+        """Test identifier-heavy queries are detected and RRF rewards agreement."""
+        first = Document(page_content="first")
+        second = Document(page_content="second")
+        
+        fused = reciprocal_rank_fusion([[first, second], [second]])
+        
+        assert keyword_ratio("E1042 reset_password_v2") == 1.0
+        assert keyword_ratio("how do I change my plan") == 0.0
+        assert [doc.page_content for doc, _ in fused] == ["second", "first"]
+    
+    def test_pipeline_search_modes(self):
+        """Test search_knowledge dispatches on the requested mode."""
+        mock_store = Mock(spec=VectorStoreManager)
+        mock_store.hybrid_search.return_value = [(Document(page_content="Hybrid", metadata={}), 0.03)]
+        mock_store.keyword_search.return_value = [(Document(page_content="Keyword", metadata={}), 2.1)]
+        mock_store.similarity_search_with_score.return_value = [(Document(page_content="Vector", metadata={}), 0.4)]
+        with patch('agent.rag_pipeline.ChatOpenAI'), patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("SEARCH_MODE", None)
+            pipeline = RAGPipeline(vector_store_manager=mock_store)
+        
+        # Vector search (distances) stays the default; hybrid is opt-in
+        assert pipeline.search_knowledge("E1042", include_scores=True)[0] == {
+            "content": "Vector", "metadata": {}, "score": 0.4
+        }
+        assert pipeline.search_knowledge("E1042", mode="hybrid")[0]["content"] == "Hybrid"
+        assert pipeline.search_knowledge("E1042", include_scores=True, mode="keyword")[0]["score"] == 2.1
+        with pytest.raises(ValueError):
+            pipeline.search_knowledge("E1042", mode="fuzzy")
+
+
 class TestTreeLineAgent:
     """Test TreeLine agent functionality."""
     
@@ -203,10 +1246,68 @@ class TestTreeLineAgent:
         mock_agent.rag_pipeline.search_knowledge.assert_called_once_with(
             query="test query",
             k=4,
-            include_scores=False
+            include_scores=False,
+            mode=None
         )
 
 
+class TestAgentWarmup:
+    """Test background warm-up of the standalone service."""
+    
+    def test_warmup_reaches_ready(self, monkeypatch):
+        """Test phases run in order and the warmed-up agent becomes the global one."""
+        monkeypatch.setattr(core, "_agent_instance", None)
+        with patch('agent.core.TreeLineAgent') as mock_agent_class:
+            mock_agent_class.return_value.initialize_knowledge_base.return_value = 3
+            warmup = AgentWarmup()
+            warmup.start()
+            warmup.join(timeout=5)
+        
+        status = warmup.status()
+        assert status["ready"]
+        assert status["documents_loaded"] == 3
+        assert set(status["durations"]) == {"loading_models", "ingesting"}
+        mock_agent_class.assert_called_once_with(initialize_knowledge_base=False)
+        assert core.get_agent() is mock_agent_class.return_value
+    
+    def test_warmup_failure_is_reported(self, monkeypatch):
+        """Test a failing phase is recorded instead of raised."""
+        monkeypatch.setattr(core, "_agent_instance", None)
+        with patch('agent.core.TreeLineAgent', side_effect=RuntimeError("no API key")):
+            warmup = AgentWarmup()
+            warmup.start()
+            warmup.join(timeout=5)
+        
+        assert warmup.status()["phase"] == "failed"
+        assert warmup.status()["error"] == "no API key"
+        assert core._agent_instance is None
+        
+        # A failed warm-up fails the liveness check so the container is restarted
+        from fastapi.testclient import TestClient
+        from agent import api
+        
+        monkeypatch.setattr(api, "warmup", warmup)
+        health = TestClient(api.app).get("/health")
+        assert health.status_code == 503
+        assert health.json()["status"] == "unhealthy"
+    
+    def test_endpoints_wait_for_warmup(self, monkeypatch):
+        """Test health answers at once while agent endpoints return 503."""
+        from fastapi.testclient import TestClient
+        from agent import api
+        
+        monkeypatch.setattr(api, "warmup", AgentWarmup())
+        client = TestClient(api.app)
+        
+        assert client.get("/health").status_code == 200
+        ready = client.get("/ready")
+        assert ready.status_code == 503
+        assert ready.json()["phase"] == "pending"
+        response = client.post("/generate", json={"message": "Hello"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
+
 class TestAgentIntegration:
     """Integration tests for the agent."""
     
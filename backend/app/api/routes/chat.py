@@ -1,25 +1,98 @@
 """Chat API routes."""
 
+import base64
+import json
 import time
 import uuid
-from typing import Annotated
+from datetime import datetime, timezone
+from typing import Annotated, Any, AsyncIterator, Dict, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
+from ...core.cache import ResponseCache, get_response_cache, make_cache_key
+from ...core.conversation_writer import ConversationWriter, get_conversation_writer
 from ...core.database import get_db
-from ...core.config import settings
+from ...core.http_client import get_http_client
 from ...models.conversation import Conversation
 from ...schemas.chat import ChatRequest, ChatResponse
 
 router = APIRouter()
 
+# Largest history page
+HISTORY_MAX_LIMIT = 200
+
+
+def _answer_cache(response_cache: Optional[ResponseCache], session_id: str) -> Optional[ResponseCache]:
+    """Return the response cache if it may be used for this turn.
+    
+    Answers to follow-ups depend on the conversation, so, as in the AI
+    agent's own cache, only the first turn of a session uses the cache.
+    """
+    if response_cache is not None and response_cache.first_turn(session_id):
+        return response_cache
+    return None
+
+
+async def _get_cached_answer(
+    response_cache: Optional[ResponseCache],
+    client: httpx.AsyncClient,
+    message: str
+) -> Optional[str]:
+    """Look up an answer for the message under the current knowledge base version."""
+    if response_cache is None:
+        return None
+    kb_version = await response_cache.kb_version.current(client)
+    if kb_version is None:
+        return None
+    return await response_cache.get(make_cache_key(message, kb_version))
+
+
+async def _cache_answer(
+    response_cache: Optional[ResponseCache],
+    message: str,
+    ai_message: str,
+    ai_data: Dict[str, Any]
+):
+    """Cache a successful agent answer under the version it was generated against."""
+    if response_cache is None or ai_data.get("fallback_used") or ai_data.get("error"):
+        return
+    kb_version = ai_data.get("knowledge_base_version")
+    if not kb_version:
+        return
+    response_cache.kb_version.observe(kb_version)
+    await response_cache.set(make_cache_key(message, kb_version), kb_version, ai_message)
+
+
+async def _save_conversation(
+    writer: ConversationWriter,
+    session_id: str,
+    user_message: str,
+    ai_message: str,
+    response_time_ms: int
+) -> ChatResponse:
+    """Queue the conversation for writing and build the response from the same values."""
+    conversation = ChatResponse(
+        id=uuid.uuid4(),
+        session_id=session_id,
+        user_message=user_message,
+        ai_response=ai_message,
+        response_time_ms=response_time_ms,
+        created_at=datetime.now(timezone.utc)
+    )
+    await writer.submit(conversation.model_dump())
+    return conversation
+
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
-    db: Annotated[AsyncSession, Depends(get_db)]
+    writer: Annotated[ConversationWriter, Depends(get_conversation_writer)],
+    client: Annotated[httpx.AsyncClient, Depends(get_http_client)],
+    response_cache: Annotated[Optional[ResponseCache], Depends(get_response_cache)]
 ) -> ChatResponse:
     """Send a message to the AI agent and get a response."""
     
@@ -27,66 +100,192 @@ async def chat(
     
     # Generate session ID if not provided
     session_id = request.session_id or str(uuid.uuid4())
+    response_cache = _answer_cache(response_cache, session_id)
     
-    try:
-        # Call AI agent service
-        async with httpx.AsyncClient() as client:
+    # Repeated questions are answered without calling the AI agent
+    ai_message = await _get_cached_answer(response_cache, client, request.message)
+    
+    if ai_message is None:
+        try:
+            # Call AI agent service over the shared connection pool
             ai_response = await client.post(
-                f"{settings.ai_agent_url}/generate",
+                "/generate",
                 json={
                     "message": request.message,
                     "session_id": session_id
-                },
-                timeout=30.0
+                }
             )
             ai_response.raise_for_status()
             ai_data = ai_response.json()
             ai_message = ai_data.get("response", "I'm sorry, I couldn't process your request.")
-    
-    except httpx.RequestError:
-        # Fallback response if AI agent is unavailable
-        ai_message = "I'm currently experiencing technical difficulties. Please try again later."
-    
-    except httpx.HTTPStatusError:
-        # Fallback response for HTTP errors
-        ai_message = "I'm sorry, I encountered an error while processing your request."
+            await _cache_answer(response_cache, request.message, ai_message, ai_data)
+        
+        except httpx.RequestError:
+            # Fallback response if AI agent is unavailable
+            ai_message = "I'm currently experiencing technical difficulties. Please try again later."
+        
+        except httpx.HTTPStatusError:
+            # Fallback response for HTTP errors
+            ai_message = "I'm sorry, I encountered an error while processing your request."
     
     # Calculate response time
     response_time_ms = int((time.time() - start_time) * 1000)
     
-    # Save conversation to database
-    conversation = Conversation(
-        session_id=session_id,
-        user_message=request.message,
-        ai_response=ai_message,
-        response_time_ms=response_time_ms
-    )
+    # Save conversation to database without waiting for the insert
+    return await _save_conversation(writer, session_id, request.message, ai_message, response_time_ms)
+
+
+def _sse_event(event: Dict[str, Any]) -> str:
+    """Format an event as a server-sent events frame."""
+    return f"data: {json.dumps(event)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    writer: Annotated[ConversationWriter, Depends(get_conversation_writer)],
+    client: Annotated[httpx.AsyncClient, Depends(get_http_client)],
+    response_cache: Annotated[Optional[ResponseCache], Depends(get_response_cache)]
+) -> StreamingResponse:
+    """Send a message to the AI agent and stream the response as server-sent events.
+    
+    Token events from the AI agent are relayed as they arrive. Once the answer
+    is complete it is queued for saving, and a final ``done`` event carries
+    the conversation.
+    """
+    
+    start_time = time.time()
+    session_id = request.session_id or str(uuid.uuid4())
+    response_cache = _answer_cache(response_cache, session_id)
     
-    db.add(conversation)
-    await db.commit()
-    await db.refresh(conversation)
+    async def event_stream() -> AsyncIterator[str]:
+        parts = []
+        agent_done: Dict[str, Any] = {}
+        error_message = None
+        
+        # Repeated questions are answered without calling the AI agent
+        cached_answer = await _get_cached_answer(response_cache, client, request.message)
+        if cached_answer is not None:
+            parts.append(cached_answer)
+            yield _sse_event({"type": "token", "content": cached_answer})
+        
+        else:
+            try:
+                async with client.stream(
+                    "POST",
+                    "/generate/stream",
+                    json={
+                        "message": request.message,
+                        "session_id": session_id
+                    }
+                ) as ai_response:
+                    ai_response.raise_for_status()
+                    async for line in ai_response.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        event = json.loads(line[len("data: "):])
+                        if event.get("type") == "token":
+                            parts.append(event["content"])
+                            yield _sse_event(event)
+                        elif event.get("type") == "done":
+                            agent_done = event
+            
+            except httpx.RequestError:
+                error_message = "I'm currently experiencing technical difficulties. Please try again later."
+            
+            except httpx.HTTPStatusError:
+                error_message = "I'm sorry, I encountered an error while processing your request."
+            
+            if error_message is None:
+                await _cache_answer(response_cache, request.message, "".join(parts), agent_done)
+            # Keep whatever was streamed before a mid-stream failure
+            elif not parts:
+                parts.append(error_message)
+                yield _sse_event({"type": "token", "content": error_message})
+        
+        response_time_ms = int((time.time() - start_time) * 1000)
+        
+        conversation = await _save_conversation(
+            writer, session_id, request.message, "".join(parts), response_time_ms
+        )
+        
+        yield _sse_event({
+            "type": "done",
+            "conversation": conversation.model_dump(mode="json"),
+            "sources_used": agent_done.get("sources_used", 0),
+            "knowledge_base_size": agent_done.get("knowledge_base_size", 0)
+        })
     
-    return ChatResponse.model_validate(conversation)
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def _encode_cursor(created_at: datetime, conversation_id: uuid.UUID) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = json.dumps([created_at.isoformat(), str(conversation_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Parse a cursor from ``_encode_cursor``; raises 400 if it is malformed."""
+    try:
+        created_at, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), uuid.UUID(conversation_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
 
 
 @router.get("/chat/history/{session_id}")
 async def get_chat_history(
     session_id: str,
+    response: Response,
     db: Annotated[AsyncSession, Depends(get_db)],
-    limit: int = 50
+    writer: Annotated[ConversationWriter, Depends(get_conversation_writer)],
+    limit: Annotated[int, Query(ge=1)] = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    """Get chat history for a session."""
+    """Get chat history for a session, newest first.
+    
+    Pages are keyset-paginated on ``(created_at, id)`` using the
+    ``(session_id, created_at, id)`` index: pass the ``X-Next-Cursor``
+    header of one page as ``cursor`` to get the next. ``fields`` is a
+    comma-separated subset of the response fields (e.g. ``id,created_at``)
+    so list views can skip the message texts. ``limit`` is capped at
+    ``HISTORY_MAX_LIMIT``.
+    """
+    
+    limit = min(limit, HISTORY_MAX_LIMIT)
     
-    from sqlalchemy import select
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(selected) - set(ChatResponse.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        selected = list(ChatResponse.model_fields)
     
+    # Include turns of this session still queued in this process
+    await writer.flush(session_id)
+    
+    # The cursor columns are always read; only the selected fields are returned
+    columns = {"id", "created_at", *selected}
     stmt = (
-        select(Conversation)
+        select(*(getattr(Conversation, name) for name in ChatResponse.model_fields if name in columns))
         .where(Conversation.session_id == session_id)
-        .order_by(Conversation.created_at.desc())
-        .limit(limit)
+        .order_by(Conversation.created_at.desc(), Conversation.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        created_at, conversation_id = _decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Conversation.created_at, Conversation.id) < tuple_(created_at, conversation_id))
     
     result = await db.execute(stmt)
-    conversations = result.scalars().all()
+    rows = result.all()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
     
-    return [ChatResponse.model_validate(conv) for conv in conversations]
+    if not fields:
+        return [ChatResponse.model_validate(row) for row in rows]
+    return [{name: getattr(row, name) for name in selected} for row in rows]
@@ -0,0 +1,32 @@
+"""Knowledge base API routes."""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.database import get_db
+from ...models.knowledge_base import KnowledgeBaseDocument
+from ...schemas.knowledge_base import KnowledgeBaseDocumentResponse, KnowledgeBaseResponse
+
+router = APIRouter()
+
+
+@router.get("/knowledge-base", response_model=KnowledgeBaseResponse)
+async def get_knowledge_base(
+    db: Annotated[AsyncSession, Depends(get_db)]
+):
+    """List the documents indexed by the AI agent, read from the knowledge_base table."""
+    
+    stmt = select(KnowledgeBaseDocument).order_by(KnowledgeBaseDocument.document_path)
+    result = await db.execute(stmt)
+    documents = result.scalars().all()
+    
+    timestamps = [document.last_updated for document in documents if document.last_updated]
+    return KnowledgeBaseResponse(
+        total_documents=len(documents),
+        total_chunks=sum(document.chunk_count or 0 for document in documents),
+        last_updated=max(timestamps) if timestamps else None,
+        documents=[KnowledgeBaseDocumentResponse.model_validate(document) for document in documents]
+    )
@@ -0,0 +1,277 @@
+"""Exact-match cache for AI agent answers."""
+
+import asyncio
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+import httpx
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from .config import settings
+from .database import AsyncSessionLocal, async_database_url, engine_options
+from ..models.cached_response import CachedResponse
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_message(message: str) -> str:
+    """Normalize a message so trivially different phrasings share a cache entry.
+
+    Applies Unicode compatibility normalization, case folding, whitespace
+    collapsing and strips trailing punctuation.
+    """
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def make_cache_key(message: str, kb_version: str) -> str:
+    """Build the cache key for a message under a knowledge base version."""
+    key = f"{kb_version}\x00{normalize_message(message)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class MemoryResponseCache:
+    """In-process LRU cache with a TTL."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached answer, if present and not expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, kb_version: str, value: str):
+        """Cache an answer."""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def close(self):
+        """Drop every entry."""
+        self._entries.clear()
+
+
+class DatabaseResponseCache:
+    """Cache stored in the ``cached_responses`` table, shared by every worker.
+
+    Works against the application's PostgreSQL database or a local SQLite
+    file. Expired rows are ignored on read and purged periodically on write.
+    """
+
+    PURGE_EVERY = 100
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        ttl_seconds: float = 3600.0,
+        engine: Optional[AsyncEngine] = None
+    ):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self._engine = engine
+        self._writes = 0
+
+    async def init(self):
+        """Create the cache table in a dedicated cache database.
+        
+        The application database gets it from ``create_all`` at startup.
+        """
+        if self._engine is not None:
+            async with self._engine.begin() as conn:
+                await conn.run_sync(CachedResponse.__table__.create, checkfirst=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached answer, if present and not expired."""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(CachedResponse.ai_response).where(
+                    CachedResponse.cache_key == key,
+                    CachedResponse.expires_at > datetime.now(timezone.utc)
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def set(self, key: str, kb_version: str, value: str):
+        """Cache an answer, replacing any existing entry for the key."""
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as session:
+            await session.merge(CachedResponse(
+                cache_key=key,
+                kb_version=kb_version,
+                ai_response=value,
+                expires_at=now + timedelta(seconds=self.ttl_seconds)
+            ))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                await session.execute(delete(CachedResponse).where(CachedResponse.expires_at <= now))
+            await session.commit()
+
+    async def close(self):
+        """Dispose of the cache's own engine, if it has one."""
+        if self._engine is not None:
+            await self._engine.dispose()
+
+
+class KnowledgeBaseVersion:
+    """Tracks the AI agent's knowledge base version.
+
+    The version is learned from every agent response and re-read from the
+    agent at most every ``refresh_seconds``, so cached answers stop being
+    served shortly after the knowledge base changes.
+    """
+
+    def __init__(self, refresh_seconds: float = 5.0):
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[str] = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def observe(self, version: Optional[str]):
+        """Record a version reported by the agent."""
+        if version:
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    async def current(self, client: httpx.AsyncClient) -> Optional[str]:
+        """Return the current version, refreshing it from the agent when stale."""
+        if time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self.version
+        async with self._lock:
+            if time.monotonic() - self._checked_at >= self.refresh_seconds:
+                try:
+                    response = await client.get("/kb/version")
+                    response.raise_for_status()
+                    self.version = response.json().get("knowledge_base_version")
+                except (httpx.HTTPError, ValueError):
+                    # Without a known version nothing can be served from the cache
+                    self.version = None
+                self._checked_at = time.monotonic()
+        return self.version
+
+
+class ResponseCache:
+    """Local LRU in front of an optional shared backend.
+
+    Answers to follow-ups depend on the conversation, so only the first turn
+    of a session uses the cache. Sessions are recognized from an in-process
+    LRU of session IDs that already had a turn in this worker.
+    """
+
+    def __init__(
+        self,
+        local: MemoryResponseCache,
+        shared: Optional[DatabaseResponseCache] = None,
+        refresh_seconds: float = 5.0,
+        max_sessions: int = 100000
+    ):
+        self.local = local
+        self.shared = shared
+        self.kb_version = KnowledgeBaseVersion(refresh_seconds)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, None]" = OrderedDict()
+
+    def first_turn(self, session_id: str) -> bool:
+        """Record a turn of the session; True if it is the first one seen."""
+        if session_id in self._sessions:
+            self._sessions.move_to_end(session_id)
+            return False
+        self._sessions[session_id] = None
+        if len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached answer from the local layer, then the shared one."""
+        value = await self.local.get(key)
+        if value is None and self.shared is not None:
+            value = await self.shared.get(key)
+            if value is not None:
+                await self.local.set(key, "", value)
+        return value
+
+    async def set(self, key: str, kb_version: str, value: str):
+        """Cache an answer in every layer."""
+        await self.local.set(key, kb_version, value)
+        if self.shared is not None:
+            await self.shared.set(key, kb_version, value)
+
+    async def close(self):
+        """Release both layers."""
+        await self.local.close()
+        if self.shared is not None:
+            await self.shared.close()
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def create_response_cache() -> ResponseCache:
+    """Create the response cache from settings."""
+    shared = None
+    if settings.response_cache_backend == "database":
+        url = settings.response_cache_url or settings.database_url
+        if url == settings.database_url:
+            shared = DatabaseResponseCache(AsyncSessionLocal, settings.response_cache_ttl_seconds)
+        else:
+            engine = create_async_engine(async_database_url(url), future=True, **engine_options(url))
+            shared = DatabaseResponseCache(
+                async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+                settings.response_cache_ttl_seconds,
+                engine=engine
+            )
+
+    return ResponseCache(
+        MemoryResponseCache(settings.response_cache_max_entries, settings.response_cache_ttl_seconds),
+        shared,
+        refresh_seconds=settings.kb_version_refresh_seconds,
+        max_sessions=settings.response_cache_max_sessions
+    )
+
+
+async def init_response_cache() -> Optional[ResponseCache]:
+    """Create the response cache and its table. Called from the lifespan manager."""
+    global _response_cache
+    if not settings.response_cache_enabled:
+        return None
+    if _response_cache is None:
+        _response_cache = create_response_cache()
+    if _response_cache.shared is not None:
+        await _response_cache.shared.init()
+    return _response_cache
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Dependency to get the response cache (``None`` when disabled)."""
+    global _response_cache
+    if not settings.response_cache_enabled:
+        return None
+    if _response_cache is None:
+        _response_cache = create_response_cache()
+    return _response_cache
+
+
+async def close_response_cache():
+    """Release the response cache."""
+    global _response_cache
+    if _response_cache is not None:
+        await _response_cache.close()
+        _response_cache = None
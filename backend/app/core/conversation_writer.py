@@ -0,0 +1,170 @@
+"""Write-behind persistence of conversations."""
+
+import asyncio
+import logging
+from collections import Counter
+from typing import Annotated, Any, Dict, List, Optional
+
+from fastapi import Depends
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .config import settings
+from .database import get_session_factory
+from ..models.conversation import Conversation
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationWriter:
+    """Queues conversation rows and inserts them in batches off the request path.
+
+    Rows are flushed with one batched insert (a single prepared statement
+    executed for every row) once ``batch_size`` are queued or
+    ``flush_interval`` has passed. The queue is
+    bounded: when it is full, requests wait for the writer instead of
+    growing memory. ``close`` drains everything still queued. With
+    ``write_behind`` off, rows are inserted before ``submit`` returns.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        max_queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 0.2,
+        max_retries: int = 3,
+        write_behind: bool = True
+    ):
+        self.session_factory = session_factory
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._pending: Counter = Counter()
+        self._written = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background writer task (on the running event loop)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, row: Dict[str, Any]):
+        """Queue a row of the conversations table; waits only while the queue is full."""
+        if not self.write_behind:
+            await self._insert([row])
+            return
+        self.start()
+        self._pending[row["session_id"]] += 1
+        try:
+            await self._queue.put(row)
+        except BaseException:
+            await self._done([row], task_done=False)
+            raise
+
+    async def flush(self, session_id: Optional[str] = None):
+        """Wait until queued rows (of one session, or all) are written."""
+        async with self._written:
+            await self._written.wait_for(
+                lambda: not (self._pending[session_id] if session_id is not None else sum(self._pending.values()))
+            )
+
+    async def _run(self):
+        """Collect rows into batches by size or time and insert them, until ``close``."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            deadline = 0.0
+            while len(batch) < self.batch_size:
+                if not batch:
+                    row = await self._queue.get()
+                    deadline = loop.time() + self.flush_interval
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                # None is the shutdown sentinel queued by close
+                if row is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(row)
+            if batch:
+                try:
+                    await self._insert(batch)
+                finally:
+                    await self._done(batch)
+
+    async def _insert(self, rows: List[Dict[str, Any]]):
+        """Insert rows in one batch, retrying transient failures; failed rows are logged and dropped."""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(Conversation), rows)
+                    await db.commit()
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Dropping {len(rows)} conversations after {attempt} failed inserts: {e}")
+                else:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def _done(self, rows: List[Dict[str, Any]], task_done: bool = True):
+        """Mark rows as no longer pending and wake up flushes."""
+        async with self._written:
+            for row in rows:
+                self._pending[row["session_id"]] -= 1
+                if self._pending[row["session_id"]] <= 0:
+                    del self._pending[row["session_id"]]
+                if task_done:
+                    self._queue.task_done()
+            self._written.notify_all()
+
+    async def close(self):
+        """Write everything still queued and stop the background task."""
+        if self._task is not None and not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+
+
+_writer: Optional[ConversationWriter] = None
+
+
+def create_conversation_writer(session_factory: async_sessionmaker) -> ConversationWriter:
+    """Create the conversation writer from settings."""
+    return ConversationWriter(
+        session_factory,
+        max_queue_size=settings.conversation_queue_max_size,
+        batch_size=settings.conversation_batch_size,
+        flush_interval=settings.conversation_flush_interval_seconds,
+        write_behind=settings.conversation_write_behind
+    )
+
+
+def get_conversation_writer(
+    session_factory: Annotated[async_sessionmaker, Depends(get_session_factory)]
+) -> ConversationWriter:
+    """Dependency to get the shared conversation writer.
+
+    Created on first use, bound to the session factory of that request.
+    """
+    global _writer
+    if _writer is None:
+        _writer = create_conversation_writer(session_factory)
+    return _writer
+
+
+async def close_conversation_writer():
+    """Drain queued conversations and stop the writer. Called from the lifespan manager."""
+    global _writer
+    if _writer is not None:
+        await _writer.close()
+        _writer = None
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 from sqlalchemy.orm import DeclarativeBase
 
 from .config import settings
+from .metrics import TimedQueuePool
 
 
 class Base(DeclarativeBase):
@@ -11,11 +12,48 @@ class Base(DeclarativeBase):
     pass
 
 
+def async_database_url(url: str) -> str:
+    """Map a plain database URL onto its async driver."""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    return url
+
+
+def engine_options(url: str) -> dict:
+    """Connection pool and driver options for a database URL.
+    
+    PostgreSQL gets a sized, pre-pinged pool that records checkout waits,
+    a per-connection prepared statement cache and server-side timeouts;
+    other databases keep SQLAlchemy's defaults.
+    """
+    if not url.startswith("postgresql"):
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {
+            "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+            "server_settings": {
+                "application_name": "treeline-backend",
+                "statement_timeout": str(settings.db_statement_timeout_ms),
+                "idle_in_transaction_session_timeout": str(settings.db_idle_in_transaction_timeout_ms),
+            },
+        },
+    }
+
+
 # Create async engine
 engine = create_async_engine(
-    settings.database_url.replace("postgresql://", "postgresql+asyncpg://"),
+    async_database_url(settings.database_url),
     echo=settings.debug,
     future=True,
+    **engine_options(settings.database_url),
 )
 
 # Create async session factory
@@ -33,3 +71,12 @@ async def get_db() -> AsyncSession:
             yield session
         finally:
             await session.close()
+
+
+def get_session_factory() -> async_sessionmaker:
+    """Dependency to get the session factory.
+    
+    Streaming responses outlive the request-scoped ``get_db`` session, so
+    they open their own session once the response has been produced.
+    """
+    return AsyncSessionLocal
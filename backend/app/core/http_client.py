@@ -0,0 +1,72 @@
+"""Shared HTTP client for calls to the AI agent service."""
+
+import logging
+from typing import Optional
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """Check whether the optional ``h2`` package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_ai_agent_client() -> httpx.AsyncClient:
+    """Create a pooled client for the AI agent from settings."""
+    http2 = settings.ai_agent_http2
+    if http2 and not _http2_available():
+        logger.warning("AI_AGENT_HTTP2 is enabled but 'h2' is not installed; using HTTP/1.1")
+        http2 = False
+    
+    return httpx.AsyncClient(
+        base_url=settings.ai_agent_url,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.ai_agent_max_connections,
+            max_keepalive_connections=settings.ai_agent_max_keepalive_connections,
+            keepalive_expiry=settings.ai_agent_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            settings.ai_agent_timeout,
+            connect=settings.ai_agent_connect_timeout,
+            pool=settings.ai_agent_pool_timeout,
+        ),
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the application-wide client. Called from the lifespan manager."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_ai_agent_client()
+    return _client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Dependency to get the shared AI agent client.
+    
+    Creates the client on first use if the lifespan manager has not run
+    (e.g. under a test client).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_ai_agent_client()
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,62 @@
+"""Database connection pool metrics, exposed in the Prometheus text format."""
+
+import threading
+import time
+from typing import List
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+
+class WaitHistogram:
+    """Cumulative histogram of how long checkouts waited for a pooled connection."""
+    
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            for index, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.counts[index] += 1
+    
+    def render(self, name: str) -> List[str]:
+        with self._lock:
+            lines = [f"# TYPE {name} histogram"]
+            lines += [f'{name}_bucket{{le="{bound}"}} {count}' for bound, count in zip(self.BUCKETS, self.counts)]
+            lines += [f'{name}_bucket{{le="+Inf"}} {self.count}', f"{name}_sum {self.sum:.6f}", f"{name}_count {self.count}"]
+        return lines
+
+
+pool_wait = WaitHistogram()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records the time spent waiting for a connection."""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - start)
+
+
+def render_pool_metrics(pool: Pool) -> str:
+    """Pool wait histogram and pool occupancy gauges."""
+    lines = pool_wait.render("treeline_db_pool_wait_seconds")
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        for name, value in (
+            ("size", pool.size()),
+            ("checked_out", pool.checkedout()),
+            ("overflow", pool.overflow()),
+            ("checked_in", pool.checkedin()),
+        ):
+            lines += [f"# TYPE treeline_db_pool_{name} gauge", f"treeline_db_pool_{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,7 @@
 """Database models"""
 
 from .conversation import Conversation
+from .cached_response import CachedResponse
+from .knowledge_base import KnowledgeBaseDocument
 
-__all__ = ["Conversation"]
+__all__ = ["Conversation", "CachedResponse", "KnowledgeBaseDocument"]
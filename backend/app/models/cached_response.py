@@ -0,0 +1,45 @@
+"""Cached response database model."""
+
+from datetime import datetime
+
+from sqlalchemy import String, Text, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+
+
+class CachedResponse(Base):
+    """AI answer shared between backend workers, keyed by normalized message and knowledge base version."""
+    
+    __tablename__ = "cached_responses"
+    
+    cache_key: Mapped[str] = mapped_column(
+        String(64),
+        primary_key=True
+    )
+    
+    kb_version: Mapped[str] = mapped_column(
+        String(64),
+        nullable=False
+    )
+    
+    ai_response: Mapped[str] = mapped_column(
+        Text,
+        nullable=False
+    )
+    
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        index=True
+    )
+    
+    def __repr__(self) -> str:
+        return f"<CachedResponse(cache_key={self.cache_key}, kb_version={self.kb_version})>"
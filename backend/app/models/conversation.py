@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Text, DateTime, Integer
+from sqlalchemy import Index, String, Text, DateTime, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
@@ -16,6 +16,10 @@ class Conversation(Base):
     """Conversation model for storing chat interactions."""
     
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Keyset pagination of a session's history on (created_at, id)
+        Index("idx_conversations_session_created_at_id", "session_id", "created_at", "id"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -26,8 +30,7 @@ class Conversation(Base):
     
     session_id: Mapped[str] = mapped_column(
         String(255),
-        nullable=False,
-        index=True
+        nullable=False
     )
     
     user_message: Mapped[str] = mapped_column(
@@ -0,0 +1,59 @@
+"""Knowledge base document database model."""
+
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import JSON, Index, String, Text, DateTime, Integer
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+
+
+class KnowledgeBaseDocument(Base):
+    """Document indexed by the AI agent, written by its ingestion pipeline."""
+    
+    __tablename__ = "knowledge_base"
+    __table_args__ = (
+        # Same unique index as init.sql and the agent, which upserts by path
+        Index("idx_knowledge_base_document_path", "document_path", unique=True),
+    )
+    
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4
+    )
+    
+    document_name: Mapped[str] = mapped_column(
+        String(255),
+        nullable=False
+    )
+    
+    document_path: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True
+    )
+    
+    chunk_count: Mapped[int] = mapped_column(
+        Integer,
+        default=0
+    )
+    
+    last_updated: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=True
+    )
+    
+    # "metadata" is reserved on declarative classes
+    document_metadata: Mapped[Optional[Dict[str, Any]]] = mapped_column(
+        "metadata",
+        JSON().with_variant(JSONB, "postgresql"),
+        nullable=True
+    )
+    
+    def __repr__(self) -> str:
+        return f"<KnowledgeBaseDocument(document_path={self.document_path}, chunk_count={self.chunk_count})>"
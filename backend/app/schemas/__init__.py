@@ -1,5 +1,6 @@
 """Pydantic schemas for request/response validation"""
 
 from .chat import ChatRequest, ChatResponse
+from .knowledge_base import KnowledgeBaseDocumentResponse, KnowledgeBaseResponse
 
-__all__ = ["ChatRequest", "ChatResponse"]
+__all__ = ["ChatRequest", "ChatResponse", "KnowledgeBaseDocumentResponse", "KnowledgeBaseResponse"]
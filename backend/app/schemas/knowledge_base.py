@@ -0,0 +1,34 @@
+"""Knowledge base Pydantic schemas."""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class KnowledgeBaseDocumentResponse(BaseModel):
+    """One document indexed by the AI agent."""
+    
+    id: UUID = Field(..., description="Unique document ID")
+    document_name: str = Field(..., description="File name of the document")
+    document_path: Optional[str] = Field(None, description="Path the document was ingested from")
+    chunk_count: int = Field(0, description="Number of chunks stored for the document")
+    last_updated: Optional[datetime] = Field(None, description="When the document was last (re-)indexed")
+    metadata: Optional[Dict[str, Any]] = Field(
+        None,
+        validation_alias="document_metadata",
+        description="Content hash, embedding model, chunking settings and ingestion timing"
+    )
+    
+    class Config:
+        from_attributes = True
+
+
+class KnowledgeBaseResponse(BaseModel):
+    """Knowledge base state as recorded by the ingestion pipeline."""
+    
+    total_documents: int = Field(..., description="Number of indexed documents")
+    total_chunks: int = Field(..., description="Number of chunks across all documents")
+    last_updated: Optional[datetime] = Field(None, description="Most recent ingestion time")
+    documents: List[KnowledgeBaseDocumentResponse] = Field(..., description="Indexed documents, by path")
@@ -7,11 +7,16 @@ import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from app.core.database import engine, Base
-from app.api.routes import chat
+from app.core.metrics import render_pool_metrics
+from app.core.http_client import init_http_client, close_http_client
+from app.core.cache import init_response_cache, close_response_cache
+from app.core.conversation_writer import close_conversation_writer
+from app.api.routes import chat, knowledge_base
 
 # Load environment variables
 load_dotenv()
@@ -23,10 +28,15 @@ async def lifespan(app: FastAPI):
     # Startup
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await init_http_client()
+    await init_response_cache()
     
     yield
     
     # Shutdown
+    await close_conversation_writer()
+    await close_response_cache()
+    await close_http_client()
     await engine.dispose()
 
 
@@ -51,6 +61,7 @@ app.add_middleware(
 
 # Include routers
 app.include_router(chat.router, prefix="/api", tags=["chat"])
+app.include_router(knowledge_base.router, prefix="/api", tags=["knowledge-base"])
 
 
 @app.get("/health")
@@ -63,6 +74,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Database pool metrics in the Prometheus text format."""
+    return render_pool_metrics(engine.pool)
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -7,7 +7,10 @@ from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.core.database import Base, get_db
+from app.core.database import Base, get_db, get_session_factory
+from app.core.cache import close_response_cache
+from app.core.conversation_writer import close_conversation_writer
+from app.core.http_client import close_http_client
 from main import app
 
 
@@ -24,8 +27,8 @@ def event_loop():
 
 
 @pytest_asyncio.fixture
-async def test_db():
-    """Create a test database session."""
+async def test_session_factory():
+    """Create a session factory bound to a fresh test database."""
     engine = create_async_engine(
         TEST_DATABASE_URL,
         connect_args={"check_same_thread": False},
@@ -35,29 +38,37 @@ async def test_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
-    async_session = async_sessionmaker(
+    yield async_sessionmaker(
         engine, class_=AsyncSession, expire_on_commit=False
     )
     
-    async with async_session() as session:
-        yield session
-    
     await engine.dispose()
 
 
 @pytest_asyncio.fixture
-async def client(test_db):
-    """Create a test client with database dependency override."""
+async def test_db(test_session_factory):
+    """Create a test database session."""
+    async with test_session_factory() as session:
+        yield session
+
+
+@pytest_asyncio.fixture
+async def client(test_db, test_session_factory):
+    """Create a test client with database dependency overrides."""
     
     async def override_get_db():
         yield test_db
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: test_session_factory
     
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
     
     app.dependency_overrides.clear()
+    await close_conversation_writer()
+    await close_response_cache()
+    await close_http_client()
 
 
 @pytest.fixture
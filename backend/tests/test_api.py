@@ -1,7 +1,31 @@
 """API endpoint tests."""
 
+import json
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import httpx
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.cache import (
+    DatabaseResponseCache,
+    MemoryResponseCache,
+    ResponseCache,
+    get_response_cache,
+    make_cache_key,
+    normalize_message,
+)
+from app.core.config import settings
+from app.core.conversation_writer import ConversationWriter
+from app.core.database import engine_options
+from app.core.metrics import TimedQueuePool, pool_wait
+from app.core.http_client import create_ai_agent_client, get_http_client
+from app.models import Conversation, KnowledgeBaseDocument
+from main import app
 
 
 class TestHealthEndpoint:
@@ -113,3 +137,367 @@ class TestChatEndpoint:
         data = response.json()
         assert isinstance(data, list)
         assert len(data) == 0
+
+
+class TestChatHistoryPagination:
+    """Test keyset-paginated chat history."""
+    
+    @pytest.mark.asyncio
+    async def test_pages_follow_cursor(self, client: AsyncClient, test_db):
+        """Test pages are newest first, disjoint, and end without a cursor."""
+        created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        test_db.add_all([
+            Conversation(session_id="paged", user_message=f"Q{i}", ai_response=f"A{i}", created_at=created_at)
+            for i in range(5)
+        ])
+        await test_db.commit()
+        
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = await client.get("/api/chat/history/paged", params=params)
+            assert response.status_code == 200
+            seen += [row["id"] for row in response.json()]
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        
+        assert pages == 3
+        assert len(seen) == len(set(seen)) == 5
+    
+    @pytest.mark.asyncio
+    async def test_large_limit_is_capped(self, client: AsyncClient, sample_chat_request):
+        """Test limits above the maximum are capped rather than rejected."""
+        await client.post("/api/chat", json=sample_chat_request)
+        
+        response = await client.get(f"/api/chat/history/{sample_chat_request['session_id']}", params={"limit": 1000})
+        
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        assert (await client.get("/api/chat/history/s", params={"limit": 0})).status_code == 422
+    
+    @pytest.mark.asyncio
+    async def test_fields_projection(self, client: AsyncClient, sample_chat_request):
+        """Test only the requested fields are returned."""
+        await client.post("/api/chat", json=sample_chat_request)
+        
+        response = await client.get(
+            f"/api/chat/history/{sample_chat_request['session_id']}", params={"fields": "id,created_at"}
+        )
+        
+        assert response.status_code == 200
+        assert set(response.json()[0]) == {"id", "created_at"}
+    
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_and_fields(self, client: AsyncClient):
+        """Test malformed cursors and unknown fields are rejected."""
+        assert (await client.get("/api/chat/history/s", params={"cursor": "not-a-cursor"})).status_code == 400
+        assert (await client.get("/api/chat/history/s", params={"fields": "id,password"})).status_code == 400
+
+
+class TestAIAgentClient:
+    """Test the shared AI agent HTTP client."""
+    
+    @pytest.mark.asyncio
+    async def test_client_uses_settings(self):
+        """Test the pooled client is configured from settings."""
+        client = create_ai_agent_client()
+        try:
+            assert str(client.base_url).rstrip("/") == settings.ai_agent_url
+            assert client.timeout.connect == settings.ai_agent_connect_timeout
+            assert client.timeout.read == settings.ai_agent_timeout
+        finally:
+            await client.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_chat_reuses_shared_client(self, client: AsyncClient, sample_chat_request):
+        """Test chat requests go through the injected application client."""
+        calls = []
+        
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            return httpx.Response(200, json={"response": "Reset it from the login page."})
+        
+        agent_client = httpx.AsyncClient(
+            base_url="http://ai-agent", transport=httpx.MockTransport(handler)
+        )
+        app.dependency_overrides[get_http_client] = lambda: agent_client
+        
+        for _ in range(2):
+            response = await client.post("/api/chat", json=sample_chat_request)
+            assert response.status_code == 200
+            assert response.json()["ai_response"] == "Reset it from the login page."
+        
+        assert calls.count("/generate") == 2
+        assert not agent_client.is_closed
+        await agent_client.aclose()
+
+
+class TestResponseCache:
+    """Test the exact-match response cache."""
+    
+    @staticmethod
+    def agent_client(calls: list, kb_version: str = "v1") -> httpx.AsyncClient:
+        """Create an AI agent client backed by a fake agent."""
+        
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            if request.url.path == "/kb/version":
+                return httpx.Response(200, json={"knowledge_base_version": kb_version})
+            return httpx.Response(200, json={
+                "response": "Reset it from the login page.",
+                "knowledge_base_version": kb_version
+            })
+        
+        return httpx.AsyncClient(base_url="http://ai-agent", transport=httpx.MockTransport(handler))
+    
+    def test_normalize_message(self):
+        """Test case, whitespace and trailing punctuation are ignored."""
+        assert normalize_message("  How do I  reset my PASSWORD?? ") == "how do i reset my password"
+        assert make_cache_key("Reset password?", "v1") == make_cache_key("reset   password", "v1")
+        assert make_cache_key("Reset password", "v1") != make_cache_key("Reset password", "v2")
+    
+    def test_first_turn_tracking(self):
+        """Test only a session's first turn is cacheable, within a bounded session LRU."""
+        cache = ResponseCache(MemoryResponseCache(), max_sessions=1)
+        
+        assert cache.first_turn("a")
+        assert not cache.first_turn("a")
+        assert cache.first_turn("b")
+        assert cache.first_turn("a")
+    
+    @pytest.mark.asyncio
+    async def test_memory_cache_ttl_and_lru(self):
+        """Test expired and least recently used entries are dropped."""
+        cache = MemoryResponseCache(max_entries=1, ttl_seconds=60)
+        await cache.set("a", "v1", "A")
+        await cache.set("b", "v1", "B")
+        assert await cache.get("a") is None
+        assert await cache.get("b") == "B"
+        
+        cache.ttl_seconds = -1
+        await cache.set("c", "v1", "C")
+        assert await cache.get("c") is None
+    
+    @pytest.mark.asyncio
+    async def test_database_cache_roundtrip(self, test_session_factory):
+        """Test the shared database backend stores and replaces answers."""
+        cache = DatabaseResponseCache(test_session_factory, ttl_seconds=60)
+        await cache.set("key", "v1", "First")
+        await cache.set("key", "v1", "Second")
+        assert await cache.get("key") == "Second"
+        assert await cache.get("missing") is None
+    
+    @pytest.mark.asyncio
+    async def test_repeated_question_served_from_cache(self, client: AsyncClient, sample_chat_request):
+        """Test a repeated question skips the AI agent but is still persisted."""
+        calls = []
+        agent_client = self.agent_client(calls)
+        app.dependency_overrides[get_http_client] = lambda: agent_client
+        response_cache = ResponseCache(MemoryResponseCache())
+        app.dependency_overrides[get_response_cache] = lambda: response_cache
+        
+        first = await client.post("/api/chat", json=sample_chat_request)
+        repeated = dict(
+            sample_chat_request,
+            message=sample_chat_request["message"].upper() + "!",
+            session_id="other-session"
+        )
+        second = await client.post("/api/chat", json=repeated)
+        
+        assert calls.count("/generate") == 1
+        assert second.json()["ai_response"] == first.json()["ai_response"]
+        history = await client.get("/api/chat/history/other-session")
+        assert len(history.json()) == 1
+        await agent_client.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_follow_ups_are_not_shared_between_sessions(self, client: AsyncClient):
+        """Test the same follow-up in two sessions gets each session's own answer."""
+        calls = []
+        
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            if request.url.path == "/kb/version":
+                return httpx.Response(200, json={"knowledge_base_version": "v1"})
+            body = json.loads(request.content)
+            return httpx.Response(200, json={
+                "response": f"{body['message']} ({body['session_id']})",
+                "knowledge_base_version": "v1"
+            })
+        
+        agent_client = httpx.AsyncClient(base_url="http://ai-agent", transport=httpx.MockTransport(handler))
+        app.dependency_overrides[get_http_client] = lambda: agent_client
+        response_cache = ResponseCache(MemoryResponseCache())
+        app.dependency_overrides[get_response_cache] = lambda: response_cache
+        
+        answers = {}
+        for session_id, topic in (("session-a", "Shipping to Canada"), ("session-b", "Refunds")):
+            await client.post("/api/chat", json={"message": topic, "session_id": session_id})
+            follow_up = await client.post(
+                "/api/chat", json={"message": "How long does that take?", "session_id": session_id}
+            )
+            answers[session_id] = follow_up.json()["ai_response"]
+        
+        assert calls.count("/generate") == 4
+        assert answers == {
+            "session-a": "How long does that take? (session-a)",
+            "session-b": "How long does that take? (session-b)"
+        }
+        await agent_client.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_knowledge_base_change_misses(self, client: AsyncClient, sample_chat_request):
+        """Test answers cached under an older knowledge base version are not served."""
+        calls = []
+        response_cache = ResponseCache(MemoryResponseCache(), refresh_seconds=0)
+        app.dependency_overrides[get_response_cache] = lambda: response_cache
+        
+        for kb_version in ("v1", "v2"):
+            agent_client = self.agent_client(calls, kb_version)
+            app.dependency_overrides[get_http_client] = lambda: agent_client
+            await client.post("/api/chat", json=sample_chat_request)
+            await agent_client.aclose()
+        
+        assert calls.count("/generate") == 2
+
+
+class TestConversationWriter:
+    """Test write-behind persistence of conversations."""
+    
+    @staticmethod
+    def row(session_id: str, index: int) -> dict:
+        """Build a conversations row."""
+        return {
+            "id": uuid.uuid4(),
+            "session_id": session_id,
+            "user_message": f"Question {index}",
+            "ai_response": f"Answer {index}",
+            "response_time_ms": 10,
+            "created_at": datetime.now(timezone.utc)
+        }
+    
+    @pytest.mark.asyncio
+    async def test_rows_are_batched_and_drained(self, test_session_factory):
+        """Test rows are inserted by batch size and the rest on close."""
+        writer = ConversationWriter(test_session_factory, batch_size=3, flush_interval=60)
+        with patch.object(writer, "_insert", wraps=writer._insert) as insert:
+            for index in range(5):
+                await writer.submit(self.row("s1", index))
+            await writer.close()
+        
+        assert [len(call.args[0]) for call in insert.call_args_list] == [3, 2]
+        async with test_session_factory() as db:
+            assert await db.scalar(select(func.count()).select_from(Conversation)) == 5
+    
+    @pytest.mark.asyncio
+    async def test_flush_waits_for_session_rows(self, test_session_factory):
+        """Test flushing a session returns once its queued rows are written."""
+        writer = ConversationWriter(test_session_factory, batch_size=100, flush_interval=0.05)
+        await writer.submit(self.row("s1", 0))
+        
+        await writer.flush("s1")
+        
+        async with test_session_factory() as db:
+            assert await db.scalar(select(func.count()).select_from(Conversation)) == 1
+        await writer.close()
+
+
+class TestDatabasePool:
+    """Test database pool configuration and metrics."""
+    
+    def test_engine_options_for_postgres(self):
+        """Test pool sizing, statement cache and server timeouts come from settings."""
+        options = engine_options("postgresql://user:pass@db:5432/treeline")
+        
+        assert options["poolclass"] is TimedQueuePool
+        assert options["pool_size"] == settings.db_pool_size
+        assert options["max_overflow"] == settings.db_max_overflow
+        assert options["pool_pre_ping"] == settings.db_pool_pre_ping
+        assert options["connect_args"]["prepared_statement_cache_size"] == settings.db_prepared_statement_cache_size
+        assert options["connect_args"]["server_settings"]["statement_timeout"] == str(settings.db_statement_timeout_ms)
+        assert engine_options("sqlite:///./test.db") == {}
+    
+    @pytest.mark.asyncio
+    async def test_pool_wait_is_recorded(self, tmp_path):
+        """Test every checkout is observed in the wait histogram."""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool)
+        before = pool_wait.count
+        
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await engine.dispose()
+        
+        assert pool_wait.count == before + 1
+    
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self, client: AsyncClient):
+        """Test metrics are served in the Prometheus text format."""
+        response = await client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert "treeline_db_pool_wait_seconds_count" in response.text
+
+
+class TestChatStreamEndpoint:
+    """Test streaming chat endpoint."""
+    
+    @staticmethod
+    def parse_events(body: str) -> list:
+        """Parse server-sent events from a response body."""
+        return [
+            json.loads(line[len("data: "):])
+            for line in body.splitlines()
+            if line.startswith("data: ")
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_chat_stream_persists_conversation(self, client: AsyncClient, sample_chat_request):
+        """Test streamed answer is saved and returned in the final event."""
+        response = await client.post("/api/chat/stream", json=sample_chat_request)
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        
+        events = self.parse_events(response.text)
+        tokens = "".join(e["content"] for e in events if e["type"] == "token")
+        done = events[-1]
+        assert done["type"] == "done"
+        assert done["conversation"]["session_id"] == sample_chat_request["session_id"]
+        assert done["conversation"]["ai_response"] == tokens
+        
+        history = await client.get(f"/api/chat/history/{sample_chat_request['session_id']}")
+        assert len(history.json()) == 1
+        assert history.json()[0]["ai_response"] == tokens
+
+
+class TestKnowledgeBaseEndpoint:
+    """Test knowledge base listing endpoint."""
+    
+    @pytest.mark.asyncio
+    async def test_knowledge_base_empty(self, client: AsyncClient):
+        """Test listing before anything was ingested."""
+        response = await client.get("/api/knowledge-base")
+        
+        assert response.status_code == 200
+        assert response.json() == {"total_documents": 0, "total_chunks": 0, "last_updated": None, "documents": []}
+    
+    @pytest.mark.asyncio
+    async def test_knowledge_base_lists_documents(self, client: AsyncClient, test_db):
+        """Test rows written by the agent are listed with totals."""
+        test_db.add_all([
+            KnowledgeBaseDocument(document_name="b.md", document_path="kb/b.md", chunk_count=3, document_metadata={"content_hash": "bb"}),
+            KnowledgeBaseDocument(document_name="a.md", document_path="kb/a.md", chunk_count=2, document_metadata={"content_hash": "aa"}),
+        ])
+        await test_db.commit()
+        
+        response = await client.get("/api/knowledge-base")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_documents"] == 2
+        assert data["total_chunks"] == 5
+        assert data["last_updated"] is not None
+        assert [doc["document_name"] for doc in data["documents"]] == ["a.md", "b.md"]
+        assert data["documents"][0]["metadata"] == {"content_hash": "aa"}
@@ -26,7 +26,9 @@ CREATE TRIGGER update_conversations_updated_at BEFORE UPDATE ON conversations
 
 -- Create index for faster queries
 CREATE INDEX IF NOT EXISTS idx_conversations_id ON conversations(id);
-CREATE INDEX IF NOT EXISTS idx_conversations_session_id ON conversations(session_id);
+-- Session history is read newest first and keyset-paginated on (created_at, id);
+-- this index also serves plain session_id lookups
+CREATE INDEX IF NOT EXISTS idx_conversations_session_created_at_id ON conversations(session_id, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_conversations_created_at ON conversations(created_at);
 
 -- Create a table for knowledge base metadata
@@ -38,3 +40,17 @@ CREATE TABLE IF NOT EXISTS knowledge_base (
     last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     metadata JSONB
 );
+
+-- The AI agent upserts one row per ingested document, keyed by path
+CREATE UNIQUE INDEX IF NOT EXISTS idx_knowledge_base_document_path ON knowledge_base(document_path);
+
+-- Create a table for answers shared between backend workers (BACKEND_RESPONSE_CACHE_BACKEND=database)
+CREATE TABLE IF NOT EXISTS cached_responses (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    kb_version VARCHAR(64) NOT NULL,
+    ai_response TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_cached_responses_expires_at ON cached_responses(expires_at);
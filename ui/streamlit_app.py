@@ -4,11 +4,12 @@ A clean, minimal interface for interacting with the TreeLine AI agent with integ
 """
 
 import os
+import json
 import uuid
 import shutil
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterator, Optional, List
 
 import streamlit as st
 import httpx
@@ -245,6 +246,45 @@ async def send_message(message: str, session_id: str) -> Dict[str, Any]:
         return {"status": "error", "error": f"Connection error: {str(e)}"}
 
 
+def stream_message(message: str, session_id: str) -> Iterator[Dict[str, Any]]:
+    """Send a message to the streaming backend API and yield its events.
+    
+    Yields ``token`` events as the answer is generated and a final ``done``
+    event with the saved conversation. Failures are yielded as an ``error``
+    event instead of being raised.
+    """
+    try:
+        with httpx.stream(
+            "POST",
+            f"{BACKEND_URL}/api/chat/stream",
+            json={
+                "message": message,
+                "session_id": session_id
+            },
+            timeout=API_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("data: "):
+                    yield json.loads(line[len("data: "):])
+    except httpx.TimeoutException:
+        yield {"type": "error", "error": "Request timed out. Please try again."}
+    except httpx.HTTPStatusError as e:
+        yield {"type": "error", "error": f"Server error: {e.response.status_code}"}
+    except Exception as e:
+        yield {"type": "error", "error": f"Connection error: {str(e)}"}
+
+
+def get_indexed_documents() -> Dict[str, Any]:
+    """Get the documents indexed by the AI agent from the backend."""
+    try:
+        response = httpx.get(f"{BACKEND_URL}/api/knowledge-base", timeout=5.0)
+        response.raise_for_status()
+        return {"status": "success", "data": response.json()}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
 def display_message(message: Dict[str, Any], is_user: bool = False):
     """Display a chat message."""
     css_class = "user-message" if is_user else "ai-message"
@@ -418,6 +458,13 @@ def show_admin_interface():
         st.markdown("### 📊 Statistics")
         st.metric("Total Files", len(files))
         st.metric("Total Size", format_file_size(total_size))
+        
+        indexed = get_indexed_documents()
+        if indexed["status"] == "success":
+            st.metric("Indexed Documents", indexed["data"]["total_documents"])
+            st.metric("Indexed Chunks", indexed["data"]["total_chunks"])
+        else:
+            st.caption("Index state unavailable (backend not reachable)")
     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -427,6 +474,10 @@ def show_admin_interface():
         st.markdown('<h2 class="section-header">📄 Document Management</h2>', unsafe_allow_html=True)
         
         files = get_knowledge_base_files()
+        indexed_by_name = {
+            document["document_name"]: document
+            for document in indexed.get("data", {}).get("documents", [])
+        }
         
         if not files:
             st.info("📁 No documents found in the knowledge base.")
@@ -441,7 +492,12 @@ def show_admin_interface():
                     
                     with file_col1:
                         st.markdown(f'<div class="file-name">📄 {file_info["name"]}</div>', unsafe_allow_html=True)
-                        st.markdown(f'<div class="file-info">Size: {format_file_size(file_info["size"])}</div>', unsafe_allow_html=True)
+                        document = indexed_by_name.get(file_info["name"])
+                        if document:
+                            index_info = f'{document["chunk_count"]} chunks, indexed {(document["last_updated"] or "")[:16].replace("T", " ")}'
+                        else:
+                            index_info = "Not indexed yet"
+                        st.markdown(f'<div class="file-info">Size: {format_file_size(file_info["size"])} · {index_info}</div>', unsafe_allow_html=True)
                     
                     with file_col2:
                         if st.button(f"🗑️ Delete", key=f"delete_{file_info['name']}", help=f"Delete {file_info['name']}"):
@@ -572,34 +628,47 @@ def show_chat_interface():
         }
         st.session_state.messages.append(user_message)
         
-        # Show loading spinner
-        with st.spinner("TreeLine AI is thinking..."):
-            import asyncio
-            response = asyncio.run(send_message(user_input.strip(), st.session_state.session_id))
-        
-        if response["status"] == "success":
+        # Render tokens as they arrive
+        display_message(user_message, is_user=True)
+        placeholder = st.empty()
+        placeholder.info("TreeLine AI is thinking...")
+        
+        parts = []
+        done_event = None
+        error = None
+        for event in stream_message(user_input.strip(), st.session_state.session_id):
+            if event["type"] == "token":
+                parts.append(event["content"])
+                with placeholder.container():
+                    display_message({
+                        "content": "".join(parts) + " ▌",
+                        "timestamp": datetime.now().strftime("%H:%M:%S")
+                    })
+            elif event["type"] == "done":
+                done_event = event
+            elif event["type"] == "error":
+                error = event["error"]
+        
+        if done_event is not None:
             # Add AI response to chat
-            ai_data = response["data"]
+            ai_data = done_event["conversation"]
             ai_message = {
                 "content": ai_data["ai_response"],
                 "timestamp": datetime.now().strftime("%H:%M:%S"),
                 "is_user": False,
                 "response_time": ai_data.get("response_time_ms"),
-                "sources_used": ai_data.get("sources_used", 0)
+                "sources_used": done_event.get("sources_used", 0)
             }
             st.session_state.messages.append(ai_message)
             
-            # Show response info
-            if ai_data.get("response_time_ms"):
-                display_status_info(f"Response time: {ai_data['response_time_ms']}ms")
+            # Rerun to update the display
+            st.rerun()
         
         else:
             # Show error message
-            st.error(f"❌ Error: {response['error']}")
+            placeholder.empty()
+            st.error(f"❌ Error: {error or 'The response was interrupted.'}")
             st.info("Please try again or contact support if the problem persists.")
-        
-        # Rerun to update the display
-        st.rerun()
     
     elif submit_button and not user_input.strip():
         st.warning("Please enter a message before sending.")
@@ -248,6 +248,58 @@ class TestStreamlitApp:
         except ImportError:
             pytest.skip("Streamlit not available in test environment")
     
+    def test_stream_message_yields_events(self):
+        """Test streamed events are parsed from server-sent event lines."""
+        try:
+            from streamlit_app import stream_message
+            
+            with patch('httpx.stream') as mock_stream:
+                mock_response = mock_stream.return_value.__enter__.return_value
+                mock_response.raise_for_status.return_value = None
+                mock_response.iter_lines.return_value = [
+                    'data: {"type": "token", "content": "Hi"}',
+                    '',
+                    'data: {"type": "done", "conversation": {"ai_response": "Hi"}}',
+                ]
+                
+                events = list(stream_message("Hello", "test-session"))
+                
+                assert [e["type"] for e in events] == ["token", "done"]
+                assert events[0]["content"] == "Hi"
+        except ImportError:
+            pytest.skip("Streamlit not available in test environment")
+    
+    def test_stream_message_timeout(self):
+        """Test streaming timeout is reported as an error event."""
+        try:
+            from streamlit_app import stream_message
+            import httpx
+            
+            with patch('httpx.stream', side_effect=httpx.TimeoutException("Timeout")):
+                events = list(stream_message("Hello", "test-session"))
+                
+                assert events[-1]["type"] == "error"
+                assert "timed out" in events[-1]["error"].lower()
+        except ImportError:
+            pytest.skip("Streamlit not available in test environment")
+    
+    def test_get_indexed_documents_success(self):
+        """Test fetching the documents indexed by the AI agent."""
+        try:
+            from streamlit_app import get_indexed_documents
+            
+            with patch('httpx.get') as mock_get:
+                mock_get.return_value.json.return_value = {"total_documents": 1, "total_chunks": 4, "documents": []}
+                mock_get.return_value.raise_for_status.return_value = None
+                
+                result = get_indexed_documents()
+                
+                assert result["status"] == "success"
+                assert result["data"]["total_chunks"] == 4
+                assert mock_get.call_args[0][0].endswith("/api/knowledge-base")
+        except ImportError:
+            pytest.skip("Streamlit not available in test environment")
+    
     def test_initialize_session_state(self):
         """Test session state initialization."""
         try: